@@ -1,132 +1,384 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, make_response
 import json
 import time
-import requests
-from bs4 import BeautifulSoup
 import logging
-from datetime import datetime, timedelta
-import re
+from datetime import datetime, date, timedelta
 import os
+import threading
+import asyncio
+import contextvars
+import gc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial, wraps
+from price_cache import PriceCache, make_cache_key
+from form_tokens import FormTokenStore
+from upstream import (SessionPool, CircuitBreaker, FairScheduler, SharedRateLimiter, USER, UpstreamCancelled,
+                      cancel_scope, current_traffic, traffic)
+from grid_parser import MissingPriceTable, extract_grid_rows
+from price_datasets import EmptyDatasetError, PriceTrendsDataset
+from price_store import PriceStore, parse_query_date
+from price_records import PriceRecord, SourcedRecords, RESPONSE_FORMATS, dump_records, ndjson_lines, parse_price, records_fingerprint, records_payload
+from compression import compress_response
+from conditional import caching_headers, entity_tag, not_modified
+from metrics import REGISTRY, REQUEST_SECONDS, RESPONSES_BY_SOURCE, CONTENT_TYPE as METRICS_CONTENT_TYPE, Collected, stage
+from profiler import ProfileStore, SamplingProfiler
+from prefetch import PrefetchScheduler, TrafficTracker, parse_prefetch_keys, parse_times
+from async_scraper import AsyncUpstream
+from catalog import Catalog, harvest_catalog
+from source_strategy import SourceStrategy, SourcesUnavailable
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Base URL of the upstream site, overridable to point the scraper at a mirror or a mock
+AGMARKNET_BASE_URL = os.environ.get('AGMARKNET_BASE_URL', 'https://agmarknet.gov.in').rstrip('/')
+PRICE_TRENDS_URL = f"{AGMARKNET_BASE_URL}/PriceTrends/SA_Month_PriMV.aspx"
+ARCHIVE_URL = f"{AGMARKNET_BASE_URL}/PriceAndArrivals/CommodityDailyStateWise_Archive.aspx"
+
+# Requests per second (and burst) allowed to each upstream host, shared by every
+# worker process on the machine; 0 disables the limit. Requests waiting for a token
+# are ordered by upstream_scheduler: user requests round-robin by client, then
+# cache refreshes (which jump the queue after UPSTREAM_REFRESH_MAX_DEFER seconds).
+upstream_scheduler = FairScheduler(
+    SharedRateLimiter(
+        rate=float(os.environ.get('UPSTREAM_RATE_LIMIT', 10)),
+        burst=int(os.environ.get('UPSTREAM_RATE_BURST', 20)),
+        state_dir=os.environ.get('UPSTREAM_RATE_STATE_DIR') or None
+    ),
+    max_defer=float(os.environ.get('UPSTREAM_REFRESH_MAX_DEFER', 30))
+)
+
+# Shared keep-alive sessions for all upstream calls, with timeouts, retries and a
+# circuit breaker so a slow or down agmarknet cannot pin workers indefinitely.
+# With the defaults a GET (3 attempts) takes at most about 45s and a POST about
+# 25s, so even a scrape that needs fresh form tokens (GET + POST) fits in the
+# gunicorn --timeout 90 of render.yaml; keep it that way when raising timeouts
+# or retries, or a hung upstream kills workers before the breaker sees a failure.
+session_pool = SessionPool(
+    size=int(os.environ.get('UPSTREAM_POOL_SIZE', 4)),
+    connect_timeout=float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5)),
+    read_timeout=float(os.environ.get('UPSTREAM_READ_TIMEOUT', 10)),
+    retries=int(os.environ.get('UPSTREAM_RETRIES', 2)),
+    backoff_factor=float(os.environ.get('UPSTREAM_BACKOFF', 0.5)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('UPSTREAM_BREAKER_THRESHOLD', 5)),
+        reset_timeout=float(os.environ.get('UPSTREAM_BREAKER_RESET', 30))
+    ),
+    scheduler=upstream_scheduler
+)
+
+# Hidden ASP.NET form fields (and their cookies) are kept per page and reused
+# across requests, so each scrape costs a single POST instead of a GET + POST.
+form_tokens = FormTokenStore(max_age=int(os.environ.get('FORM_TOKEN_TTL', 1200)))
+
+# Local SQLite store of every scraped row, used for /history. Set PRICE_STORE_PATH
+# to an empty string to disable persistence.
+PRICE_STORE_PATH = os.environ.get('PRICE_STORE_PATH', 'prices.db')
+price_store = PriceStore(PRICE_STORE_PATH) if PRICE_STORE_PATH else None
+
+# Rolling aggregates for /stats, fed by every scraped table. They are created on
+# the first scrape (NumPy is only imported then) and seeded from the price store
+# on the first /stats call. Each worker process keeps its own aggregates, so every
+# /stats call first loads the rows other workers stored since the previous one;
+# reading back STATS_CATCHUP_OVERLAP seconds before it covers writes that were
+# still being committed then.
+STATS_CATCHUP_OVERLAP = float(os.environ.get('STATS_CATCHUP_OVERLAP', 30))
+price_stats = None
+_price_stats_loaded_at = None
+_price_stats_lock = threading.Lock()
+
+def get_price_stats(catch_up=True):
+    """
+    Return the price aggregates, creating them on first use; with catch_up, the rows
+    written to the price store since the last load (all of them the first time) are
+    loaded first
+    """
+    global price_stats, _price_stats_loaded_at
+    if price_stats is None or (catch_up and price_store is not None):
+        with _price_stats_lock:
+            if price_stats is None:
+                from price_stats import PriceStats
+                price_stats = PriceStats()
+            if catch_up and price_store is not None:
+                loaded_at = time.time()
+                started = time.perf_counter()
+                if _price_stats_loaded_at is None:
+                    price_stats.add_rows(price_store.iter_rows())
+                    logger.info(f"Loaded {len(price_stats)} stored rows into stats in "
+                                f"{time.perf_counter() - started:.2f}s")
+                else:
+                    price_stats.add_rows(price_store.iter_rows(since=_price_stats_loaded_at - STATS_CATCHUP_OVERLAP))
+                _price_stats_loaded_at = loaded_at
+    return price_stats
+
+# Most requested queries, used by the prefetch scheduler
+traffic_tracker = TrafficTracker()
+
+# State/commodity/market codes, harvested from the agmarknet dropdowns by
+# `python -m catalog --harvest`; the built-in codes are used until then. Running
+# workers pick up a rewritten CATALOG_PATH within CATALOG_RELOAD_INTERVAL seconds.
+CATALOG_PATH = os.environ.get('CATALOG_PATH', 'catalog.json')
+CATALOG_RELOAD_INTERVAL = float(os.environ.get('CATALOG_RELOAD_INTERVAL', 60))
+
+def _catalog_mtime():
+    try:
+        return os.path.getmtime(CATALOG_PATH) if CATALOG_PATH else None
+    except OSError:
+        return None
+
+catalog = Catalog.load_or_builtin(CATALOG_PATH)
+_catalog_loaded = (_catalog_mtime(), time.monotonic())
+
+def current_catalog():
+    """Return the code catalog, reloading it if CATALOG_PATH has been rewritten by a harvest"""
+    global catalog, _catalog_loaded
+    mtime, checked = _catalog_loaded
+    now = time.monotonic()
+    if now - checked >= CATALOG_RELOAD_INTERVAL:
+        latest = _catalog_mtime()
+        if latest != mtime:
+            catalog = Catalog.load_or_builtin(CATALOG_PATH)
+            logger.info(f"Reloaded code catalog from {catalog.source}")
+        _catalog_loaded = (latest, now)
+    return catalog
+
+# Set CACHE_ENABLED=0 to always scrape (used by the load benchmarks)
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', '1') != '0'
+
+# Full price trends tables per (state, commodity, month). One scrape returns every
+# market of a state, so other markets are then answered from memory.
+dataset_cache = PriceCache(
+    ttl=int(os.environ.get('DATASET_TTL', 3600)),
+    stale_ttl=int(os.environ.get('DATASET_STALE_TTL', 6 * 3600)),
+    max_entries=int(os.environ.get('DATASET_MAX_ENTRIES', 256))
+)
+
+# Non-blocking counterpart of session_pool for the async endpoints (see asgi.py).
+# It shares the token store, circuit breaker and latency metrics with the sync path.
+async_upstream = AsyncUpstream(
+    form_tokens,
+    breaker=session_pool.breaker,
+    latency=session_pool.latency,
+    pool_size=int(os.environ.get('ASYNC_UPSTREAM_POOL_SIZE', 100)),
+    connect_timeout=float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5)),
+    read_timeout=float(os.environ.get('UPSTREAM_READ_TIMEOUT', 10)),
+    retries=int(os.environ.get('UPSTREAM_RETRIES', 2)),
+    backoff_factor=float(os.environ.get('UPSTREAM_BACKOFF', 0.5)),
+    parse_workers=int(os.environ.get('ASYNC_PARSE_WORKERS', 4)),
+    scheduler=upstream_scheduler
+)
+
 def get_state_code(state_name):
     """Get the state code from the state name"""
-    # Common state mappings
-    state_mapping = {
-        "andhra pradesh": "01",
-        "arunachal pradesh": "02",
-        "assam": "03",
-        "bihar": "04",
-        "chhattisgarh": "05",
-        "goa": "06",
-        "gujarat": "07",
-        "haryana": "08",
-        "himachal pradesh": "09",
-        "jammu and kashmir": "10",
-        "jharkhand": "11",
-        "karnataka": "12",
-        "kerala": "13",
-        "madhya pradesh": "14",
-        "maharashtra": "15",
-        "manipur": "16",
-        "meghalaya": "17",
-        "mizoram": "18",
-        "nagaland": "19",
-        "odisha": "20",
-        "punjab": "21",
-        "rajasthan": "22",
-        "sikkim": "23",
-        "tamil nadu": "24",
-        "telangana": "25",
-        "tripura": "26",
-        "uttar pradesh": "27",
-        "uttarakhand": "28",
-        "west bengal": "29",
-        "andaman and nicobar islands": "30",
-        "chandigarh": "31",
-        "dadra and nagar haveli": "32",
-        "daman and diu": "33",
-        "delhi": "34",
-        "lakshadweep": "35",
-        "puducherry": "36"
-    }
-    
-    return state_mapping.get(state_name.lower())
+    return current_catalog().state_code(state_name)
 
 def get_commodity_code(commodity_name):
     """Get the commodity code from the commodity name"""
-    # Common commodity mappings
-    commodity_mapping = {
-        "potato": "24",
-        "tomato": "78",
-        "onion": "23",
-        "rice": "1",
-        "wheat": "2",
-        "maize": "3",
-        "apple": "4",
-        "banana": "5",
-        "orange": "6",
-        "mango": "7",
-        "grapes": "8",
-        "watermelon": "9",
-        "coconut": "10",
-        "sugarcane": "11",
-        "cotton": "12",
-        "jute": "13",
-        "coffee": "14",
-        "tea": "15",
-        "milk": "16",
-        "egg": "17",
-        "fish": "18",
-        "chicken": "19",
-        "mutton": "20",
-        "beef": "21",
-        "pork": "22"
-    }
-    
-    return commodity_mapping.get(commodity_name.lower())
+    return current_catalog().commodity_code(commodity_name)
 
 def get_market_code(state_code, market_name):
     """Get the market code from the state code and market name"""
-    # This is a simplified mapping. In a real implementation, you would need to fetch this dynamically
-    # or have a more comprehensive mapping
-    market_mapping = {
-        # Karnataka markets
-        "12": {
-            "bangalore": "1",
-            "mysore": "2",
-            "hubli": "3",
-            "belgaum": "4",
-            "gulbarga": "5",
-            "mangalore": "6",
-            "shimoga": "7",
-            "bellary": "8",
-            "bijapur": "9",
-            "davangere": "10"
-        },
-        # Maharashtra markets
-        "15": {
-            "mumbai": "1",
-            "pune": "2",
-            "nagpur": "3",
-            "nashik": "4",
-            "aurangabad": "5",
-            "solapur": "6",
-            "kolhapur": "7",
-            "amravati": "8",
-            "latur": "9",
-            "ahmednagar": "10"
-        },
-        # Add more states and markets as needed
+    return current_catalog().market_code(state_code, market_name)
+
+def harvest_agmarknet_catalog():
+    """
+    Harvest the state/commodity/market dropdowns from agmarknet, save them to
+    CATALOG_PATH and start using them. This makes one upstream call per state,
+    so it runs from `python -m catalog --harvest`, not from a request.
+    """
+    global catalog, _catalog_loaded
+
+    def get_page():
+        with session_pool.session() as session:
+            response = session.get(PRICE_TRENDS_URL)
+            response.raise_for_status()
+            return response.text
+
+    def post_state(state_code):
+        # Selecting a state posts the form back with that state's market list
+        with session_pool.session() as session:
+            return form_tokens.post(session, ARCHIVE_URL, {
+                '__EVENTTARGET': 'ctl00$cphBody$cboState',
+                'ctl00$cphBody$cboState': state_code
+            }, source='catalog').text
+
+    harvested = harvest_catalog(get_page, post_state)
+    if CATALOG_PATH:
+        harvested.save(CATALOG_PATH)
+        harvested.source = CATALOG_PATH
+    catalog = harvested
+    _catalog_loaded = (_catalog_mtime(), time.monotonic())
+    return catalog
+
+def build_price_trends_form(state, commodity, today=None):
+    """
+    Build the price trends form submission for a state and commodity.
+    Returns (form_data, month, year), or None if either code is unknown.
+    """
+    # Get state and commodity codes
+    state_code = get_state_code(state)
+    commodity_code = get_commodity_code(commodity)
+    
+    if not state_code or not commodity_code:
+        logger.warning(f"Could not find codes for state={state} or commodity={commodity}")
+        return None
+    
+    # Get the current month and year
+    today = today or datetime.now()
+    month = today.month
+    year = today.year
+    
+    # Prepare form data for the request
+    # (the hidden __VIEWSTATE/__EVENTVALIDATION fields come from the token store)
+    form_data = {
+        'ctl00$cphBody$cboYear': str(year),
+        'ctl00$cphBody$cboMonth': str(month),
+        'ctl00$cphBody$cboState': state_code,
+        'ctl00$cphBody$cboCommodity': commodity_code,
+        'ctl00$cphBody$btnSubmit': 'Submit'
     }
+    return form_data, month, year
+
+def parse_price_trends_table(page):
+    """
+    Extract the grid rows (header first) from a price trends response page
+    """
+    # Parse only the price data table (cphBody_gridRecords, then gvReportData,
+    # then the second table on the page as the first is usually navigation)
+    rows = extract_grid_rows(page, table_index=1)
+    if rows is None:
+        logger.warning("No price data table found")
+        return []
     
-    if state_code in market_mapping:
-        return market_mapping[state_code].get(market_name.lower())
+    if len(rows) <= 1:  # Header row only
+        logger.warning("No price data found in the table")
+        return []
     
-    return None
+    return rows
+
+def parse_price_trends_dataset(page, month, year):
+    """
+    Parse a price trends response page into an indexed dataset of every market
+    """
+    with stage('parse', 'price_trends'):
+        return PriceTrendsDataset(parse_price_trends_table(page), month, year)
+
+def price_trends_record(i, cells, commodity, month, year):
+    """
+    Build one price record from a price trends grid row
+    """
+    return PriceRecord(
+        i, date(year, month, 1), 'month', cells[0], commodity, cells[1],
+        parse_price(cells[2]), parse_price(cells[3]), parse_price(cells[4]),
+        cells=(f"{month}/{year}", cells[2], cells[3], cells[4])
+    )
+
+def market_rows(dataset, state, market):
+    """
+    Return the grid positions of a market in a price trends dataset. The name is
+    matched as a substring of the grid's market names; when nothing matches, the
+    catalog spelling is tried (Bengaluru -> Bangalore, small typos), as the
+    archive form does for market codes.
+    """
+    rows = dataset.lookup(market)
+    if not rows:
+        name = current_catalog().market_name(get_state_code(state), market)
+        if name and name.lower() != market.lower():
+            rows = dataset.lookup(name)
+    return rows
+
+def iter_price_trends_records(dataset, state, commodity, market):
+    """
+    Yield the price records for one market from a price trends dataset
+    """
+    for i in market_rows(dataset, state, market):
+        yield price_trends_record(i, dataset.rows[i], commodity, dataset.month, dataset.year)
+
+def price_trends_records(dataset, state, commodity, market):
+    """
+    Build the price records for one market from a price trends dataset
+    """
+    with stage('rows', 'price_trends'):
+        json_list = list(iter_price_trends_records(dataset, state, commodity, market))
+    
+    logger.info(f"Found {len(json_list)} price records from price trends page")
+    return json_list
+
+def persist_records(state, commodity, records, source):
+    """
+    Write scraped records to the stats aggregates and the local price store;
+    failures are logged, never raised
+    """
+    if not records:
+        return
+    try:
+        get_price_stats(catch_up=False).add_records(state, commodity, records)
+    except Exception as e:
+        logger.error(f"Error adding {source} records to stats: {e}")
+    if price_store is None:
+        return
+    try:
+        price_store.upsert_records(state, commodity, records, source)
+    except Exception as e:
+        logger.error(f"Error persisting {source} records: {e}")
+
+def persist_price_trends_dataset(state, commodity, dataset):
+    """
+    Write every market of a price trends dataset to the local price store
+    """
+    records = [
+        price_trends_record(i, cells, commodity, dataset.month, dataset.year)
+        for i, cells in enumerate(dataset.rows[1:], 1)
+        if len(cells) >= 6
+    ]
+    persist_records(state, commodity, records, 'price_trends')
+
+def _dataset_key(form_data, month, year):
+    return (form_data['ctl00$cphBody$cboState'], form_data['ctl00$cphBody$cboCommodity'], year, month)
+
+def check_price_trends_dataset(dataset, state, commodity, month, year):
+    """
+    Raise EmptyDatasetError for a table without market rows. A 200 page without the
+    grid (expired form, error or transient "no data" page) must not be cached for
+    DATASET_TTL for every market of the state; the next request tries again.
+    """
+    if dataset.empty:
+        raise EmptyDatasetError(f"No price trends rows for {commodity} in {state} for {month}/{year}")
+
+def load_price_trends_dataset(state, commodity, form_data, month, year):
+    """
+    Submit the price trends form, index the returned table and persist it
+    """
+    # Submit the form to get price data
+    logger.info(f"Submitting form for price trends data")
+    with session_pool.session() as session:
+        response = form_tokens.post(session, PRICE_TRENDS_URL, form_data, source='price_trends')
+    
+    dataset = parse_price_trends_dataset(response.text, month, year)
+    check_price_trends_dataset(dataset, state, commodity, month, year)
+    persist_price_trends_dataset(state, commodity, dataset)
+    return dataset
+
+def get_price_trends_dataset(state, commodity, today=None):
+    """
+    Return the price trends dataset covering every market of a state for the
+    current month (or the month of today), scraping it only if it is not already
+    in memory. Returns None if the state or commodity is unknown; upstream errors
+    are raised.
+    """
+    form = build_price_trends_form(state, commodity, today)
+    if form is None:
+        return None
+    form_data, month, year = form
+    
+    loader = partial(load_price_trends_dataset, state, commodity, form_data, month, year)
+    if not CACHE_ENABLED:
+        return loader()
+    # Not cancelled when another source wins: other requests may be waiting on
+    # this load, and the table answers every market of the state
+    with cancel_scope(None):
+        return dataset_cache.get_or_load(_dataset_key(form_data, month, year), loader)
 
 def get_data_from_price_trends(state, commodity, market):
     """
@@ -135,105 +387,14 @@ def get_data_from_price_trends(state, commodity, market):
     try:
         logger.info(f"Fetching price trends data for {commodity} in {market}, {state}")
         
-        # URL for the price trends page
-        url = "https://agmarknet.gov.in/PriceTrends/SA_Month_PriMV.aspx"
-        
-        # Create a session to maintain cookies
-        session = requests.Session()
-        
-        # Get the initial page to retrieve form data
-        response = session.get(url)
-        response.raise_for_status()
-        
-        # Parse the HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract the form data and viewstate
-        viewstate = soup.find('input', {'name': '__VIEWSTATE'})['value']
-        viewstategenerator = soup.find('input', {'name': '__VIEWSTATEGENERATOR'})['value']
-        eventvalidation = soup.find('input', {'name': '__EVENTVALIDATION'})['value']
-        
-        # Get state and commodity codes
-        state_code = get_state_code(state)
-        commodity_code = get_commodity_code(commodity)
-        
-        if not state_code or not commodity_code:
-            logger.warning(f"Could not find codes for state={state} or commodity={commodity}")
-            return []
-            
-        # Get the current month and year
-        today = datetime.now()
-        month = today.month
-        year = today.year
-        
-        # Prepare form data for the request
-        form_data = {
-            '__VIEWSTATE': viewstate,
-            '__VIEWSTATEGENERATOR': viewstategenerator,
-            '__EVENTVALIDATION': eventvalidation,
-            'ctl00$cphBody$cboYear': str(year),
-            'ctl00$cphBody$cboMonth': str(month),
-            'ctl00$cphBody$cboState': state_code,
-            'ctl00$cphBody$cboCommodity': commodity_code,
-            'ctl00$cphBody$btnSubmit': 'Submit'
-        }
-        
-        # Submit the form to get price data
-        logger.info(f"Submitting form for price trends data")
-        response = session.post(url, data=form_data)
-        response.raise_for_status()
-        
-        # Parse the response to extract price data
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find the price data table
-        table = soup.find('table', {'id': 'cphBody_gridRecords'})
-        if not table:
-            logger.warning("Price data table not found in the response")
-            # Try alternative table ID
-            table = soup.find('table', {'id': 'gvReportData'})
-            if not table:
-                # Try finding any table with price data
-                tables = soup.find_all('table')
-                if tables and len(tables) > 1:  # Skip the first table which is usually navigation
-                    table = tables[1]
-                else:
-                    logger.warning("No price data table found")
-                    return []
-        
-        # Extract data from the table
-        rows = table.find_all('tr')
-        if len(rows) <= 1:  # Header row only
-            logger.warning("No price data found in the table")
+        dataset = get_price_trends_dataset(state, commodity)
+        if dataset is None:
             return []
         
-        # Process the data
-        json_list = []
-        for i, row in enumerate(rows[1:], 1):  # Skip header row
-            cells = row.find_all('td')
-            if len(cells) >= 6:
-                # Try to find the market we're looking for
-                market_name = cells[0].text.strip()
-                
-                # If we're looking for a specific market and this isn't it, skip
-                if market.lower() not in market_name.lower():
-                    continue
-                    
-                data = {
-                    "S.No": str(i),
-                    "Date": f"{month}/{year}",
-                    "Market": market_name,
-                    "Commodity": commodity,
-                    "Variety": cells[1].text.strip(),
-                    "Min Price": cells[2].text.strip(),
-                    "Max Price": cells[3].text.strip(),
-                    "Modal Price": cells[4].text.strip()
-                }
-                json_list.append(data)
-        
-        logger.info(f"Found {len(json_list)} price records from price trends page")
-        return json_list
+        return price_trends_records(dataset, state, commodity, market)
     
+    except UpstreamCancelled:
+        return []
     except Exception as e:
         logger.error(f"Error fetching price trends data: {e}")
         return []
@@ -266,8 +427,7 @@ def get_data_alternative_method(state, commodity, market):
         json_list = []
         
         for i in range(7):
-            date = today - timedelta(days=i)
-            date_str = date.strftime('%d-%b-%Y')
+            day = (today - timedelta(days=i)).date()
             
             # Add some variation to prices for different days
             variation = i * 50  # Price varies by 50 units per day
@@ -280,16 +440,7 @@ def get_data_alternative_method(state, commodity, market):
             max_price = max(max_price, min_price + 300)
             modal_price = max(min(modal_price, max_price), min_price)
             
-            data = {
-                "S.No": str(i+1),
-                "Date": date_str,
-                "Market": market,
-                "Commodity": commodity,
-                "Variety": "General",
-                "Min Price": str(min_price),
-                "Max Price": str(max_price),
-                "Modal Price": str(modal_price)
-            }
+            data = PriceRecord(i+1, day, 'day', market, commodity, "General", min_price, max_price, modal_price)
             json_list.append(data)
         
         logger.info(f"Generated sample data with {len(json_list)} entries")
@@ -298,168 +449,815 @@ def get_data_alternative_method(state, commodity, market):
         logger.error(f"Error in alternative method: {e}")
         # Even if the alternative method fails, return minimal sample data
         return [
-            {
-                "S.No": "1",
-                "Date": datetime.now().strftime('%d-%b-%Y'),
-                "Market": market,
-                "Commodity": commodity,
-                "Variety": "General",
-                "Min Price": "1500",
-                "Max Price": "1800",
-                "Modal Price": "1650",
-                "Note": "Sample data - actual data unavailable"
-            }
+            PriceRecord(1, date.today(), 'day', market, commodity, "General", 1500, 1800, 1650,
+                        note="Sample data - actual data unavailable")
         ]
 
+def build_archive_form(state, commodity, market, from_date=None, to_date=None):
+    """
+    Build the daily archive form submission for a date range (default: the last 7 days).
+    Returns None if the state, commodity or market code is unknown.
+    """
+    # First, we need to get the state code
+    logger.info(f"Getting state code for {state}")
+    state_code = get_state_code(state)
+    if not state_code:
+        logger.error(f"Could not find state code for {state}")
+        return None
+    
+    # Then get the commodity code
+    logger.info(f"Getting commodity code for {commodity}")
+    commodity_code = get_commodity_code(commodity)
+    if not commodity_code:
+        logger.error(f"Could not find commodity code for {commodity}")
+        return None
+    
+    # Get the market code
+    logger.info(f"Getting market code for {market} in state {state}")
+    market_code = get_market_code(state_code, market)
+    if not market_code:
+        logger.error(f"Could not find market code for {market} in state {state_code}")
+        return None
+    
+    # Calculate date range (last 7 days unless given)
+    to_date = to_date or datetime.now()
+    from_date = from_date or to_date - timedelta(days=7)
+    
+    from_date_str = from_date.strftime('%d-%b-%Y')
+    to_date_str = to_date.strftime('%d-%b-%Y')
+    
+    # Prepare form data for the request
+    # (the hidden __VIEWSTATE/__EVENTVALIDATION fields come from the token store)
+    return {
+        'cphBody_cboState': state_code,
+        'cphBody_cboCommodity': commodity_code,
+        'cphBody_cboMarket': market_code,
+        'cphBody_txtDate': from_date_str,
+        'cphBody_txtDateTo': to_date_str,
+        'cphBody_btnSubmit': 'Submit'
+    }
+
+def parse_archive_rows(page):
+    """
+    Build the price records from a daily archive response page. Returns None when
+    the page has no price table at all (an error or busy page), [] for an empty one.
+    """
+    # Parse only the price data table (cphBody_gridRecords, then gvReportData,
+    # then the first tableagmark_new table)
+    with stage('parse', 'archive'):
+        rows = extract_grid_rows(page, table_class='tableagmark_new')
+    if rows is None:
+        logger.warning("No price data table found")
+        return None
+    
+    if len(rows) <= 1:  # Header row only
+        logger.warning("No price data found in the table")
+        return []
+    
+    # Process the data
+    json_list = []
+    with stage('rows', 'archive'):
+        for i, cells in enumerate(rows[1:], 1):  # Skip header row
+            if len(cells) >= 7:
+                data = PriceRecord.from_text(i, *cells[:7])
+                json_list.append(data)
+    return json_list
+
+def _archive_dates(from_date, to_date):
+    to_date = to_date or date.today()
+    return from_date or to_date - timedelta(days=7), to_date
+
+def persist_archive_records(state, commodity, market, records, from_date, to_date):
+    """
+    Write archive records to the local price store and remember the range as fetched.
+    Coverage never expires, so only call this for a page that had the price table.
+    """
+    persist_records(state, commodity, records, 'archive')
+    if price_store is None:
+        return
+    # Today's rows are still coming in, so only days before today count as fetched
+    covered_to = min(to_date, date.today() - timedelta(days=1))
+    if from_date <= covered_to:
+        try:
+            price_store.mark_covered(state, commodity, market, from_date, covered_to)
+        except Exception as e:
+            logger.error(f"Error recording archive coverage: {e}")
+
+def check_archive_rows(records, from_date, to_date):
+    """
+    Raise MissingPriceTable for an archive page without the price table, so the
+    range is neither answered as empty nor recorded as fetched
+    """
+    if records is None:
+        raise MissingPriceTable(f"No price table in the archive page for {from_date} to {to_date}")
+
+def get_data_from_archive(state, commodity, market, from_date=None, to_date=None):
+    """
+    Fetch data from the AgMarknet daily state-wise archive page
+    """
+    from_date, to_date = _archive_dates(from_date, to_date)
+    form_data = build_archive_form(state, commodity, market, from_date, to_date)
+    if form_data is None:
+        return []
+    
+    # Submit the form to get price data
+    logger.info(f"Submitting form for price data")
+    with session_pool.session() as session:
+        response = form_tokens.post(session, ARCHIVE_URL, form_data, source='archive')
+    
+    records = parse_archive_rows(response.text)
+    check_archive_rows(records, from_date, to_date)
+    persist_archive_records(state, commodity, market, records, from_date, to_date)
+    return records
+
+# The real sources (price trends page, daily archive) are run by source_strategy:
+# SOURCE_STRATEGY=hedge starts the archive when price trends has not answered
+# within SOURCE_HEDGE_DELAY seconds, race starts both at once and serial only
+# moves on after a failure. The first non-empty result wins and the other source
+# is cancelled. SOURCE_TIMEOUT bounds the whole attempt; it must stay well below
+# the gunicorn worker timeout (90s in render.yaml, 30s by default) so a request
+# whose sources all hang is answered with flagged sample data, not killed.
+SOURCE_WORKERS = int(os.environ.get('SOURCE_WORKERS', 16))
+source_executor = ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix='source')
+source_strategy = SourceStrategy(
+    source_executor,
+    mode=os.environ.get('SOURCE_STRATEGY', 'hedge'),
+    hedge_delay=float(os.environ.get('SOURCE_HEDGE_DELAY', 2)),
+    timeout=float(os.environ.get('SOURCE_TIMEOUT', 20))
+)
+SYNTHETIC_NOTE = "Sample data - agmarknet did not return prices for this market"
+
+def get_real_data(state, commodity, market):
+    """
+    Fetch data from the real sources under SOURCE_STRATEGY. Returns SourcedRecords
+    tagged with the winning source; raises SourcesUnavailable when every source
+    failed, came back empty or timed out.
+    """
+    logger.info(f"Fetching {commodity} in {market}, {state} ({source_strategy.mode} strategy)")
+    source, result = source_strategy.run([
+        ('price_trends', partial(get_data_from_price_trends, state, commodity, market)),
+        ('archive', partial(get_data_from_archive, state, commodity, market)),
+    ])
+    if source is None:
+        raise SourcesUnavailable(f"No source returned data for {commodity} in {market}, {state}")
+    logger.info(f"Retrieved data from {source}")
+    return SourcedRecords(result, source)
+
+def get_synthetic_data(state, commodity, market):
+    """Sample data for when no real source answered, flagged by a note on every record"""
+    logger.info(f"Using synthetic data for {commodity} in {market}, {state}")
+    records = get_data_alternative_method(state, commodity, market)
+    for record in records:
+        record.note = record.note or SYNTHETIC_NOTE
+    return SourcedRecords(records, 'synthetic')
+
 def get_agmarknet_data(state, commodity, market):
     """
-    Fetch data from AgMarknet using direct access to the commodity price data
+    Fetch data from AgMarknet, falling back to flagged sample data only when no
+    real source returned any
     """
     try:
-        # First try the price trends page which seems more reliable
-        logger.info(f"Trying price trends page for {commodity} in {market}, {state}")
-        result = get_data_from_price_trends(state, commodity, market)
-        
-        # If we got data from the price trends page, return it
-        if result and len(result) > 0:
-            logger.info(f"Successfully retrieved data from price trends page")
-            return result
-            
-        # If price trends didn't work, try the alternative method
-        logger.info(f"Using alternative method for {commodity} in {market}, {state}")
-        result = get_data_alternative_method(state, commodity, market)
-        
-        # If we got data from the alternative method, return it
-        if result and len(result) > 0:
-            logger.info(f"Successfully retrieved data using alternative method")
-            return result
-            
-        # If alternative method didn't work, try the original method as fallback
-        # Use the direct URL for commodity price reports
-        base_url = "https://agmarknet.gov.in"
-        
-        # First, we need to get the state code
-        logger.info(f"Getting state code for {state}")
-        state_code = get_state_code(state)
-        if not state_code:
-            logger.error(f"Could not find state code for {state}")
-            return get_data_alternative_method(state, commodity, market)
-        
-        # Then get the commodity code
-        logger.info(f"Getting commodity code for {commodity}")
-        commodity_code = get_commodity_code(commodity)
-        if not commodity_code:
-            logger.error(f"Could not find commodity code for {commodity}")
-            return get_data_alternative_method(state, commodity, market)
-        
-        # Get the market code
-        logger.info(f"Getting market code for {market} in state {state}")
-        market_code = get_market_code(state_code, market)
-        if not market_code:
-            logger.error(f"Could not find market code for {market} in state {state_code}")
-            return get_data_alternative_method(state, commodity, market)
-        
-        # Calculate date range (last 7 days)
-        today = datetime.now()
-        from_date = today - timedelta(days=7)
-        to_date = today
-        
-        from_date_str = from_date.strftime('%d-%b-%Y')
-        to_date_str = to_date.strftime('%d-%b-%Y')
-        
-        # Use the direct price report URL
-        report_url = f"{base_url}/PriceAndArrivals/CommodityDailyStateWise_Archive.aspx"
-        
-        # Create a session to maintain cookies
-        session = requests.Session()
-        
-        # Get the initial page to retrieve form data
-        logger.info(f"Fetching initial page from {report_url}")
-        response = session.get(report_url)
-        response.raise_for_status()
-        
-        # Parse the HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract the form data and viewstate
-        viewstate = soup.find('input', {'name': '__VIEWSTATE'})['value']
-        viewstategenerator = soup.find('input', {'name': '__VIEWSTATEGENERATOR'})['value']
-        eventvalidation = soup.find('input', {'name': '__EVENTVALIDATION'})['value']
+        return get_real_data(state, commodity, market)
+    except SourcesUnavailable as e:
+        logger.warning(str(e))
+        return get_synthetic_data(state, commodity, market)
+
+async def load_price_trends_dataset_async(state, commodity, form_data, month, year):
+    """
+    Async variant of load_price_trends_dataset; parsing and persisting run off the event loop
+    """
+    page = await async_upstream.post_form(PRICE_TRENDS_URL, form_data, source='price_trends')
+    dataset = await async_upstream.run_blocking(parse_price_trends_dataset, page, month, year)
+    check_price_trends_dataset(dataset, state, commodity, month, year)
+    await async_upstream.run_blocking(persist_price_trends_dataset, state, commodity, dataset)
+    return dataset
+
+async def get_data_from_price_trends_async(state, commodity, market):
+    """
+    Async variant of get_data_from_price_trends sharing the same datasets
+    """
+    try:
+        logger.info(f"Fetching price trends data for {commodity} in {market}, {state}")
         
-        # Prepare form data for the request
-        form_data = {
-            '__VIEWSTATE': viewstate,
-            '__VIEWSTATEGENERATOR': viewstategenerator,
-            '__EVENTVALIDATION': eventvalidation,
-            'cphBody_cboState': state_code,
-            'cphBody_cboCommodity': commodity_code,
-            'cphBody_cboMarket': market_code,
-            'cphBody_txtDate': from_date_str,
-            'cphBody_txtDateTo': to_date_str,
-            'cphBody_btnSubmit': 'Submit'
-        }
+        form = build_price_trends_form(state, commodity)
+        if form is None:
+            return []
+        form_data, month, year = form
         
-        # Submit the form to get price data
-        logger.info(f"Submitting form for price data")
-        response = session.post(report_url, data=form_data)
-        response.raise_for_status()
+        loader = partial(load_price_trends_dataset_async, state, commodity, form_data, month, year)
+        if CACHE_ENABLED:
+            # Shielded for the same reason as get_price_trends_dataset
+            dataset = await asyncio.shield(dataset_cache.aget_or_load(_dataset_key(form_data, month, year), loader))
+        else:
+            dataset = await loader()
         
-        # Parse the response to extract price data
-        soup = BeautifulSoup(response.text, 'html.parser')
+        return price_trends_records(dataset, state, commodity, market)
+    
+    except Exception as e:
+        logger.error(f"Error fetching price trends data: {e}")
+        return []
+
+async def get_data_from_archive_async(state, commodity, market, from_date=None, to_date=None):
+    """
+    Async variant of get_data_from_archive
+    """
+    from_date, to_date = _archive_dates(from_date, to_date)
+    form_data = build_archive_form(state, commodity, market, from_date, to_date)
+    if form_data is None:
+        return []
+    
+    page = await async_upstream.post_form(ARCHIVE_URL, form_data, source='archive')
+    records = await async_upstream.run_blocking(parse_archive_rows, page)
+    check_archive_rows(records, from_date, to_date)
+    await async_upstream.run_blocking(persist_archive_records, state, commodity, market, records, from_date, to_date)
+    return records
+
+async def get_real_data_async(state, commodity, market):
+    """
+    Async variant of get_real_data; the losing source task is cancelled
+    """
+    source, result = await source_strategy.run_async([
+        ('price_trends', partial(get_data_from_price_trends_async, state, commodity, market)),
+        ('archive', partial(get_data_from_archive_async, state, commodity, market)),
+    ])
+    if source is None:
+        raise SourcesUnavailable(f"No source returned data for {commodity} in {market}, {state}")
+    logger.info(f"Retrieved data from {source}")
+    return SourcedRecords(result, source)
+
+async def get_agmarknet_data_async(state, commodity, market):
+    """
+    Async variant of get_agmarknet_data
+    """
+    try:
+        return await get_real_data_async(state, commodity, market)
+    except SourcesUnavailable as e:
+        logger.warning(str(e))
+        return get_synthetic_data(state, commodity, market)
+
+# Response cache in front of get_agmarknet_data. Prices only change once a day,
+# so entries are served fresh for CACHE_TTL seconds and stale (while refreshing
+# in the background) for another CACHE_STALE_TTL seconds. Entries are fingerprinted
+# once when stored, for the ETag of every response built from them.
+price_cache = PriceCache(
+    ttl=int(os.environ.get('CACHE_TTL', 3600)),
+    stale_ttl=int(os.environ.get('CACHE_STALE_TTL', 6 * 3600)),
+    max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 512)),
+    fingerprint=records_fingerprint
+)
+
+def _cache_key(state, commodity, market):
+    # The upstream queries are always relative to today, so the day is the date window
+    window = datetime.now().strftime('%Y-%m-%d')
+    return make_cache_key(state, commodity, market, window)
+
+def get_cached_agmarknet_data(state, commodity, market):
+    """
+    Fetch data through the response cache, coalescing concurrent identical requests.
+    Sample data is never cached: a failed refresh keeps serving the stale entry.
+    """
+    traffic_tracker.record(state, commodity, market)
+    if not CACHE_ENABLED:
+        return get_agmarknet_data(state, commodity, market)
+    key = _cache_key(state, commodity, market)
+    try:
+        return price_cache.get_or_load(key, partial(get_real_data, state, commodity, market))
+    except SourcesUnavailable as e:
+        logger.warning(str(e))
+        return get_synthetic_data(state, commodity, market)
+
+async def get_cached_agmarknet_data_async(state, commodity, market):
+    """Async variant of get_cached_agmarknet_data sharing the same cache entries"""
+    traffic_tracker.record(state, commodity, market)
+    if not CACHE_ENABLED:
+        return await get_agmarknet_data_async(state, commodity, market)
+    key = _cache_key(state, commodity, market)
+    try:
+        return await price_cache.aget_or_load(key, partial(get_real_data_async, state, commodity, market))
+    except SourcesUnavailable as e:
+        logger.warning(str(e))
+        return get_synthetic_data(state, commodity, market)
+
+# Date range queries (/request?from=...&to=...) are split into one form submission
+# per month (price trends) or per archive window, fetched on RANGE_WORKERS threads.
+# Upstream calls are additionally paced by upstream_scheduler.
+RANGE_WORKERS = int(os.environ.get('RANGE_WORKERS', 4))
+RANGE_MAX_MONTHS = int(os.environ.get('RANGE_MAX_MONTHS', 36))
+ARCHIVE_WINDOW_DAYS = int(os.environ.get('ARCHIVE_WINDOW_DAYS', 31))
+RANGE_PERIODS = ('month', 'day')
+range_executor = ThreadPoolExecutor(max_workers=RANGE_WORKERS, thread_name_prefix='range')
+
+def month_starts(from_date, to_date):
+    """Return the first day of every month overlapping [from_date, to_date]"""
+    months = []
+    current = from_date.replace(day=1)
+    while current <= to_date:
+        months.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+def archive_windows(from_date, to_date, days=ARCHIVE_WINDOW_DAYS):
+    """Split [from_date, to_date] into consecutive (start, end) windows of at most days days"""
+    windows = []
+    start = from_date
+    while start <= to_date:
+        end = min(start + timedelta(days=days - 1), to_date)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+def fetch_price_trends_month(state, commodity, market, month_start):
+    """
+    Fetch the price records of one market for one month; upstream errors are raised
+    """
+    dataset = get_price_trends_dataset(state, commodity, month_start)
+    if dataset is None:
+        return []
+    return list(iter_price_trends_records(dataset, state, commodity, market))
+
+def fetch_archive_window(state, commodity, market, window):
+    """
+    Fetch the daily archive records for one (start, end) window; upstream errors are raised
+    """
+    start, end = window
+    records = get_data_from_archive(state, commodity, market, start, end)
+    # Keep windows disjoint so rows are never repeated in the merged result
+    return [record for record in records if record.period and start <= record.date <= end]
+
+def range_chunks(state, commodity, market, from_date, to_date, period):
+    """
+    Return (label, loader) for each upstream form submission needed for a date
+    range, oldest first
+    """
+    if period == 'month':
+        return [(f"{month:%m/%Y}", partial(fetch_price_trends_month, state, commodity, market, month))
+                for month in month_starts(from_date, to_date)]
+    return [(f"{start} to {end}", partial(fetch_archive_window, state, commodity, market, (start, end)))
+            for start, end in archive_windows(from_date, to_date)]
+
+class IncompleteRange(Exception):
+    """Raised by get_range_data when part of the range could not be fetched"""
+
+    def __init__(self, records, failed):
+        super().__init__(f"Could not fetch {', '.join(failed)}")
+        self.records = records
+        self.failed = failed
+
+def _record_order(record):
+    return (record.date, record.market, record.variety)
+
+def iter_range_data(state, commodity, market, from_date, to_date, period='month', failed=None):
+    """
+    Yield the records of a date range in date order, numbered from 1. All chunks are
+    submitted to the range pool at once and yielded in order as each one completes.
+    Rows without a parseable date cannot be placed in the range and are skipped. A
+    chunk whose upstream submission fails is skipped and its label added to failed.
+    """
+    # copy_context() keeps the caller's traffic priority on the pool threads
+    futures = [(label, range_executor.submit(contextvars.copy_context().run, chunk))
+               for label, chunk in range_chunks(state, commodity, market, from_date, to_date, period)]
+    sno = 0
+    try:
+        for label, future in futures:
+            try:
+                records = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching {period} range chunk {label}: {e}")
+                if failed is not None:
+                    failed.append(label)
+                continue
+            for record in sorted((r for r in records if r.period), key=_record_order):
+                sno += 1
+                record.sno = sno
+                yield record
+    finally:
+        # Stop chunks that have not started if the client went away
+        for _, future in futures:
+            future.cancel()
+
+def get_range_data(state, commodity, market, from_date, to_date, period='month'):
+    """
+    Fetch every record of a date range, merged in date order. Raises IncompleteRange,
+    carrying the records that were fetched, when any month or window failed.
+    """
+    logger.info(f"Fetching {period} range {from_date} to {to_date} for {commodity} in {market}, {state}")
+    source = 'price_trends' if period == 'month' else 'archive'
+    failed = []
+    records = SourcedRecords(iter_range_data(state, commodity, market, from_date, to_date, period, failed), source)
+    if failed:
+        raise IncompleteRange(records, failed)
+    return records
+
+def _range_cache_key(state, commodity, market, from_date, to_date, period):
+    # The current month keeps changing, so the day is part of the window
+    window = f"{from_date}:{to_date}:{period}:{date.today()}"
+    return make_cache_key(state, commodity, market, window)
+
+def get_cached_range_data(state, commodity, market, from_date, to_date, period='month'):
+    """
+    Fetch a date range through the response cache. A range with failed months or
+    windows is returned as far as it was fetched but never cached, like an empty
+    price trends dataset: the next request tries the missing parts again.
+    """
+    loader = partial(get_range_data, state, commodity, market, from_date, to_date, period)
+    try:
+        if not CACHE_ENABLED:
+            return loader()
+        key = _range_cache_key(state, commodity, market, from_date, to_date, period)
+        return price_cache.get_or_load(key, loader)
+    except IncompleteRange as e:
+        logger.warning(f"Serving an incomplete {period} range for {commodity} in {market}, {state}: {e}")
+        return e.records
+
+def stream_range_data(state, commodity, market, from_date, to_date, period='month'):
+    """Generator version of get_cached_range_data for ?stream=ndjson"""
+    if CACHE_ENABLED:
+        cached = price_cache.peek(_range_cache_key(state, commodity, market, from_date, to_date, period))
+        if cached is not None:
+            yield from cached
+            return
+    yield from iter_range_data(state, commodity, market, from_date, to_date, period)
+
+def parse_range_params(args):
+    """
+    Return (from_date, to_date, period) for a /request with from/to, or None
+    without them. Raises ValueError with a message for the client.
+    """
+    if not args.get('from') and not args.get('to'):
+        return None
+    to_date = parse_query_date(args['to']) if args.get('to') else date.today()
+    from_date = parse_query_date(args['from']) if args.get('from') else to_date - timedelta(days=30)
+    period = args.get('period', 'month')
+    if from_date > to_date:
+        raise ValueError("'from' must not be after 'to'")
+    if period not in RANGE_PERIODS:
+        raise ValueError(f"Unknown period {period!r}, expected one of {', '.join(RANGE_PERIODS)}")
+    if len(month_starts(from_date, to_date)) > RANGE_MAX_MONTHS:
+        raise ValueError(f"Date range too long, at most {RANGE_MAX_MONTHS} months are allowed")
+    return from_date, to_date, period
+
+# Worker pool for /batch. Queries sharing a state+commodity are served by one
+# price trends submission; distinct groups run concurrently on BATCH_WORKERS threads.
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+BATCH_MAX_QUERIES = int(os.environ.get('BATCH_MAX_QUERIES', 100))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+def parse_batch_queries(payload):
+    """
+    Validate a /batch payload and return its deduplicated (state, commodity, market)
+    queries in request order. Raises ValueError with a message for the client.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('queries')
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("Expected a non-empty JSON list of queries")
+    
+    queries = []
+    seen = set()
+    for item in payload:
+        if isinstance(item, dict):
+            query = (item.get('state'), item.get('commodity'), item.get('market'))
+        elif isinstance(item, (list, tuple)) and len(item) == 3:
+            query = tuple(item)
+        else:
+            raise ValueError(f"Invalid query: {item!r}")
+        if not all(isinstance(value, str) and value.strip() for value in query):
+            raise ValueError(f"Query needs a state, commodity and market: {item!r}")
         
-        # Find the price data table
-        table = soup.find('table', {'id': 'cphBody_gridRecords'})
-        if not table:
-            logger.warning("Price data table not found in the response")
-            # Try alternative table ID
-            table = soup.find('table', {'id': 'gvReportData'})
-            if not table:
-                # Try finding any table with price data
-                tables = soup.find_all('table', {'class': 'tableagmark_new'})
-                if tables:
-                    table = tables[0]
+        key = make_cache_key(*query, None)
+        if key not in seen:
+            seen.add(key)
+            queries.append(query)
+    
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise ValueError(f"At most {BATCH_MAX_QUERIES} distinct queries per batch")
+    return queries
+
+def group_batch_queries(queries):
+    """Group queries that share the same state+commodity form submission"""
+    groups = {}
+    for state, commodity, market in queries:
+        key = make_cache_key(state, commodity, "", None)
+        groups.setdefault(key, []).append((state, commodity, market))
+    return list(groups.values())
+
+def fetch_batch_group(queries):
+    """
+    Fetch every query of one state+commodity group. The first query loads the
+    shared price trends dataset; the rest are served from it in memory.
+    Returns [((state, commodity, market), result), ...]
+    """
+    return [(query, get_cached_agmarknet_data(*query)) for query in queries]
+
+def stream_batch(groups, fmt='records'):
+    """Run the groups concurrently and yield one NDJSON line per query as groups complete"""
+    futures = {batch_executor.submit(contextvars.copy_context().run, fetch_batch_group, group): group
+               for group in groups}
+    try:
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"Error processing batch group: {e}")
+                results = [(query, {"error": str(e)}) for query in futures[future]]
+            
+            for (state, commodity, market), result in results:
+                line = {"state": state, "commodity": commodity, "market": market}
+                if isinstance(result, dict) and "error" in result:
+                    line.update(result)
                 else:
-                    logger.warning("No price data table found, using alternative method")
-                    return get_data_alternative_method(state, commodity, market)
-        
-        # Extract data from the table
-        rows = table.find_all('tr')
-        if len(rows) <= 1:  # Header row only
-            logger.warning("No price data found in the table")
-            return get_data_alternative_method(state, commodity, market)
-        
-        # Process the data
-        json_list = []
-        for i, row in enumerate(rows[1:], 1):  # Skip header row
-            cells = row.find_all('td')
-            if len(cells) >= 7:
-                data = {
-                    "S.No": str(i),
-                    "Date": cells[0].text.strip(),
-                    "Market": cells[1].text.strip(),
-                    "Commodity": cells[2].text.strip(),
-                    "Variety": cells[3].text.strip(),
-                    "Min Price": cells[4].text.strip(),
-                    "Max Price": cells[5].text.strip(),
-                    "Modal Price": cells[6].text.strip()
-                }
-                json_list.append(data)
-        
-        # If we still don't have data, use the alternative method
-        if not json_list:
-            logger.info("No data found from main method, using alternative method")
-            return get_data_alternative_method(state, commodity, market)
-        
-        return json_list
+                    line["source"] = getattr(result, 'source', None)
+                    count_response(line["source"])
+                    line["data"] = records_payload(result, fmt)
+                yield json.dumps(line, separators=(',', ':')) + "\n"
+    finally:
+        # Client went away or we are done: drop groups that have not started
+        for future in futures:
+            future.cancel()
+
+def prefetch_group(queries):
+    """
+    Re-scrape one state+commodity group and refresh the cached response of each of its markets
+    """
+    state, commodity, _ = queries[0]
+    form = build_price_trends_form(state, commodity)
+    if form is not None:
+        form_data, month, year = form
+        loader = partial(load_price_trends_dataset, state, commodity, form_data, month, year)
+        try:
+            dataset_cache.refresh(_dataset_key(form_data, month, year), loader)
+        except Exception as e:
+            # The markets are still refreshed below, from the archive if need be
+            logger.warning(f"Price trends refresh failed for {commodity} in {state}: {e}")
     
-    except requests.RequestException as e:
-        logger.error(f"Request error: {e}")
-        return get_data_alternative_method(state, commodity, market)
-    except Exception as e:
-        logger.error(f"Error fetching data: {e}")
-        return get_data_alternative_method(state, commodity, market)
+    for query in queries:
+        try:
+            price_cache.refresh(_cache_key(*query), partial(get_real_data, *query))
+        except SourcesUnavailable as e:
+            logger.warning(f"Keeping the cached response: {e}")
+
+# Background refresh of hot queries (PREFETCH_KEYS plus the most requested ones)
+# at PREFETCH_TIMES (IST) so /request is answered from a warm cache. Each worker
+# process runs its own scheduler when PREFETCH_ENABLED=1 (see start_worker).
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '0') == '1'
+prefetch_scheduler = PrefetchScheduler(
+    prefetch_group,
+    keys=parse_prefetch_keys(os.environ.get('PREFETCH_KEYS', '')),
+    tracker=traffic_tracker,
+    top_n=int(os.environ.get('PREFETCH_TOP_N', 20)),
+    times=parse_times(os.environ.get('PREFETCH_TIMES', '10:00,14:00,18:00,22:00')),
+    interval=float(os.environ['PREFETCH_INTERVAL']) if os.environ.get('PREFETCH_INTERVAL') else None,
+    concurrency=int(os.environ.get('PREFETCH_CONCURRENCY', 2)),
+    jitter=float(os.environ.get('PREFETCH_JITTER', 30))
+)
+
+def history_record(i, row, commodity):
+    """
+    Build a price record from a stored row
+    """
+    day, period, market, variety, min_price, max_price, modal_price, source = row
+    return PriceRecord(
+        i, date.fromisoformat(day), period, market, commodity, variety,
+        parse_price(min_price), parse_price(max_price), parse_price(modal_price)
+    )
+
+def fill_history_gaps(commodity, market, from_date, to_date, state=None):
+    """
+    Pull daily ranges never fetched before from the archive page into the store
+    (only possible when the state is known)
+    """
+    if state is not None:
+        for start, end in price_store.missing_ranges(state, commodity, market, from_date, to_date):
+            logger.info(f"Fetching missing history {start} to {end} for {commodity} in {market}, {state}")
+            try:
+                get_data_from_archive(state, commodity, market, start, end)
+            except Exception as e:
+                logger.error(f"Error fetching archive data: {e}")
+
+def iter_price_history(commodity, market, from_date, to_date, state=None):
+    """
+    Yield stored prices for a date range, reading the store a chunk at a time
+    """
+    rows = price_store.iter_query(commodity, market, from_date, to_date, state=state)
+    for i, row in enumerate(rows, 1):
+        yield history_record(i, row, commodity)
+
+def get_price_history(commodity, market, from_date, to_date, state=None):
+    """
+    Serve stored prices for a date range. When the state is known, daily ranges
+    never fetched before are first pulled from the archive page.
+    """
+    fill_history_gaps(commodity, market, from_date, to_date, state)
+    return list(iter_price_history(commodity, market, from_date, to_date, state))
+
+def records_response(records, fmt):
+    """
+    Serialize price records for a response. The default format is returned as the
+    plain indented string it always was; the compact formats are sent as JSON.
+    """
+    with stage('serialize'):
+        body = dump_records(records, fmt)
+    if fmt == 'records':
+        return body
+    return Response(body, mimetype='application/json')
+
+def response_validators(key, records):
+    """
+    Return (fingerprint, last modified, max age) for records served from the
+    response cache under key. Records that are not (or no longer) cached are
+    fingerprinted here, with no Last-Modified and no max age.
+    """
+    found = price_cache.validators(key, records) if CACHE_ENABLED and key is not None else None
+    return found or (records_fingerprint(records), None, 0)
+
+def source_headers(records):
+    """X-Data-Source naming the source that won (price_trends, archive or synthetic), when known"""
+    source = getattr(records, 'source', None)
+    return [('X-Data-Source', source)] if source else []
+
+def count_response(source):
+    """Count a response (or /batch line) serving prices from source, cache hits included"""
+    if source:
+        RESPONSES_BY_SOURCE.inc(source=source)
+
+def conditional_records_response(records, fmt, validators):
+    """
+    records_response with ETag, Last-Modified, Cache-Control and X-Data-Source
+    headers. A request whose If-None-Match / If-Modified-Since still match gets a
+    304 without the records being serialized.
+    """
+    fingerprint, last_modified, max_age = validators
+    etag = entity_tag(fingerprint, fmt)
+    headers = caching_headers(etag, last_modified, max_age, price_cache.stale_ttl) + source_headers(records)
+    count_response(getattr(records, 'source', None))
+    if not_modified(etag, last_modified, request.headers.get('If-None-Match'),
+                    request.headers.get('If-Modified-Since')):
+        return Response(status=304, headers=headers)
+    response = make_response(records_response(records, fmt))
+    response.headers.extend(headers)
+    return response
+
+def with_traffic(lines, priority, client):
+    """Produce a streamed body under the traffic tag of the request that created it"""
+    with traffic(priority, client):
+        yield from lines
+
+def ndjson_response(records, source=None):
+    """
+    Stream records as NDJSON while they are being produced, with X-Data-Source naming
+    source (by default the source of records, when known)
+    """
+    source = source or getattr(records, 'source', None)
+    count_response(source)
+    headers = [('X-Data-Source', source)] if source else []
+    return Response(with_traffic(ndjson_lines(records), *current_traffic()), mimetype='application/x-ndjson',
+                    headers=headers)
+
+# Reverse proxies in front of the app that append the caller's address to
+# X-Forwarded-For (1 on Render). Only the entry added by the outermost of them
+# identifies the caller; anything before it came from the client and can be forged.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+def forwarded_client(forwarded_for, remote_addr, hops=None):
+    """
+    Return the caller's address: the X-Forwarded-For entry appended by the outermost
+    of TRUSTED_PROXY_HOPS proxies, or remote_addr without trusted proxies (as
+    werkzeug's ProxyFix(x_for=hops) does)
+    """
+    hops = TRUSTED_PROXY_HOPS if hops is None else hops
+    if hops > 0 and forwarded_for:
+        entries = [entry.strip() for entry in forwarded_for.split(',')]
+        if len(entries) >= hops and entries[-hops]:
+            return entries[-hops]
+    return remote_addr
+
+def client_id():
+    """Identify the caller, for fair scheduling of upstream requests"""
+    return forwarded_client(', '.join(request.headers.getlist('X-Forwarded-For')), request.remote_addr)
+
+def user_traffic(view):
+    """Run a view's upstream requests as user traffic of the calling client"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with traffic(USER, client_id()):
+            return view(*args, **kwargs)
+    return wrapper
+
+def check_output_params(formatQuery, streamQuery):
+    """Return an error message for unsupported ?format= / ?stream= values, or None"""
+    if formatQuery not in RESPONSE_FORMATS:
+        return {"error": f"Unknown format {formatQuery!r}", "formats": list(RESPONSE_FORMATS)}
+    if streamQuery is not None and streamQuery != 'ndjson':
+        return {"error": f"Unknown stream {streamQuery!r}", "streams": ["ndjson"]}
+    if streamQuery and formatQuery == 'columnar':
+        return {"error": "The columnar format cannot be streamed"}
+    return None
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+# Per-request sampling profiles, taken when PROFILING_ENABLED=1 and the request
+# carries an "X-Profile: 1" header; read them back from /metrics/profiles
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+profile_store = ProfileStore()
+
+CACHE_EVENTS = ('hits', 'stale_hits', 'misses', 'coalesced', 'evictions', 'refreshes', 'refresh_errors')
+
+def _cache_events():
+    events = {}
+    for name, cache in (('response', price_cache), ('dataset', dataset_cache)):
+        stats = cache.stats()
+        for event in CACHE_EVENTS:
+            events[(name, event)] = stats[event]
+    return events
+
+def _upstream_gauges():
+    stats = upstream_scheduler.stats()["queue"]
+    return {
+        ("queue_depth",): stats["depth"],
+        ("circuit_open",): int(session_pool.breaker.state != "closed"),
+        ("sessions_in_use",): session_pool.stats()["pool"]["in_use"],
+    }
+
+REGISTRY.register(Collected(
+    'agmarket_cache_events_total', 'Response and dataset cache events', ['cache', 'event'],
+    _cache_events, kind='counter'
+))
+REGISTRY.register(Collected(
+    'agmarket_upstream', 'Upstream queue depth, circuit breaker state and sessions in use', ['gauge'],
+    _upstream_gauges
+))
 
 app = Flask(__name__)
+STARTED_AT = time.time()
+
+_worker_pid = None
+
+def start_worker():
+    """
+    Start the background work of this process (the prefetch scheduler). Runs once
+    per process: right after the fork under a preloading master, otherwise from
+    create_app() or the first request.
+    """
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+    if PREFETCH_ENABLED:
+        prefetch_scheduler.start()
+
+def create_app(preload=False):
+    """
+    App factory for gunicorn.
+
+    With gunicorn --preload and create_app(preload=True), the master imports the
+    module once: the catalog, parsers, session pool and the /stats aggregates
+    (seeded from the price store) are built before the fork and shared
+    copy-on-write by the workers, which each start their own background work.
+    """
+    if preload:
+        get_price_stats()
+        os.register_at_fork(after_in_child=start_worker)
+        # Objects built so far are never collected; freezing them keeps the
+        # collector from writing to (and so copying) the shared pages
+        gc.freeze()
+    else:
+        start_worker()
+    return app
+
+@app.before_request
+def startRequest():
+    if _worker_pid != os.getpid():
+        start_worker()
+    g.request_started = time.perf_counter()
+    if PROFILING_ENABLED and request.headers.get('X-Profile') == '1':
+        g.profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL).start()
+
+@app.after_request
+def finishRequest(response):
+    # Measured when the response is closed: a streamed body is only produced
+    # while the server sends it, after this hook
+    started = g.get('request_started')
+    endpoint = request.endpoint or 'unknown'
+    label = request.full_path
+    profiler = g.pop('profiler', None)
+    profile_id = profile_store.new_id() if profiler is not None else None
+    if profile_id is not None:
+        response.headers['X-Profile-Id'] = profile_id
+
+    def finish():
+        if started is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        if profiler is not None:
+            profile_store.add(label, profiler.stop(), profile_id)
+
+    response.call_on_close(finish)
+    return response
+
+@app.after_request
+def compressResponse(response):
+    # gzip/br for buffered responses; NDJSON streams are sent as produced
+    return compress_response(response, request.headers.get('Accept-Encoding', ''), COMPRESS_MIN_SIZE)
 
 @app.route('/', methods=['GET'])
 def homePage():
@@ -473,11 +1271,19 @@ def homePage():
     }
     return jsonify(dataSet)
 
+@app.route('/health', methods=['GET'])
+def healthPage():
+    # Liveness only: no upstream, store or lazily imported module is touched
+    return jsonify({"status": "ok", "pid": os.getpid(), "uptime": round(time.time() - STARTED_AT, 1)})
+
 @app.route('/request', methods=['GET'])
+@user_traffic
 def requestPage():
     commodityQuery = request.args.get('commodity')
     stateQuery = request.args.get('state')
     marketQuery = request.args.get('market')
+    formatQuery = request.args.get('format', 'records')
+    streamQuery = request.args.get('stream')
 
     if not commodityQuery or not stateQuery or not marketQuery:
         return jsonify({
@@ -485,22 +1291,218 @@ def requestPage():
             "usage": "Use /request?commodity=COMMODITY&state=STATE&market=MARKET",
             "example": "/request?commodity=Potato&state=Karnataka&market=Bangalore"
         })
+    error = check_output_params(formatQuery, streamQuery)
+    if error:
+        return jsonify(error)
+    try:
+        dateRange = parse_range_params(request.args)
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "usage": "Use /request?commodity=COMMODITY&state=STATE&market=MARKET&from=YYYY-MM-DD&to=YYYY-MM-DD[&period=month|day]"
+        })
 
     try:
         logger.info(f"Processing request for commodity={commodityQuery}, state={stateQuery}, market={marketQuery}")
-        result = get_agmarknet_data(stateQuery, commodityQuery, marketQuery)
+        if dateRange is not None:
+            if streamQuery:
+                source = 'price_trends' if dateRange[2] == 'month' else 'archive'
+                return ndjson_response(stream_range_data(stateQuery, commodityQuery, marketQuery, *dateRange), source)
+            result = get_cached_range_data(stateQuery, commodityQuery, marketQuery, *dateRange)
+            key = _range_cache_key(stateQuery, commodityQuery, marketQuery, *dateRange)
+            return conditional_records_response(result, formatQuery, response_validators(key, result))
+        result = get_cached_agmarknet_data(stateQuery, commodityQuery, marketQuery)
+        if streamQuery:
+            return ndjson_response(result)
         
         # Check if result is an error message
         if isinstance(result, dict) and "error" in result:
             return jsonify(result)
             
-        return json.dumps(result, indent=4)
+        key = _cache_key(stateQuery, commodityQuery, marketQuery)
+        return conditional_records_response(result, formatQuery, response_validators(key, result))
     except Exception as e:
         logger.error(f"Error processing request: {e}")
         return jsonify({"error": str(e)})
 
+@app.route('/history', methods=['GET'])
+@user_traffic
+def historyPage():
+    commodityQuery = request.args.get('commodity')
+    marketQuery = request.args.get('market')
+    stateQuery = request.args.get('state')
+    formatQuery = request.args.get('format', 'records')
+    streamQuery = request.args.get('stream')
+    usage = {
+        "usage": "Use /history?commodity=COMMODITY&market=MARKET&from=YYYY-MM-DD&to=YYYY-MM-DD[&state=STATE]",
+        "example": "/history?commodity=Potato&market=Bangalore&state=Karnataka&from=2025-03-01&to=2025-03-31"
+    }
+
+    if price_store is None:
+        return jsonify({"error": "Price history is disabled (PRICE_STORE_PATH is empty)"})
+    if not commodityQuery or not marketQuery:
+        return jsonify(dict(error="Missing query parameters", **usage))
+    error = check_output_params(formatQuery, streamQuery)
+    if error:
+        return jsonify(error)
+
+    try:
+        to_date = parse_query_date(request.args['to']) if request.args.get('to') else date.today()
+        from_date = parse_query_date(request.args['from']) if request.args.get('from') else to_date - timedelta(days=30)
+    except ValueError as e:
+        return jsonify(dict(error=str(e), **usage))
+    if from_date > to_date:
+        return jsonify(dict(error="'from' must not be after 'to'", **usage))
+
+    try:
+        logger.info(f"Processing history for commodity={commodityQuery}, market={marketQuery}, {from_date} to {to_date}")
+        if streamQuery:
+            fill_history_gaps(commodityQuery, marketQuery, from_date, to_date, state=stateQuery)
+            return ndjson_response(iter_price_history(commodityQuery, marketQuery, from_date, to_date, state=stateQuery))
+        result = get_price_history(commodityQuery, marketQuery, from_date, to_date, state=stateQuery)
+        # Stored history is not in the response cache; it is fresh for as long as /request is
+        validators = (records_fingerprint(result), None, price_cache.ttl)
+        return conditional_records_response(result, formatQuery, validators)
+    except Exception as e:
+        logger.error(f"Error processing history request: {e}")
+        return jsonify({"error": str(e)})
+
+@app.route('/stats', methods=['GET'])
+def statsPage():
+    from price_stats import DEFAULT_WINDOW_DAYS, MAX_WINDOW_DAYS, PERIODS
+    periodQuery = request.args.get('period')
+    usage = {
+        "usage": "Use /stats?commodity=COMMODITY[&state=STATE][&market=MARKET][&period=day|month][&window=DAYS]",
+        "example": "/stats?commodity=Potato&state=Karnataka&window=7"
+    }
+    try:
+        window = int(request.args.get('window', DEFAULT_WINDOW_DAYS))
+    except ValueError:
+        return jsonify(dict(error="'window' must be a number of days", **usage))
+    if not 1 <= window <= MAX_WINDOW_DAYS:
+        return jsonify(dict(error=f"'window' must be between 1 and {MAX_WINDOW_DAYS} days", **usage))
+    if periodQuery and periodQuery not in PERIODS:
+        return jsonify(dict(error=f"Unknown period {periodQuery!r}, expected one of {', '.join(PERIODS)}", **usage))
+
+    try:
+        return jsonify(get_price_stats().summary(
+            window,
+            state=request.args.get('state'),
+            commodity=request.args.get('commodity'),
+            market=request.args.get('market'),
+            period=periodQuery
+        ))
+    except Exception as e:
+        logger.error(f"Error computing stats: {e}")
+        return jsonify({"error": str(e)})
+
+@app.route('/cache/stats', methods=['GET'])
+def cacheStatsPage():
+    stats = price_cache.stats()
+    stats["datasets"] = dataset_cache.stats()
+    stats["form_tokens"] = form_tokens.stats()
+    if price_store is not None:
+        stats["price_store"] = price_store.stats()
+    if price_stats is not None:
+        stats["price_stats"] = price_stats.stats()
+    return jsonify(stats)
+
+@app.route('/upstream/stats', methods=['GET'])
+def upstreamStatsPage():
+    stats = session_pool.stats()
+    stats["sources"] = source_strategy.stats()
+    return jsonify(stats)
+
+@app.route('/batch', methods=['POST'])
+@user_traffic
+def batchPage():
+    formatQuery = request.args.get('format', 'records')
+    error = check_output_params(formatQuery, None)
+    if error:
+        return jsonify(error)
+    try:
+        queries = parse_batch_queries(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "usage": "POST /batch with a JSON list of {\"state\": ..., \"commodity\": ..., \"market\": ...} objects",
+            "example": [
+                {"state": "Karnataka", "commodity": "Potato", "market": "Bangalore"},
+                {"state": "Karnataka", "commodity": "Potato", "market": "Mysore"}
+            ]
+        })
+    
+    groups = group_batch_queries(queries)
+    logger.info(f"Processing batch of {len(queries)} queries in {len(groups)} groups")
+    return Response(with_traffic(stream_batch(groups, formatQuery), *current_traffic()),
+                    mimetype='application/x-ndjson')
+
+@app.route('/prefetch/stats', methods=['GET'])
+def prefetchStatsPage():
+    return jsonify(prefetch_scheduler.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metricsPage():
+    return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
+
+@app.route('/metrics/profiles', methods=['GET'])
+def profilesPage():
+    return jsonify({"enabled": PROFILING_ENABLED, "profiles": profile_store.list()})
+
+@app.route('/metrics/profiles/<profile_id>', methods=['GET'])
+def profilePage(profile_id):
+    found = profile_store.get(profile_id)
+    if found is None:
+        return jsonify({"error": f"Unknown profile {profile_id!r}"})
+    return Response(found[1].collapsed(), mimetype='text/plain')
+
+@app.route('/catalog', methods=['GET'])
+def catalogPage():
+    stateQuery = request.args.get('state')
+    current = current_catalog()
+    dataSet = current.summary()
+    if stateQuery:
+        state = current.states.match(stateQuery)
+        if state is None:
+            return jsonify({"error": f"Unknown state {stateQuery!r}"})
+        markets = current.markets.get(state[1])
+        dataSet["state"] = {"name": state[0], "code": state[1]}
+        dataSet["markets"] = markets.codes if markets is not None else {}
+    else:
+        dataSet["states"] = current.states.codes
+        dataSet["commodities"] = current.commodities.codes
+    return jsonify(dataSet)
+
+@app.route('/catalog/match', methods=['GET'])
+def catalogMatchPage():
+    stateQuery = request.args.get('state')
+    commodityQuery = request.args.get('commodity')
+    marketQuery = request.args.get('market')
+    if not stateQuery and not commodityQuery:
+        return jsonify({
+            "error": "Missing query parameters",
+            "usage": "Use /catalog/match?state=STATE&commodity=COMMODITY&market=MARKET (any of them)",
+            "example": "/catalog/match?state=Karnataka&market=Bengaluru"
+        })
+
+    current = current_catalog()
+    def describe(query, found):
+        return {"query": query, "name": found[0], "code": found[1]} if found else {"query": query, "name": None, "code": None}
+
+    dataSet = {}
+    state = None
+    if stateQuery:
+        state = current.states.match(stateQuery)
+        dataSet["state"] = describe(stateQuery, state)
+    if commodityQuery:
+        dataSet["commodity"] = describe(commodityQuery, current.commodities.match(commodityQuery))
+    if marketQuery:
+        markets = current.markets.get(state[1]) if state else None
+        dataSet["market"] = describe(marketQuery, markets.match(marketQuery) if markets is not None else None)
+    return jsonify(dataSet)
+
 if __name__ == '__main__':
     # Get port from environment variable or default to 5000
     port = int(os.environ.get('PORT', 5000))
     # Set host to 0.0.0.0 to make it accessible from outside the container/VM
-    app.run(host='0.0.0.0', port=port, debug=False)
+    create_app().run(host='0.0.0.0', port=port, debug=False)
@@ -1,31 +1,91 @@
 from flask import Flask, jsonify
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import atexit
+import os
+import threading
 import time
+from browser_pool import BrowserPool
+from price_cache import PriceCache
+
+# selenium and webdriver_manager are imported when the first browser starts, so
+# the health routes answer without loading them
 
 app = Flask(__name__)
+STARTED_AT = time.time()
 
-@app.route("/")
-def index():
-    return "🚜 AgMarket API is up! Use /scrape to fetch data."
+POPUP_URL = os.environ.get('POPUP_URL', 'https://agmarknet.gov.in/')
+POPUP_WAIT = float(os.environ.get('POPUP_WAIT', '15'))
 
-@app.route("/scrape")
-def scrape_popup():
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def get_driver_path():
+    # Resolve the chromedriver binary once per process instead of on every request
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.environ.get('CHROMEDRIVER_PATH')
+            if not _driver_path:
+                from webdriver_manager.chrome import ChromeDriverManager
+                _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+def start_browser():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
     options = Options()
     options.add_argument('--headless')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
+    driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+    driver.set_page_load_timeout(POPUP_WAIT * 2)
+    return driver
+
+browser_pool = BrowserPool(
+    start_browser,
+    size=int(os.environ.get('BROWSER_POOL_SIZE', '2')),
+    max_uses=int(os.environ.get('BROWSER_MAX_USES', '50')),
+    acquire_timeout=float(os.environ.get('BROWSER_ACQUIRE_TIMEOUT', '30'))
+)
+atexit.register(browser_pool.close)
 
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    driver.get("https://agmarknet.gov.in/")
+# The popup changes rarely; stale text is served while a browser refreshes it
+popup_cache = PriceCache(
+    ttl=int(os.environ.get('POPUP_CACHE_TTL', '600')),
+    stale_ttl=int(os.environ.get('POPUP_CACHE_STALE_TTL', '3600')),
+    max_entries=1
+)
 
-    # Wait and interact with popup
-    time.sleep(5)
-    driver.switch_to.frame("cframe")
-    popup_data = driver.find_element(By.ID, "PopUpText").text
+def fetch_popup_text():
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    with browser_pool.driver() as driver:
+        driver.get(POPUP_URL)
 
-    driver.quit()
+        # Wait for the popup iframe and its text instead of sleeping a fixed time
+        wait = WebDriverWait(driver, POPUP_WAIT)
+        wait.until(EC.frame_to_be_available_and_switch_to_it("cframe"))
+        popup_data = wait.until(EC.presence_of_element_located((By.ID, "PopUpText"))).text
+        driver.switch_to.default_content()
+        return popup_data
+
+@app.route("/")
+def index():
+    return "🚜 AgMarket API is up! Use /scrape to fetch data."
+
+@app.route("/health")
+def health():
+    return jsonify({"status": "ok", "uptime": round(time.time() - STARTED_AT, 1)})
+
+@app.route("/scrape")
+def scrape_popup():
+    try:
+        popup_data = popup_cache.get_or_load('popup', fetch_popup_text)
+    except Exception as e:
+        return jsonify({"error": str(e)})
     return jsonify({"popup_data": popup_data})
+
+@app.route("/scrape/stats")
+def scrape_stats():
+    return jsonify({"browsers": browser_pool.stats(), "cache": popup_cache.stats()})
@@ -0,0 +1,134 @@
+"""
+ASGI entry point.
+
+/request is served natively by the async scraping engine, so one process can keep
+hundreds of slow upstream scrapes in flight. Every other route is delegated to the
+Flask app. Run with:
+
+    uvicorn asgi:application
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+"""
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from APIwebScrapingPopUp import (app, async_upstream, count_response, forwarded_client, get_cached_agmarknet_data_async,
+                                 price_cache, response_validators, source_headers, start_worker, _cache_key,
+                                 COMPRESS_MIN_SIZE)
+from compression import compress, negotiate_encoding
+from conditional import caching_headers, entity_tag, not_modified
+from price_records import RESPONSE_FORMATS, dump_records
+from metrics import REQUEST_SECONDS, stage
+from upstream import USER, traffic
+
+logger = logging.getLogger(__name__)
+
+flask_application = WsgiToAsgi(app)
+# /request is served without Flask, so background work cannot wait for a first Flask request
+start_worker()
+
+
+def _encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def _send(send, status, body, content_type, accept_encoding=None, extra_headers=()):
+    body = body.encode('utf-8')
+    headers = [(b'content-type', content_type.encode('latin-1'))] + _encode_headers(extra_headers)
+    if accept_encoding is not None and len(body) >= COMPRESS_MIN_SIZE:
+        if not any(name == b'vary' for name, _ in headers):
+            headers.append((b'vary', b'Accept-Encoding'))
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_not_modified(send, headers):
+    await send({'type': 'http.response.start', 'status': 304, 'headers': _encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def request_page(scope, receive, send):
+    """Async version of requestPage"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    commodityQuery = query.get('commodity', [None])[0]
+    stateQuery = query.get('state', [None])[0]
+    marketQuery = query.get('market', [None])[0]
+    formatQuery = query.get('format', ['records'])[0]
+    # Streaming and date range responses are produced by the Flask view
+    if 'stream' in query or 'from' in query or 'to' in query:
+        return await flask_application(scope, receive, send)
+    accept_encoding = ''
+    if_none_match = if_modified_since = None
+    forwarded_for = []
+    for name, value in scope.get('headers', []):
+        if name == b'accept-encoding':
+            accept_encoding = value.decode('latin-1')
+        elif name == b'if-none-match':
+            if_none_match = value.decode('latin-1')
+        elif name == b'if-modified-since':
+            if_modified_since = value.decode('latin-1')
+        elif name == b'x-forwarded-for':
+            forwarded_for.append(value.decode('latin-1'))
+    client = forwarded_client(', '.join(forwarded_for), (scope.get('client') or ('', 0))[0])
+
+    if not commodityQuery or not stateQuery or not marketQuery:
+        return await _send(send, 200, json.dumps({
+            "error": "Missing query parameters",
+            "usage": "Use /request?commodity=COMMODITY&state=STATE&market=MARKET",
+            "example": "/request?commodity=Potato&state=Karnataka&market=Bangalore"
+        }), 'application/json')
+    if formatQuery not in RESPONSE_FORMATS:
+        return await _send(send, 200, json.dumps({
+            "error": f"Unknown format {formatQuery!r}", "formats": list(RESPONSE_FORMATS)
+        }), 'application/json')
+
+    started = time.perf_counter()
+    try:
+        logger.info(f"Processing request for commodity={commodityQuery}, state={stateQuery}, market={marketQuery}")
+        with traffic(USER, client):
+            result = await get_cached_agmarknet_data_async(stateQuery, commodityQuery, marketQuery)
+        fingerprint, last_modified, max_age = response_validators(
+            _cache_key(stateQuery, commodityQuery, marketQuery), result)
+        etag = entity_tag(fingerprint, formatQuery)
+        headers = caching_headers(etag, last_modified, max_age, price_cache.stale_ttl) + source_headers(result)
+        count_response(getattr(result, 'source', None))
+        if not_modified(etag, last_modified, if_none_match, if_modified_since):
+            return await _send_not_modified(send, headers)
+        with stage('serialize'):
+            body = dump_records(result, formatQuery)
+        content_type = 'text/html; charset=utf-8' if formatQuery == 'records' else 'application/json'
+        return await _send(send, 200, body, content_type, accept_encoding, headers)
+    except Exception as e:
+        logger.error(f"Error processing request: {e}")
+        return await _send(send, 200, json.dumps({"error": str(e)}), 'application/json')
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='requestPage')
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_upstream.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and scope['path'] == '/request' and scope['method'] in ('GET', 'HEAD'):
+        return await request_page(scope, receive, send)
+    return await flask_application(scope, receive, send)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from form_tokens import extract_form_tokens, is_rejected, TokenRejected
+from metrics import stage
+from upstream import CircuitBreaker, FairScheduler, HostRateLimiter, LatencyRecorder
+
+# Imported on first use: only the async endpoints need it, and it is slow to import
+aiohttp = None
+
+
+def _import_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp as module
+        except ImportError:  # pragma: no cover - only needed by the async endpoints
+            raise RuntimeError("aiohttp is required for the async scraping engine") from None
+        aiohttp = module
+    return aiohttp
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+class UpstreamError(Exception):
+    """Raised when the upstream answers with an error status after all retries"""
+
+
+class AsyncUpstream:
+    """
+    Non-blocking upstream client for the async endpoints.
+
+    Uses one keep-alive aiohttp session per event loop, retries connection errors
+    and 502/503/504 with exponential backoff, and shares the FormTokenStore and
+    circuit breaker and rate limited scheduler with the sync SessionPool. HTML parsing and other blocking
+    work is handed to a small thread pool so it never blocks the event loop.
+    """
+
+    def __init__(self, form_tokens, breaker=None, latency=None, pool_size=100,
+                 connect_timeout=5, read_timeout=20, retries=2, backoff_factor=0.5,
+                 parse_workers=4, scheduler=None):
+        self.form_tokens = form_tokens
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler or FairScheduler(HostRateLimiter(rate=0))
+        self.latency = latency or LatencyRecorder()
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.parse_workers = parse_workers
+        self._executor = None
+        self._session = None
+        self._loop = None
+
+    def _get_session(self):
+        _import_aiohttp()
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._loop = loop
+        return self._session
+
+    async def request(self, method, url, data=None, cookies=None):
+        """Perform one HTTP request and return (status, text, cookies)"""
+        session = self._get_session()
+        self.breaker.allow()
+        try:
+            attempt = 0
+            while True:
+                await self.scheduler.wait_async(url)
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, url, data=data, cookies=cookies) as response:
+                        text = await response.text()
+                        status = response.status
+                        set_cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.latency.record(time.perf_counter() - started)
+                    if attempt >= self.retries:
+                        self.breaker.record_failure()
+                        raise UpstreamError(f"{method} {url} failed: {e!r}") from e
+                else:
+                    self.latency.record(time.perf_counter() - started)
+                    if status not in RETRY_STATUSES or attempt >= self.retries:
+                        break
+
+                attempt += 1
+                await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+        except asyncio.CancelledError:
+            # A losing source task was cancelled mid-request; the call has no outcome
+            self.breaker.release()
+            raise
+
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return status, text, set_cookies
+
+    async def _tokens(self, url, source=''):
+        cached = self.form_tokens.peek(url)
+        if cached is not None:
+            return cached
+
+        logger.info(f"Fetching form tokens from {url}")
+        with stage('fetch', source):
+            status, text, cookies = await self.request('GET', url)
+        if status >= 400:
+            raise UpstreamError(f"GET {url} returned {status}")
+        with stage('tokens', source):
+            fields = await self.run_blocking(extract_form_tokens, text)
+        self.form_tokens.put(url, fields, cookies)
+        return dict(fields), cookies
+
+    async def post_form(self, url, form_data, source=''):
+        """
+        POST an ASP.NET form with cached tokens and return the response text;
+        source labels the stage timings
+        """
+        for _ in range(2):
+            fields, cookies = await self._tokens(url, source)
+            fields.update(form_data)
+            with stage('post', source):
+                status, text, _ = await self.request('POST', url, data=fields, cookies=cookies)
+            if not is_rejected(status, text):
+                if status >= 400:
+                    raise UpstreamError(f"POST {url} returned {status}")
+                return text
+            self.form_tokens.record_rejection(url)
+
+        raise TokenRejected(f"Form tokens rejected twice by {url}")
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking function (page parsing, local store writes) in the worker thread pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.parse_workers, thread_name_prefix='async-worker')
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def close(self):
+        """Close the aiohttp session (call on application shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,120 @@
+"""
+Parse benchmark: the original BeautifulSoup/html.parser code vs grid_parser.
+
+Usage: python -m benchmarks.bench_parse [--rows N] [--viewstate-kb N] [--repeat N] [--json]
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+
+import grid_parser
+from benchmarks.fixtures import load_fixture
+
+
+def baseline_tokens(page):
+    """Token extraction as originally done: full html.parser soup of the form page"""
+    soup = BeautifulSoup(page, 'html.parser')
+    return {
+        name: soup.find('input', {'name': name})['value']
+        for name in ('__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION')
+    }
+
+
+def baseline_grid(page):
+    """Grid extraction as originally done: full html.parser soup, find_all tr/td"""
+    soup = BeautifulSoup(page, 'html.parser')
+    table = soup.find('table', {'id': 'cphBody_gridRecords'})
+    return [[td.text.strip() for td in tr.find_all('td')] for tr in table.find_all('tr')]
+
+
+def fast_tokens(page):
+    return grid_parser.extract_hidden_fields(page)
+
+
+def fast_grid(page):
+    return grid_parser.extract_grid_rows(page)
+
+
+def measure(func, page, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(page)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(rows=200, viewstate_kb=96, repeat=20):
+    pages = {
+        "form": load_fixture('form', viewstate_kb=viewstate_kb),
+        "price_trends": load_fixture('price_trends', rows=rows, viewstate_kb=viewstate_kb),
+        "archive": load_fixture('archive', rows=rows, viewstate_kb=viewstate_kb),
+    }
+
+    # Both implementations must agree before their speed is worth comparing
+    assert baseline_grid(pages["price_trends"]) == fast_grid(pages["price_trends"])
+    assert baseline_grid(pages["archive"]) == fast_grid(pages["archive"])
+    baseline = baseline_tokens(pages["form"])
+    assert all(fast_tokens(pages["form"])[k] == v for k, v in baseline.items())
+
+    cases = [
+        ("tokens/form", baseline_tokens, fast_tokens, "form"),
+        ("grid/price_trends", baseline_grid, fast_grid, "price_trends"),
+        ("grid/archive", baseline_grid, fast_grid, "archive"),
+    ]
+    results = []
+    for name, slow, fast, page_name in cases:
+        page = pages[page_name]
+        before = measure(slow, page, repeat)
+        after = measure(fast, page, repeat)
+        results.append({
+            "case": name,
+            "page_kb": round(len(page) / 1024, 1),
+            "baseline": before,
+            "grid_parser": after,
+            "speedup": round(before["median_ms"] / after["median_ms"], 1) if after["median_ms"] else None,
+        })
+    return {
+        "backend": "lxml" if grid_parser.lxml_html is not None else "html.parser",
+        "rows": rows,
+        "viewstate_kb": viewstate_kb,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--viewstate-kb', type=int, default=96)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    report = run(args.rows, args.viewstate_kb, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"backend={report['backend']} rows={report['rows']} viewstate={report['viewstate_kb']}KB")
+    print(f"{'case':<20}{'page KB':>9}{'base ms':>10}{'new ms':>10}{'base peak KB':>14}{'new peak KB':>13}{'speedup':>9}")
+    for r in report["results"]:
+        print(f"{r['case']:<20}{r['page_kb']:>9}{r['baseline']['median_ms']:>10}{r['grid_parser']['median_ms']:>10}"
+              f"{r['baseline']['peak_kb']:>14}{r['grid_parser']['peak_kb']:>13}{r['speedup']:>8}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Record benchmark: string-keyed dicts dumped with indent=4 vs PriceRecord in each output format.
+
+Usage: python -m benchmarks.bench_records [--rows N] [--repeat N] [--json]
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.fixtures import MARKETS, VARIETIES
+from price_records import PriceRecord, RESPONSE_FORMATS, dump_records
+
+
+def make_cells(rows):
+    """
+    Scraped cell texts for an archive table of the given size, including the
+    "1,500", "2000.00" and "1750.50" spellings agmarknet uses for some prices
+    """
+    return [
+        (str(i), f"{i % 28 + 1:02d}-Apr-2025", MARKETS[i % len(MARKETS)], "Potato",
+         VARIETIES[i % len(VARIETIES)],
+         f"{1200 + i % 300:,}" if i % 3 == 0 else str(1200 + i % 300),
+         f"{1800 + i % 300}.00" if i % 7 == 0 else str(1800 + i % 300),
+         f"{1500 + i % 300}.50" if i % 5 == 0 else str(1500 + i % 300))
+        for i in range(1, rows + 1)
+    ]
+
+
+def build_dicts(cells):
+    """Records as originally built: one dict of strings per row"""
+    return [
+        {
+            "S.No": sno,
+            "Date": day,
+            "Market": market,
+            "Commodity": commodity,
+            "Variety": variety,
+            "Min Price": min_price,
+            "Max Price": max_price,
+            "Modal Price": modal_price
+        }
+        for sno, day, market, commodity, variety, min_price, max_price, modal_price in cells
+    ]
+
+
+def build_records(cells):
+    return [PriceRecord.from_text(*row) for row in cells]
+
+
+def measure(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def retained_kb(func, arg):
+    """Memory still held by the value func returns"""
+    tracemalloc.start()
+    value = func(arg)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return round(current / 1024, 1)
+
+
+def run(rows=100000, repeat=5):
+    cells = make_cells(rows)
+    dicts = build_dicts(cells)
+    records = build_records(cells)
+
+    # The compatibility view must reproduce the original payload byte for byte
+    assert dump_records(records) == json.dumps(dicts, indent=4)
+
+    results = [{
+        "case": "dict/indent",
+        "build_ms": measure(build_dicts, cells, repeat),
+        "retained_kb": retained_kb(build_dicts, cells),
+        "serialize_ms": measure(lambda value: json.dumps(value, indent=4), dicts, repeat),
+        "bytes": len(json.dumps(dicts, indent=4)),
+    }]
+    build_ms = measure(build_records, cells, repeat)
+    kept_kb = retained_kb(build_records, cells)
+    for fmt in RESPONSE_FORMATS:
+        results.append({
+            "case": f"record/{fmt}",
+            "build_ms": build_ms,
+            "retained_kb": kept_kb,
+            "serialize_ms": measure(lambda value: dump_records(value, fmt), records, repeat),
+            "bytes": len(dump_records(records, fmt)),
+        })
+    return {"rows": rows, "repeat": repeat, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    report = run(args.rows, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"rows={report['rows']}")
+    print(f"{'case':<18}{'build ms':>10}{'kept KB':>10}{'dump ms':>10}{'bytes':>12}")
+    for r in report["results"]:
+        print(f"{r['case']:<18}{r['build_ms']:>10}{r['retained_kb']:>10}{r['serialize_ms']:>10}{r['bytes']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Synthetic agmarknet pages for offline benchmarks.
+
+The pages mimic the structure of the real ASP.NET pages (a large __VIEWSTATE
+blob, navigation tables and the cphBody_gridRecords result grid). Recorded
+pages can be dropped into benchmarks/fixtures/ under the names used by
+load_fixture() and are preferred over the generated ones.
+"""
+import os
+import base64
+import random
+from datetime import datetime, timedelta
+
+from catalog import BUILTIN_STATES, BUILTIN_COMMODITIES
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+MARKETS = [
+    "Bangalore", "Mysore", "Hubli", "Belgaum", "Gulbarga", "Mangalore", "Shimoga",
+    "Bellary", "Bijapur", "Davangere", "Tumkur", "Hassan", "Kolar", "Chitradurga",
+    "Raichur", "Bidar", "Mandya", "Udupi", "Karwar", "Gadag",
+]
+VARIETIES = ["Local", "Hybrid", "Other", "Desi", "Jyoti"]
+
+
+def _viewstate(size_kb, rng):
+    raw = bytes(rng.getrandbits(8) for _ in range(size_kb * 768))
+    return base64.b64encode(raw).decode('ascii')
+
+
+def _hidden_inputs(rng, viewstate_kb):
+    return (
+        f'<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{_viewstate(viewstate_kb, rng)}" />\n'
+        f'<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="{rng.getrandbits(32):08X}" />\n'
+        f'<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{_viewstate(max(1, viewstate_kb // 20), rng)}" />\n'
+    )
+
+
+def _page(body, rng, viewstate_kb):
+    nav = ''.join(f'<tr><td><a href="/Page{i}.aspx">Menu item {i}</a></td></tr>' for i in range(40))
+    return (
+        '<!DOCTYPE html>\n<html><head><title>AGMARKNET</title></head><body>\n'
+        '<form method="post" action="./page.aspx" id="form1">\n'
+        f'{_hidden_inputs(rng, viewstate_kb)}'
+        f'<table class="navigation">{nav}</table>\n'
+        f'{body}\n'
+        '</form></body></html>\n'
+    )
+
+
+def _prices(rng):
+    low = rng.randint(800, 2500)
+    high = low + rng.randint(100, 900)
+    return low, high, rng.randint(low, high)
+
+
+def _select(name, codes):
+    options = ''.join(f'<option value="{code}">{text}</option>' for text, code in codes.items())
+    return f'<select name="ctl00$cphBody${name}" id="cphBody_{name}"><option value="0">--Select--</option>{options}</select>'
+
+
+def form_page(seed=1, viewstate_kb=96):
+    """Initial GET page with the hidden form fields and dropdowns"""
+    rng = random.Random(seed)
+    body = _select('cboState', BUILTIN_STATES) + _select('cboCommodity', BUILTIN_COMMODITIES)
+    return _page(body, rng, viewstate_kb)
+
+
+def market_page(seed=1, viewstate_kb=96):
+    """Postback page after a state is selected, with its market dropdown filled in"""
+    rng = random.Random(seed)
+    markets = {market: str(i) for i, market in enumerate(MARKETS, 1)}
+    body = (_select('cboState', BUILTIN_STATES) + _select('cboCommodity', BUILTIN_COMMODITIES)
+            + _select('cboMarket', markets))
+    return _page(body, rng, viewstate_kb)
+
+
+def price_trends_page(rows=200, seed=1, viewstate_kb=96):
+    """SA_Month_PriMV.aspx postback response with a month-wise market grid"""
+    rng = random.Random(seed)
+    lines = ['<tr><th>Market</th><th>Variety</th><th>Min Price</th><th>Max Price</th>'
+             '<th>Modal Price</th><th>Arrivals</th></tr>']
+    for i in range(rows):
+        low, high, modal = _prices(rng)
+        market = MARKETS[i % len(MARKETS)]
+        lines.append(
+            f'<tr><td><span>{market}</span></td><td>{rng.choice(VARIETIES)}</td>'
+            f'<td>{low}</td><td>{high}</td><td>{modal}</td><td>{rng.randint(1, 500)}</td></tr>'
+        )
+    body = f'<table id="cphBody_gridRecords" class="tableagmark_new">{"".join(lines)}</table>'
+    return _page(body, rng, viewstate_kb)
+
+
+def archive_page(rows=200, seed=1, viewstate_kb=96, commodity="Potato"):
+    """CommodityDailyStateWise_Archive.aspx postback response with a daily grid"""
+    rng = random.Random(seed)
+    today = datetime(2025, 4, 2)
+    lines = ['<tr><th>Date</th><th>Market</th><th>Commodity</th><th>Variety</th>'
+             '<th>Min Price</th><th>Max Price</th><th>Modal Price</th></tr>']
+    for i in range(rows):
+        low, high, modal = _prices(rng)
+        date = (today - timedelta(days=i // len(MARKETS))).strftime('%d-%b-%Y')
+        lines.append(
+            f'<tr><td>{date}</td><td>{MARKETS[i % len(MARKETS)]}</td><td>{commodity}</td>'
+            f'<td>{rng.choice(VARIETIES)}</td><td>{low}</td><td>{high}</td><td>{modal}</td></tr>'
+        )
+    body = f'<table id="cphBody_gridRecords" class="tableagmark_new">{"".join(lines)}</table>'
+    return _page(body, rng, viewstate_kb)
+
+
+GENERATORS = {
+    'form': form_page,
+    'price_trends': price_trends_page,
+    'archive': archive_page,
+    'market': market_page,
+}
+
+
+def load_fixture(name, **kwargs):
+    """Return a recorded fixture from FIXTURE_DIR if present, else a generated page"""
+    path = os.path.join(FIXTURE_DIR, f'{name}.html')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    return GENERATORS[name](**kwargs)
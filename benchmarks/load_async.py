@@ -0,0 +1,140 @@
+"""
+Load comparison: gunicorn sync workers vs the ASGI app on uvicorn.
+
+Starts the local mock agmarknet with a fixed latency, boots each server variant
+against it with the response cache disabled, and fires concurrent /request calls.
+
+Usage: python -m benchmarks.load_async [--requests 200] [--concurrency 100] [--latency 1.0] [--workers 2] [--json]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import MARKETS
+from benchmarks.mock_agmarknet import start_mock_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30, interval=0.2):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(interval)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def server_commands(port, workers):
+    bind = f"127.0.0.1:{port}"
+    return {
+        f"gunicorn-sync-{workers}w": [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', bind,
+                                      '--timeout', '300', 'APIwebScrapingPopUp:app'],
+        "uvicorn-asgi-1p": [sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port),
+                            '--log-level', 'warning', 'asgi:application'],
+    }
+
+
+def drive(base_url, total, concurrency):
+    """
+    Fire total /request calls with the given concurrency and return latency stats.
+    A request only succeeds with real data: a synthetic fallback (X-Data-Source:
+    synthetic) counts as an error and is also reported under fallbacks.
+    """
+    def one(i):
+        market = MARKETS[i % len(MARKETS)]
+        url = f"{base_url}/request?commodity=Potato&state=Karnataka&market={market}"
+        started = time.perf_counter()
+        fallback = False
+        try:
+            with urllib.request.urlopen(url, timeout=600) as response:
+                body = response.read()
+                fallback = response.headers.get('X-Data-Source') == 'synthetic'
+            ok = body.lstrip().startswith(b'[') and not fallback
+        except OSError:
+            ok = False
+        return time.perf_counter() - started, ok, fallback
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+    return {
+        "requests": total,
+        "errors": sum(1 for r in results if not r[1]),
+        "fallbacks": sum(1 for r in results if r[2]),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_s": percentile(0.50),
+        "p95_s": percentile(0.95),
+        "p99_s": percentile(0.99),
+        "mean_s": round(statistics.mean(latencies), 3),
+    }
+
+
+def run(total=200, concurrency=100, latency=1.0, workers=2):
+    mock, mock_url = start_mock_server(latency=latency)
+    report = {"mock_latency_s": latency, "concurrency": concurrency, "servers": {}}
+    try:
+        port = free_port()
+        for name, command in server_commands(port, workers).items():
+            env = dict(os.environ, AGMARKNET_BASE_URL=mock_url, CACHE_ENABLED='0',
+                       UPSTREAM_BREAKER_THRESHOLD='1000000', UPSTREAM_RATE_LIMIT='0')
+            process = subprocess.Popen(command, cwd=ROOT, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_until_up(base_url + '/')
+                report["servers"][name] = drive(base_url, total, concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        mock.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn sync workers vs uvicorn ASGI under slow upstream')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=1.0, help='mock upstream latency in seconds')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn sync workers')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    report = run(args.requests, args.concurrency, args.latency, args.workers)
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"mock latency={report['mock_latency_s']}s concurrency={report['concurrency']}")
+    print(f"{'server':<22}{'req':>6}{'err':>5}{'fb':>5}{'rps':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}")
+    for name, r in report["servers"].items():
+        print(f"{name:<22}{r['requests']:>6}{r['errors']:>5}{r['fallbacks']:>5}{r['throughput_rps']:>8}"
+              f"{r['p50_s']:>8}{r['p95_s']:>8}{r['p99_s']:>8}")
+
+
+if __name__ == '__main__':
+    main()
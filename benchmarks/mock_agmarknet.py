@@ -0,0 +1,146 @@
+"""
+Local mock of the agmarknet pages used by the scraper.
+
+Serves the fixture pages from benchmarks.fixtures for
+  /PriceTrends/SA_Month_PriMV.aspx
+  /PriceAndArrivals/CommodityDailyStateWise_Archive.aspx
+(GET returns the form page, POST the result grid, or the market dropdown when
+the postback comes from the state dropdown) with configurable latency and
+failure injection. Postbacks without a __VIEWSTATE are rejected the way ASP.NET
+does. GET /__stats returns request counters.
+
+Usage: python -m benchmarks.mock_agmarknet [--port 8099] [--latency 0.5] [--failure-rate 0]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+from benchmarks.fixtures import load_fixture
+
+PRICE_TRENDS_PATH = '/PriceTrends/SA_Month_PriMV.aspx'
+ARCHIVE_PATH = '/PriceAndArrivals/CommodityDailyStateWise_Archive.aspx'
+
+
+class MockConfig:
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, rows=200, viewstate_kb=96, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.pages = {
+            'form': load_fixture('form', viewstate_kb=viewstate_kb),
+            'market': load_fixture('market', viewstate_kb=viewstate_kb),
+            PRICE_TRENDS_PATH: load_fixture('price_trends', rows=rows, viewstate_kb=viewstate_kb),
+            ARCHIVE_PATH: load_fixture('archive', rows=rows, viewstate_kb=viewstate_kb),
+        }
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"GET": 0, "POST": 0, "failures": 0, "rejections": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.failure_rate
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, content_type='text/html; charset=utf-8', headers=()):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        config = self.config
+        if config.latency or config.jitter:
+            time.sleep(max(0.0, config.latency + config.random.uniform(-config.jitter, config.jitter)))
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/__stats':
+            with self.config.lock:
+                return self._reply(200, json.dumps(self.config.counters), 'application/json')
+        if path not in (PRICE_TRENDS_PATH, ARCHIVE_PATH):
+            return self._reply(404, 'Not found')
+
+        self.config.count('GET')
+        self._delay()
+        if self.config.should_fail():
+            self.config.count('failures')
+            return self._reply(503, 'Service Unavailable')
+        self._reply(200, self.config.pages['form'],
+                    headers=[('Set-Cookie', 'ASP.NET_SessionId=mock; path=/; HttpOnly')])
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if path not in (PRICE_TRENDS_PATH, ARCHIVE_PATH):
+            return self._reply(404, 'Not found')
+
+        self.config.count('POST')
+        self._delay()
+        if self.config.should_fail():
+            self.config.count('failures')
+            return self._reply(503, 'Service Unavailable')
+        if '__VIEWSTATE' not in form:
+            self.config.count('rejections')
+            return self._reply(500, 'Validation of viewstate MAC failed')
+        if form.get('__EVENTTARGET', [''])[0].endswith('cboState'):
+            return self._reply(200, self.config.pages['market'])
+        self._reply(200, self.config.pages[path])
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_mock_server(port=0, **config):
+    """Start the mock in a background thread and return (server, base_url)"""
+    handler = type('ConfiguredMockHandler', (MockHandler,), {'config': MockConfig(**config)})
+    server = MockServer(('127.0.0.1', port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the agmarknet pages')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- seconds of random latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--viewstate-kb', type=int, default=96)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(
+        args.port, latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+        rows=args.rows, viewstate_kb=args.viewstate_kb
+    )
+    print(f"Mock agmarknet listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
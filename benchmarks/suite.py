@@ -0,0 +1,263 @@
+"""
+Regression suite: one command that runs the offline benchmarks and emits JSON.
+
+Starts the local mock agmarknet (fixture pages for the price trends and archive
+endpoints) with the given latency and failure injection, boots the Flask app
+under gunicorn sync workers against it with the response cache disabled, and
+drives concurrent /request calls. The report holds throughput, p50/p95/p99
+latency, errors (a synthetic fallback counts as an error and as a fallback),
+resident memory of every gunicorn worker, the mock's request counters, the
+grid_parser time per fixture page and startup time: the import time of each
+entry point in a fresh interpreter and the time from launching gunicorn to its
+first /health answer. --preload runs gunicorn with the preloading app factory.
+
+Pass --baseline with an earlier report to flag throughput, latency, memory or
+parse-time regressions beyond --tolerance; the exit status is 1 when any are found.
+
+Usage: python -m benchmarks.suite [--requests 200] [--concurrency 50] [--latency 0.2]
+                                  [--failure-rate 0] [--workers 2] [--preload] [--output results.json]
+                                  [--baseline previous.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks import bench_parse
+from benchmarks.load_async import ROOT, drive, free_port, wait_until_up
+from benchmarks.mock_agmarknet import start_mock_server
+
+# Entry points whose import time is reported
+ENTRY_POINTS = ('APIwebScrapingPopUp', 'asgi', 'app')
+
+
+def child_pids(pid):
+    """Pids whose parent is pid, read from /proc"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain spaces
+        fields = stat.rsplit(')', 1)[1].split()
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def memory_kb(pid):
+    """
+    Current (VmRSS) and peak (VmHWM) resident memory of pid in KB, plus its
+    proportional share (Pss) which counts pages shared with other workers once
+    """
+    usage = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'VmHWM'):
+                usage[name] = int(value.split()[0])
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name == 'Pss':
+                    usage[name] = int(value.split()[0])
+    except OSError:
+        pass
+    return {"rss_kb": usage.get('VmRSS'), "peak_rss_kb": usage.get('VmHWM'), "pss_kb": usage.get('Pss')}
+
+
+def worker_memory(master_pid):
+    workers = []
+    for pid in child_pids(master_pid):
+        try:
+            workers.append(dict(pid=pid, **memory_kb(pid)))
+        except OSError:
+            continue
+    return workers
+
+
+def parse_times(rows, viewstate_kb, repeat):
+    """grid_parser median time per fixture page, in ms"""
+    report = bench_parse.run(rows, viewstate_kb, repeat)
+    return {
+        "backend": report["backend"],
+        "pages": {r["case"]: {"page_kb": r["page_kb"], "median_ms": r["grid_parser"]["median_ms"],
+                              "peak_kb": r["grid_parser"]["peak_kb"]}
+                  for r in report["results"]},
+    }
+
+
+def import_times(store_dir, repeat):
+    """Median seconds to import each entry point in a fresh interpreter"""
+    env = dict(os.environ, PRICE_STORE_PATH=os.path.join(store_dir, 'import.db'))
+    times = {}
+    for module in ENTRY_POINTS:
+        code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+        samples = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True,
+                                    text=True, check=True).stdout
+            samples.append(float(output.split()[-1]))
+        times[module] = round(statistics.median(samples), 3)
+    return times
+
+
+def load(total, concurrency, latency, jitter, failure_rate, workers, rows, viewstate_kb, store_dir,
+         preload=False):
+    """Drive gunicorn against the mock and return latency, memory, boot time and mock counters"""
+    mock, mock_url = start_mock_server(latency=latency, jitter=jitter, failure_rate=failure_rate,
+                                       rows=rows, viewstate_kb=viewstate_kb)
+    try:
+        port = free_port()
+        command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f"127.0.0.1:{port}",
+                   '--timeout', '300']
+        command += ['--preload', 'APIwebScrapingPopUp:create_app(preload=True)'] if preload else ['APIwebScrapingPopUp:app']
+        env = dict(os.environ, AGMARKNET_BASE_URL=mock_url, CACHE_ENABLED='0',
+                   UPSTREAM_BREAKER_THRESHOLD='1000000', UPSTREAM_RATE_LIMIT='0',
+                   PRICE_STORE_PATH=os.path.join(store_dir, 'load.db'))
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=ROOT, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_up(base_url + '/health', interval=0.01)
+            boot = time.perf_counter() - started
+            deadline = time.time() + 30
+            while len(child_pids(process.pid)) < workers and time.time() < deadline:
+                time.sleep(0.05)
+            idle = worker_memory(process.pid)
+            result = drive(base_url, total, concurrency)
+            result["workers"] = workers
+            result["preload"] = preload
+            result["boot_to_first_response_s"] = round(boot, 3)
+            result["memory"] = {"idle": idle, "loaded": worker_memory(process.pid)}
+        finally:
+            process.terminate()
+            process.wait()
+        with urllib.request.urlopen(mock_url + '/__stats', timeout=5) as response:
+            result["upstream"] = json.loads(response.read())
+    finally:
+        mock.shutdown()
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(total=200, concurrency=50, latency=0.2, jitter=0.0, failure_rate=0.0, workers=2,
+        rows=200, viewstate_kb=96, repeat=20, preload=False):
+    # Scraped rows go to a throwaway price store, not the repository's prices.db
+    with tempfile.TemporaryDirectory() as store_dir:
+        return {
+            "suite": 1,
+            "revision": git_revision(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "python": platform.python_version(),
+            "config": {
+                "requests": total, "concurrency": concurrency, "mock_latency_s": latency,
+                "mock_jitter_s": jitter, "failure_rate": failure_rate, "workers": workers,
+                "preload": preload, "rows": rows, "viewstate_kb": viewstate_kb,
+            },
+            "startup": {"import_s": import_times(store_dir, 5)},
+            "parse": parse_times(rows, viewstate_kb, repeat),
+            "load": load(total, concurrency, latency, jitter, failure_rate, workers, rows, viewstate_kb,
+                         store_dir, preload),
+        }
+
+
+def summary(report):
+    """Flat {metric: (value, higher is better)} used for baseline comparison"""
+    load_result = report["load"]
+    loaded = load_result["memory"]["loaded"]
+    metrics = {
+        "throughput_rps": (load_result["throughput_rps"], True),
+        "p50_s": (load_result["p50_s"], False),
+        "p95_s": (load_result["p95_s"], False),
+        "p99_s": (load_result["p99_s"], False),
+        "errors": (load_result["errors"], False),
+    }
+    # Reports from before fallbacks were counted have no such field
+    if "fallbacks" in load_result:
+        metrics["fallbacks"] = (load_result["fallbacks"], False)
+    if loaded:
+        metrics["max_worker_rss_kb"] = (max(w["peak_rss_kb"] or 0 for w in loaded), False)
+    metrics["boot_to_first_response_s"] = (load_result["boot_to_first_response_s"], False)
+    for module, seconds in report["startup"]["import_s"].items():
+        metrics[f"import_s/{module}"] = (seconds, False)
+    for case, page in report["parse"]["pages"].items():
+        metrics[f"parse_ms/{case}"] = (page["median_ms"], False)
+    return metrics
+
+
+def compare(report, baseline, tolerance):
+    """Return the metrics that got worse than baseline by more than tolerance"""
+    current, previous = summary(report), summary(baseline)
+    regressions = []
+    for name, (value, higher_is_better) in current.items():
+        if name not in previous:
+            continue
+        before = previous[name][0]
+        if higher_is_better:
+            worse = value < before * (1 - tolerance)
+        else:
+            # The +1 keeps a baseline of 0 errors from flagging a single failure as infinite
+            worse = value > (before + (1 if name in ('errors', 'fallbacks') else 0)) * (1 + tolerance)
+        if worse:
+            regressions.append({"metric": name, "baseline": before, "current": value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline regression suite against the mock agmarknet')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2, help='mock upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- seconds of random mock latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of mock responses that are 503')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn sync workers')
+    parser.add_argument('--preload', action='store_true', help='gunicorn --preload with create_app(preload=True)')
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--viewstate-kb', type=int, default=96)
+    parser.add_argument('--repeat', type=int, default=20, help='parse timing repetitions per page')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown vs the baseline')
+    args = parser.parse_args()
+
+    report = run(args.requests, args.concurrency, args.latency, args.jitter, args.failure_rate,
+                 args.workers, args.rows, args.viewstate_kb, args.repeat, args.preload)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if report.get("regressions"):
+        for r in report["regressions"]:
+            print(f"regression: {r['metric']} {r['baseline']} -> {r['current']}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolExhausted(Exception):
+    """Raised when no browser became free within the acquire timeout"""
+
+
+class _PooledDriver:
+    __slots__ = ("driver", "uses", "created_at")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Bounded pool of warm WebDriver instances.
+
+    Browsers are started lazily by ``factory()`` up to ``size`` and handed out
+    LIFO so the warmest one is reused first. Before each use a browser is health
+    checked; one that fails the check, raises while borrowed, or has served
+    ``max_uses`` requests is quit and replaced on the next borrow.
+    """
+
+    def __init__(self, factory, size=2, max_uses=50, acquire_timeout=30):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._counters = {
+            "started": 0,
+            "recycled": 0,
+            "unhealthy": 0,
+            "failed": 0,
+            "borrowed": 0,
+            "exhausted": 0,
+        }
+        self._in_use = 0
+
+    @contextmanager
+    def driver(self):
+        """Borrow a healthy browser for the duration of a with block"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._counters["exhausted"] += 1
+            raise BrowserPoolExhausted(f"No browser free after {self.acquire_timeout}s")
+
+        try:
+            pooled = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._counters["borrowed"] += 1
+        try:
+            yield pooled.driver
+        except Exception:
+            # The browser may be left on an odd page or frame, start fresh next time
+            with self._lock:
+                self._counters["failed"] += 1
+            self._quit(pooled)
+            raise
+        else:
+            pooled.uses += 1
+            if pooled.uses >= self.max_uses:
+                with self._lock:
+                    self._counters["recycled"] += 1
+                self._quit(pooled)
+            else:
+                self._idle.put(pooled)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._healthy(pooled.driver):
+                return pooled
+            with self._lock:
+                self._counters["unhealthy"] += 1
+            self._quit(pooled)
+
+        logger.info("Starting a new browser")
+        pooled = _PooledDriver(self.factory())
+        with self._lock:
+            self._counters["started"] += 1
+        return pooled
+
+    @staticmethod
+    def _healthy(driver):
+        try:
+            driver.switch_to.default_content()
+            return driver.execute_script("return 1") == 1
+        except Exception as e:
+            logger.warning(f"Browser failed health check: {e}")
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting browser: {e}")
+
+    def close(self):
+        """Quit every idle browser"""
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_use"] = self._in_use
+        stats["idle"] = self._idle.qsize()
+        stats["size"] = self.size
+        stats["max_uses"] = self.max_uses
+        return stats
@@ -0,0 +1,263 @@
+import argparse
+import difflib
+import json
+import os
+import re
+import threading
+import time
+import logging
+from grid_parser import extract_select_options
+
+logger = logging.getLogger(__name__)
+
+# Fuzzy matches are memoized per index up to this many distinct queries
+MAX_MEMOIZED_MATCHES = 4096
+FUZZY_CUTOFF = 0.82
+
+# Dropdown option values that are placeholders rather than codes
+PLACEHOLDER_VALUES = ('', '0', '-1', '--select--')
+
+# Codes used before any catalog has been harvested
+BUILTIN_STATES = {
+    "Andhra Pradesh": "01", "Arunachal Pradesh": "02", "Assam": "03", "Bihar": "04",
+    "Chhattisgarh": "05", "Goa": "06", "Gujarat": "07", "Haryana": "08",
+    "Himachal Pradesh": "09", "Jammu and Kashmir": "10", "Jharkhand": "11", "Karnataka": "12",
+    "Kerala": "13", "Madhya Pradesh": "14", "Maharashtra": "15", "Manipur": "16",
+    "Meghalaya": "17", "Mizoram": "18", "Nagaland": "19", "Odisha": "20",
+    "Punjab": "21", "Rajasthan": "22", "Sikkim": "23", "Tamil Nadu": "24",
+    "Telangana": "25", "Tripura": "26", "Uttar Pradesh": "27", "Uttarakhand": "28",
+    "West Bengal": "29", "Andaman and Nicobar Islands": "30", "Chandigarh": "31",
+    "Dadra and Nagar Haveli": "32", "Daman and Diu": "33", "Delhi": "34",
+    "Lakshadweep": "35", "Puducherry": "36",
+}
+BUILTIN_COMMODITIES = {
+    "Potato": "24", "Tomato": "78", "Onion": "23", "Rice": "1", "Wheat": "2", "Maize": "3",
+    "Apple": "4", "Banana": "5", "Orange": "6", "Mango": "7", "Grapes": "8", "Watermelon": "9",
+    "Coconut": "10", "Sugarcane": "11", "Cotton": "12", "Jute": "13", "Coffee": "14", "Tea": "15",
+    "Milk": "16", "Egg": "17", "Fish": "18", "Chicken": "19", "Mutton": "20", "Beef": "21",
+    "Pork": "22",
+}
+BUILTIN_MARKETS = {
+    # Karnataka
+    "12": {
+        "Bangalore": "1", "Mysore": "2", "Hubli": "3", "Belgaum": "4", "Gulbarga": "5",
+        "Mangalore": "6", "Shimoga": "7", "Bellary": "8", "Bijapur": "9", "Davangere": "10",
+    },
+    # Maharashtra
+    "15": {
+        "Mumbai": "1", "Pune": "2", "Nagpur": "3", "Nashik": "4", "Aurangabad": "5",
+        "Solapur": "6", "Kolhapur": "7", "Amravati": "8", "Latur": "9", "Ahmednagar": "10",
+    },
+}
+
+# Official and colloquial names that agmarknet lists under an older spelling
+ALIASES = {
+    "bengaluru": "bangalore", "mysuru": "mysore", "hubballi": "hubli", "belagavi": "belgaum",
+    "kalaburagi": "gulbarga", "mangaluru": "mangalore", "shivamogga": "shimoga",
+    "ballari": "bellary", "vijayapura": "bijapur", "tumakuru": "tumkur",
+    "bombay": "mumbai", "poona": "pune", "madras": "chennai", "calcutta": "kolkata",
+    "orissa": "odisha", "pondicherry": "puducherry", "new delhi": "delhi", "nct of delhi": "delhi",
+    "uttaranchal": "uttarakhand", "aloo": "potato", "pyaz": "onion", "tamatar": "tomato",
+    "paddy": "rice",
+}
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_name(name):
+    """Lowercase a name, spell out '&' and collapse punctuation and whitespace"""
+    return " ".join(_NON_WORD.sub(' ', name.lower().replace('&', ' and ')).split())
+
+
+class CodeIndex:
+    """
+    Name -> code index for one dropdown, built once.
+
+    Lookups try the normalized name, a known alias, the name without spaces
+    ("tamilnadu") and finally a close fuzzy match; fuzzy results are memoized.
+    """
+
+    __slots__ = ('codes', '_exact', '_compact', '_names', '_fuzzy', '_lock')
+
+    def __init__(self, codes):
+        self.codes = dict(codes)
+        self._exact = {}
+        self._compact = {}
+        for name, code in self.codes.items():
+            key = normalize_name(name)
+            self._exact.setdefault(key, (name, code))
+            self._compact.setdefault(key.replace(' ', ''), (name, code))
+        self._names = list(self._exact)
+        self._fuzzy = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def match(self, name):
+        """Return (canonical name, code) for name, or None"""
+        key = normalize_name(name or '')
+        if not key:
+            return None
+        found = self._exact.get(key) or self._exact.get(ALIASES.get(key, ''))
+        if found is None:
+            found = self._compact.get(key.replace(' ', ''))
+        if found is None:
+            found = self._fuzzy_match(key)
+        return found
+
+    def code(self, name):
+        found = self.match(name)
+        return found[1] if found else None
+
+    def _fuzzy_match(self, key):
+        with self._lock:
+            if key in self._fuzzy:
+                return self._fuzzy[key]
+        close = difflib.get_close_matches(key, self._names, n=1, cutoff=FUZZY_CUTOFF)
+        found = self._exact[close[0]] if close else None
+        with self._lock:
+            if len(self._fuzzy) < MAX_MEMOIZED_MATCHES:
+                self._fuzzy[key] = found
+        return found
+
+
+class Catalog:
+    """
+    State, commodity and per-state market codes of the agmarknet dropdowns,
+    with a prebuilt CodeIndex for each.
+    """
+
+    def __init__(self, states, commodities, markets, source='builtin', harvested_at=None):
+        self.states = CodeIndex(states)
+        self.commodities = CodeIndex(commodities)
+        self.markets = {state_code: CodeIndex(codes) for state_code, codes in markets.items()}
+        self.source = source
+        self.harvested_at = harvested_at
+
+    @classmethod
+    def builtin(cls):
+        return cls(BUILTIN_STATES, BUILTIN_COMMODITIES, BUILTIN_MARKETS)
+
+    @classmethod
+    def load(cls, path):
+        """Load a harvested catalog file"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["states"], data["commodities"], data["markets"],
+                   source=path, harvested_at=data.get("harvested_at"))
+
+    @classmethod
+    def load_or_builtin(cls, path):
+        """Load the catalog file at path, or the built-in codes if there is none"""
+        if path and os.path.exists(path):
+            try:
+                return cls.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Error loading catalog {path}: {e}")
+        return cls.builtin()
+
+    def save(self, path):
+        """Write the catalog to path atomically"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def to_dict(self):
+        return {
+            "harvested_at": self.harvested_at,
+            "states": self.states.codes,
+            "commodities": self.commodities.codes,
+            "markets": {state_code: index.codes for state_code, index in self.markets.items()},
+        }
+
+    def state_code(self, name):
+        return self.states.code(name)
+
+    def commodity_code(self, name):
+        return self.commodities.code(name)
+
+    def market_code(self, state_code, name):
+        index = self.markets.get(state_code)
+        return index.code(name) if index is not None else None
+
+    def market_name(self, state_code, name):
+        """
+        Return the agmarknet spelling of a market name (Bengaluru -> Bangalore):
+        the catalog entry it matches, else its alias, else None
+        """
+        index = self.markets.get(state_code)
+        found = index.match(name) if index is not None else None
+        if found is not None:
+            return found[0]
+        return ALIASES.get(normalize_name(name or ''))
+
+    def summary(self):
+        return {
+            "source": self.source,
+            "harvested_at": self.harvested_at,
+            "states": len(self.states),
+            "commodities": len(self.commodities),
+            "markets": sum(len(index) for index in self.markets.values()),
+            "states_with_markets": len(self.markets),
+        }
+
+
+def dropdown_codes(page, suffix):
+    """Return {option text: value} of the <select> whose name or id ends with suffix"""
+    for name, options in extract_select_options(page).items():
+        if name.endswith(suffix):
+            return {
+                text: value for value, text in options
+                if value.strip().lower() not in PLACEHOLDER_VALUES and text
+            }
+    return {}
+
+
+def harvest_catalog(get_page, post_form):
+    """
+    Build a Catalog from the live dropdowns.
+
+    get_page() returns the form page listing states and commodities;
+    post_form(state_code) returns the page after selecting a state, which lists
+    that state's markets. States whose markets cannot be fetched are skipped.
+    """
+    page = get_page()
+    states = dropdown_codes(page, 'cboState')
+    commodities = dropdown_codes(page, 'cboCommodity')
+    if not states or not commodities:
+        raise ValueError("State/commodity dropdowns not found on the form page")
+
+    markets = {}
+    for name, state_code in states.items():
+        try:
+            codes = dropdown_codes(post_form(state_code), 'cboMarket')
+        except Exception as e:
+            logger.error(f"Error harvesting markets for {name}: {e}")
+            continue
+        if codes:
+            markets[state_code] = codes
+
+    logger.info(f"Harvested {len(states)} states, {len(commodities)} commodities and "
+                f"{sum(len(codes) for codes in markets.values())} markets")
+    return Catalog(states, commodities, markets, source='harvest', harvested_at=time.time())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the agmarknet code catalog')
+    parser.add_argument('--harvest', action='store_true',
+                        help='harvest the live dropdowns (one request per state) and save them to CATALOG_PATH')
+    args = parser.parse_args()
+    if not args.harvest:
+        parser.print_help()
+        return
+
+    # Imported here: the scraper module imports this one, and brings the shared
+    # upstream session pool, rate limit and form tokens
+    from APIwebScrapingPopUp import harvest_agmarknet_catalog
+    print(json.dumps(harvest_agmarknet_catalog().summary(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
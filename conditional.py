@@ -0,0 +1,60 @@
+import email.utils
+from datetime import timezone
+
+
+def entity_tag(fingerprint, variant):
+    """
+    ETag for one representation (output format) of the data. It is weak because
+    the same representation may be sent gzip, br or uncompressed.
+    """
+    return f'W/"{fingerprint}-{variant}"'
+
+
+def _opaque(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def not_modified(etag, last_modified, if_none_match, if_modified_since):
+    """
+    Whether a GET with these request headers can be answered 304 Not Modified.
+
+    If-None-Match takes precedence over If-Modified-Since, and tags are compared
+    weakly. last_modified is a Unix time, or None when unknown.
+    """
+    if if_none_match:
+        if if_none_match.strip() == '*':
+            return True
+        wanted = _opaque(etag)
+        return any(_opaque(tag) == wanted for tag in if_none_match.split(','))
+    if if_modified_since and last_modified is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds
+        return int(last_modified) <= since.timestamp()
+    return False
+
+
+def caching_headers(etag, last_modified=None, max_age=0, stale=0):
+    """
+    ETag, Last-Modified, Cache-Control and Vary headers for a cacheable response.
+
+    max_age is how long shared caches may serve it without asking (the time left
+    before our own cache entry expires); stale adds stale-while-revalidate. With
+    no max_age, caches may store the response but must revalidate it each time.
+    """
+    headers = [('ETag', etag), ('Vary', 'Accept-Encoding')]
+    if last_modified is not None:
+        headers.append(('Last-Modified', email.utils.formatdate(last_modified, usegmt=True)))
+    if max_age > 0:
+        cache_control = f"public, max-age={int(max_age)}"
+        if stale > 0:
+            cache_control += f", stale-while-revalidate={int(stale)}"
+    else:
+        cache_control = "no-cache"
+    headers.append(('Cache-Control', cache_control))
+    return headers
@@ -0,0 +1,160 @@
+import threading
+import time
+import logging
+from grid_parser import extract_hidden_fields
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Hidden ASP.NET fields that must be echoed back on every postback
+TOKEN_FIELDS = ('__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION')
+
+# Markers ASP.NET puts in the response when it refuses a postback
+REJECTION_MARKERS = (
+    'Invalid postback or callback argument',
+    'Validation of viewstate MAC failed',
+    'The state information is invalid for this page',
+)
+
+
+class TokenRejected(Exception):
+    """Raised when the upstream refuses the cached form tokens"""
+
+
+def extract_form_tokens(html):
+    """Pull the hidden ASP.NET form fields out of a page"""
+    fields = extract_hidden_fields(html)
+    tokens = {}
+    for name in TOKEN_FIELDS:
+        if name not in fields:
+            raise ValueError(f"Hidden field {name} not found in page")
+        tokens[name] = fields[name]
+    return tokens
+
+
+def is_rejected(status_code, text):
+    """Check whether a postback response means our tokens were rejected"""
+    if status_code >= 500:
+        return True
+    return any(marker in text for marker in REJECTION_MARKERS)
+
+
+class _Tokens:
+    __slots__ = ('fields', 'cookies', 'fetched_at')
+
+    def __init__(self, fields, cookies, fetched_at):
+        self.fields = fields
+        self.cookies = cookies
+        self.fetched_at = fetched_at
+
+
+class FormTokenStore:
+    """
+    Per-URL store of ASP.NET hidden form fields and the cookies they were issued with.
+
+    Tokens are fetched with one GET and then reused for every POST to the same page
+    until they expire or the upstream rejects them.
+    """
+
+    def __init__(self, max_age=1200, clock=time.monotonic):
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._url_locks = {}
+        self.fetches = 0
+        self.reuses = 0
+        self.rejections = 0
+
+    def _url_lock(self, url):
+        with self._lock:
+            lock = self._url_locks.get(url)
+            if lock is None:
+                lock = self._url_locks[url] = threading.Lock()
+            return lock
+
+    def _fresh(self, url):
+        tokens = self._tokens.get(url)
+        if tokens is not None and self._clock() - tokens.fetched_at < self.max_age:
+            return tokens
+        return None
+
+    def peek(self, url):
+        """Return (fields, cookies) for url if fresh tokens are cached, else None"""
+        with self._lock:
+            tokens = self._fresh(url)
+            if tokens is None:
+                return None
+            self.reuses += 1
+            return dict(tokens.fields), tokens.cookies
+
+    def put(self, url, fields, cookies):
+        """Store freshly fetched tokens for url"""
+        with self._lock:
+            self._tokens[url] = _Tokens(fields, cookies, self._clock())
+            self.fetches += 1
+
+    def record_rejection(self, url):
+        """Count a rejected postback and forget the tokens for url"""
+        logger.warning(f"Upstream rejected cached form tokens for {url}")
+        with self._lock:
+            self.rejections += 1
+            self._tokens.pop(url, None)
+
+    def get(self, session, url, source=''):
+        """
+        Return (fields, cookies) for url, fetching them with session if needed;
+        source labels the stage timings
+        """
+        cached = self.peek(url)
+        if cached is not None:
+            return cached
+
+        # Only one thread refreshes a given page at a time
+        with self._url_lock(url):
+            cached = self.peek(url)
+            if cached is not None:
+                return cached
+
+            logger.info(f"Fetching form tokens from {url}")
+            with stage('fetch', source):
+                response = session.get(url)
+            response.raise_for_status()
+            with stage('tokens', source):
+                fields = extract_form_tokens(response.text)
+            cookies = session.cookies.get_dict()
+            self.put(url, fields, cookies)
+            return dict(fields), cookies
+
+    def invalidate(self, url):
+        """Forget the tokens for url so the next get() refetches them"""
+        with self._lock:
+            self._tokens.pop(url, None)
+
+    def post(self, session, url, form_data, source=''):
+        """
+        POST form_data to url with cached tokens, refreshing them once if rejected
+        """
+        for _ in range(2):
+            fields, cookies = self.get(session, url, source)
+            fields.update(form_data)
+            session.cookies.update(cookies)
+            with stage('post', source):
+                response = session.post(url, data=fields)
+            if not is_rejected(response.status_code, response.text):
+                response.raise_for_status()
+                return response
+            self.record_rejection(url)
+
+        raise TokenRejected(f"Form tokens rejected twice by {url}")
+
+    def stats(self):
+        """Return token store counters"""
+        with self._lock:
+            return {
+                "pages": len(self._tokens),
+                "fetches": self.fetches,
+                "reuses": self.reuses,
+                "rejections": self.rejections,
+                "max_age": self.max_age,
+            }
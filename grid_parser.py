@@ -0,0 +1,133 @@
+import re
+import html as htmllib
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # pragma: no cover - lxml is optional, html.parser is the fallback
+    lxml_html = None
+
+# Table ids agmarknet uses for its result grid, in order of preference
+GRID_TABLE_IDS = ('cphBody_gridRecords', 'gvReportData')
+
+_TABLE_TAG = re.compile(r'<(/?)table\b', re.IGNORECASE)
+_INPUT_TAG = re.compile(r'<input\b[^>]*>', re.IGNORECASE)
+_SELECT = re.compile(r'<select\b([^>]*)>(.*?)</select\s*>', re.IGNORECASE | re.DOTALL)
+_OPTION = re.compile(r'<option\b([^>]*)>(.*?)(?=<option\b|</option\s*>|$)', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]+>')
+_ATTR = re.compile(r'([\w:$.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+
+
+class MissingPriceTable(Exception):
+    """Raised for a response page without the price grid (an error or busy page)"""
+
+
+def _bs_backend():
+    return 'lxml' if lxml_html is not None else 'html.parser'
+
+
+def _attrs(tag):
+    attrs = {}
+    for match in _ATTR.finditer(tag):
+        name = match.group(1).lower()
+        value = match.group(2)
+        if value is None:
+            value = match.group(3) if match.group(3) is not None else match.group(4)
+        attrs[name] = htmllib.unescape(value)
+    return attrs
+
+
+def extract_hidden_fields(page):
+    """Return {name: value} for every hidden <input> on the page without building a DOM"""
+    fields = {}
+    for match in _INPUT_TAG.finditer(page):
+        attrs = _attrs(match.group(0))
+        if attrs.get('type', '').lower() == 'hidden' and 'name' in attrs:
+            fields[attrs['name']] = attrs.get('value', '')
+    return fields
+
+
+def extract_select_options(page):
+    """Return {name: [(value, text), ...]} for every <select> on the page without building a DOM"""
+    selects = {}
+    for match in _SELECT.finditer(page):
+        attrs = _attrs(match.group(1))
+        name = attrs.get('name') or attrs.get('id')
+        if not name:
+            continue
+        options = []
+        for option in _OPTION.finditer(match.group(2)):
+            text = " ".join(htmllib.unescape(_TAG.sub('', option.group(2))).split())
+            value = _attrs(option.group(1)).get('value', text)
+            options.append((value, text))
+        selects[name] = options
+    return selects
+
+
+def _slice_table(page, start):
+    """Return the <table>...</table> markup starting at start, honouring nested tables"""
+    depth = 0
+    for match in _TABLE_TAG.finditer(page, start):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                end = page.find('>', match.end())
+                return page[start:end + 1]
+        else:
+            depth += 1
+    return page[start:]
+
+
+def find_grid_table(page, table_ids=GRID_TABLE_IDS):
+    """Locate the result grid by id and return just its markup, or None"""
+    for table_id in table_ids:
+        match = re.search(r'id\s*=\s*["\']%s["\']' % re.escape(table_id), page)
+        if not match:
+            continue
+        start = max(page.rfind('<table', 0, match.start()), page.rfind('<TABLE', 0, match.start()))
+        if start != -1:
+            return _slice_table(page, start)
+    return None
+
+
+def _rows_from_fragment(fragment):
+    """Return the cell texts of every <tr> in a table fragment"""
+    if lxml_html is not None:
+        table = lxml_html.fragment_fromstring(fragment)
+        return [[td.text_content().strip() for td in tr.iter('td')] for tr in table.iter('tr')]
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(fragment, 'html.parser')
+    return [[td.text.strip() for td in tr.find_all('td')] for tr in soup.find_all('tr')]
+
+
+def _fallback_fragment(page, table_class=None, table_index=None):
+    """Find a table by class or position when the grid id is missing (slow path)"""
+    # bs4 is only imported when a page lacks the grid id, keeping it out of startup
+    from bs4 import BeautifulSoup, SoupStrainer
+    soup = BeautifulSoup(page, _bs_backend(), parse_only=SoupStrainer('table'))
+    if table_class is not None:
+        tables = soup.find_all('table', {'class': table_class})
+        return str(tables[0]) if tables else None
+    if table_index is not None:
+        # Same document order as soup.find_all('table') on the full page
+        tables = soup.find_all('table')
+        return str(tables[table_index]) if len(tables) > table_index else None
+    return None
+
+
+def extract_grid_rows(page, table_ids=GRID_TABLE_IDS, table_class=None, table_index=None):
+    """
+    Extract the price grid from an agmarknet response page.
+
+    Returns a list with the stripped <td> texts of every <tr> in the grid (the
+    first row is the header), or None when no grid table is present. Only the
+    grid markup is parsed; the large __VIEWSTATE blob and the rest of the page
+    are skipped. table_class / table_index select a fallback table when none of
+    table_ids is present.
+    """
+    fragment = find_grid_table(page, table_ids)
+    if fragment is None:
+        fragment = _fallback_fragment(page, table_class, table_index)
+        if fragment is None:
+            return None
+    return _rows_from_fragment(fragment)
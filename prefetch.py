@@ -0,0 +1,198 @@
+import random
+import threading
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone, time as dtime
+from price_cache import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# agmarknet publishes in Indian Standard Time
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def parse_prefetch_keys(spec):
+    """Parse "State:Commodity:Market;State:Commodity:Market" into query tuples"""
+    keys = []
+    for item in (spec or "").split(';'):
+        parts = [part.strip() for part in item.split(':')]
+        if len(parts) == 3 and all(parts):
+            keys.append(tuple(parts))
+        elif item.strip():
+            logger.warning(f"Ignoring malformed prefetch key: {item!r}")
+    return keys
+
+
+def parse_times(spec):
+    """Parse "HH:MM,HH:MM" into a sorted list of times of day"""
+    times = []
+    for item in (spec or "").split(','):
+        item = item.strip()
+        if item:
+            hour, minute = item.split(':')
+            times.append(dtime(int(hour), int(minute)))
+    return sorted(times)
+
+
+def next_run_after(now, times, interval=None):
+    """Return the next scheduled run after now (an aware datetime)"""
+    candidates = []
+    for day in (0, 1):
+        date = (now + timedelta(days=day)).date()
+        for at in times:
+            run = datetime.combine(date, at, tzinfo=now.tzinfo)
+            if run > now:
+                candidates.append(run)
+    if interval:
+        candidates.append(now + timedelta(seconds=interval))
+    return min(candidates) if candidates else None
+
+
+class TrafficTracker:
+    """Counts observed queries so the most requested ones can be prefetched"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._queries = {}
+
+    def record(self, state, commodity, market):
+        key = make_cache_key(state, commodity, market, None)
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                return
+            self._counts[key] += 1
+            self._queries.setdefault(key, (state, commodity, market))
+
+    def top(self, n):
+        """Return the n most requested queries and halve every count so old traffic fades"""
+        with self._lock:
+            top = [self._queries[key] for key, _ in self._counts.most_common(n)]
+            for key in list(self._counts):
+                self._counts[key] //= 2
+                if not self._counts[key]:
+                    del self._counts[key]
+                    del self._queries[key]
+        return top
+
+
+class PrefetchScheduler:
+    """
+    Background thread that keeps hot price queries warm.
+
+    On every run it takes the configured keys plus the most requested ones seen
+    by the tracker, groups them by state+commodity (one upstream scrape each) and
+    calls refresh_group(queries) for every group on a small thread pool, after a
+    random jitter delay so the upstream is not hit in a burst. Runs happen at the
+    given IST times of day and/or every interval seconds.
+    """
+
+    def __init__(self, refresh_group, keys=(), tracker=None, top_n=20, times=(), interval=None,
+                 concurrency=2, jitter=30, run_on_start=True):
+        self.refresh_group = refresh_group
+        self.keys = list(keys)
+        self.tracker = tracker
+        self.top_n = top_n
+        self.times = list(times)
+        self.interval = interval
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.run_on_start = run_on_start
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "groups_refreshed": 0,
+            "group_failures": 0,
+            "last_run": None,
+            "last_duration": None,
+            "last_keys": 0,
+            "next_run": None,
+        }
+
+    def start(self):
+        """Start the scheduler thread (no-op if already running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        if self.run_on_start:
+            self.run_once()
+        while not self._stop.is_set():
+            now = datetime.now(IST)
+            next_run = next_run_after(now, self.times, self.interval)
+            if next_run is None:
+                logger.warning("Prefetch scheduler has no times or interval configured, stopping")
+                return
+            with self._lock:
+                self._stats["next_run"] = next_run.isoformat()
+            if self._stop.wait((next_run - now).total_seconds()):
+                return
+            self.run_once()
+
+    def _collect(self):
+        queries = list(self.keys)
+        if self.tracker is not None and self.top_n:
+            queries += self.tracker.top(self.top_n)
+
+        groups = {}
+        seen = set()
+        for query in queries:
+            key = make_cache_key(*query, None)
+            if key in seen:
+                continue
+            seen.add(key)
+            groups.setdefault(key[:2], []).append(query)
+        return list(groups.values()), len(seen)
+
+    def _refresh(self, group):
+        if self.jitter and self._stop.wait(random.uniform(0, self.jitter)):
+            return False
+        try:
+            self.refresh_group(group)
+            return True
+        except Exception as e:
+            logger.error(f"Prefetch failed for {group[0][:2]}: {e}")
+            return False
+
+    def run_once(self):
+        """Refresh every hot key now and return the number of groups refreshed"""
+        groups, key_count = self._collect()
+        started = time.perf_counter()
+        logger.info(f"Prefetching {key_count} keys in {len(groups)} groups")
+
+        refreshed = 0
+        if groups:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='prefetch') as pool:
+                done, _ = wait([pool.submit(self._refresh, group) for group in groups])
+            refreshed = sum(1 for future in done if future.result())
+
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["groups_refreshed"] += refreshed
+            self._stats["group_failures"] += len(groups) - refreshed
+            self._stats["last_run"] = datetime.now(IST).isoformat()
+            self._stats["last_duration"] = round(time.perf_counter() - started, 3)
+            self._stats["last_keys"] = key_count
+        return refreshed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        stats["configured_keys"] = len(self.keys)
+        stats["times"] = [at.strftime('%H:%M') for at in self.times]
+        stats["interval"] = self.interval
+        return stats
@@ -0,0 +1,287 @@
+import asyncio
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from upstream import REFRESH, traffic
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(state, commodity, market, window):
+    """Build a normalized cache key for a price query"""
+    return (
+        " ".join(state.lower().split()),
+        " ".join(commodity.lower().split()),
+        " ".join(market.lower().split()),
+        window,
+    )
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "refreshing", "etag", "modified")
+
+    def __init__(self, value, stored_at, etag=None, modified=None):
+        self.value = value
+        self.stored_at = stored_at
+        self.refreshing = False
+        self.etag = etag
+        self.modified = modified
+
+
+class PriceCache:
+    """
+    Thread-safe LRU cache with a TTL and stale-while-revalidate window.
+
+    Entries younger than ``ttl`` are served as-is. Entries older than ``ttl`` but
+    younger than ``ttl + stale_ttl`` are served immediately while a background
+    thread refreshes them. Concurrent misses for the same key share one load.
+
+    With a ``fingerprint`` function, each stored value is hashed once and the
+    entry remembers the wall-clock time its content last changed, for HTTP
+    validators (see validators()).
+    """
+
+    def __init__(self, ttl=3600, stale_ttl=86400, max_entries=512, clock=time.monotonic, fingerprint=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # The event loop only keeps weak references to tasks
+        self._refresh_tasks = set()
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry.stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry.value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    if not entry.refreshing and key not in self._inflight:
+                        entry.refreshing = True
+                        self._start_refresh(key, loader)
+                    return entry.value
+                # Too old to serve, drop it and load synchronously
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                owner = False
+            else:
+                self._counters["misses"] += 1
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        etag = self._etag(value)
+        with self._lock:
+            self._store(key, value, etag)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    async def aget_or_load(self, key, loader):
+        """
+        Async variant of get_or_load; loader() must return an awaitable.
+        Shares entries, in-flight loads and counters with the sync path.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry.stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry.value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    if not entry.refreshing and key not in self._inflight:
+                        entry.refreshing = True
+                        self._start_arefresh(key, loader)
+                    return entry.value
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                owner = False
+            else:
+                self._counters["misses"] += 1
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            value = await loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        etag = self._etag(value)
+        with self._lock:
+            self._store(key, value, etag)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _start_arefresh(self, key, loader):
+        task = asyncio.ensure_future(self._arefresh(key, loader))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _arefresh(self, key, loader):
+        # The task inherited the triggering request's context; like the refresh
+        # thread of the sync path, its upstream calls are background refreshes
+        try:
+            with traffic(REFRESH):
+                value = await loader()
+        except asyncio.CancelledError as e:
+            self._refresh_failed(key, e)
+            raise
+        except Exception as e:
+            self._refresh_failed(key, e)
+            return
+        self._refresh_done(key, value)
+
+    def _start_refresh(self, key, loader):
+        thread = threading.Thread(target=self._refresh, args=(key, loader), daemon=True)
+        thread.start()
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+        except Exception as e:
+            self._refresh_failed(key, e)
+            return
+        self._refresh_done(key, value)
+
+    def _refresh_failed(self, key, error):
+        # Keep serving the stale entry and allow a later request to retry
+        logger.error(f"Background refresh failed for {key}: {error}")
+        with self._lock:
+            self._counters["refresh_errors"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
+
+    def _refresh_done(self, key, value):
+        etag = self._etag(value)
+        with self._lock:
+            self._counters["refreshes"] += 1
+            self._store(key, value, etag)
+
+    def _etag(self, value):
+        # Hashed outside the lock; a value that cannot be hashed just has no validators
+        if self._fingerprint is None:
+            return None
+        try:
+            return self._fingerprint(value)
+        except Exception as e:
+            logger.error(f"Error fingerprinting cached value: {e}")
+            return None
+
+    def _store(self, key, value, etag=None):
+        # Caller must hold the lock. A refresh with unchanged content keeps the
+        # original modification time.
+        previous = self._entries.get(key)
+        if previous is not None and etag is not None and previous.etag == etag:
+            modified = previous.modified
+        else:
+            modified = time.time()
+        self._entries[key] = _Entry(value, self._clock(), etag, modified)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def refresh(self, key, loader):
+        """Load key now and store the result, keeping the old entry if loading fails"""
+        try:
+            value = loader()
+        except Exception as e:
+            self._refresh_failed(key, e)
+            raise
+        self._refresh_done(key, value)
+        return value
+
+    def peek(self, key):
+        """Return the cached value for key (fresh or stale) without loading it, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = self._clock() - entry.stored_at
+            if age >= self.ttl + self.stale_ttl:
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits" if age < self.ttl else "stale_hits"] += 1
+            return entry.value
+
+    def validators(self, key, value):
+        """
+        Return (etag, last modified time, seconds of freshness left) for key if its
+        entry still holds value, else None. Does not count as a hit.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.value is not value or entry.etag is None:
+                return None
+            age = self._clock() - entry.stored_at
+            return entry.etag, entry.modified, max(0, self.ttl - age)
+
+    def invalidate(self, key=None):
+        """Drop one key, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["ttl"] = self.ttl
+            stats["stale_ttl"] = self.stale_ttl
+            stats["inflight"] = len(self._inflight)
+        return stats
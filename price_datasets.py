@@ -0,0 +1,57 @@
+# Distinct market queries remembered per dataset
+MAX_MEMOIZED_LOOKUPS = 1024
+
+
+class EmptyDatasetError(Exception):
+    """Raised by a dataset loader for a page without market rows, so nothing is cached"""
+
+
+class PriceTrendsDataset:
+    """
+    The full price trends table for one (state, commodity, month), indexed by market.
+
+    Rows keep their original grid position so records built from the dataset are
+    identical to filtering the page directly. Market lookups use the same
+    substring rule as before ("pune" matches "Pune(Pimpri)"), resolved once per
+    distinct query string and then served from a dict.
+    """
+
+    __slots__ = ('rows', 'month', 'year', '_by_market', '_lookups')
+
+    def __init__(self, rows, month, year):
+        self.rows = rows
+        self.month = month
+        self.year = year
+        self._lookups = {}
+        self._by_market = {}
+        for i, cells in enumerate(rows[1:], 1):  # Skip header row
+            if len(cells) >= 6:
+                self._by_market.setdefault(cells[0].lower(), []).append(i)
+
+    @property
+    def empty(self):
+        """True when the table has no market rows"""
+        return not self._by_market
+
+    @property
+    def markets(self):
+        """Distinct market names present in the table"""
+        return [self.rows[indices[0]][0] for indices in self._by_market.values()]
+
+    def lookup(self, market):
+        """Return the grid positions of the rows whose market matches market"""
+        query = market.lower()
+        indices = self._lookups.get(query)
+        if indices is None:
+            indices = sorted(
+                i
+                for name, positions in self._by_market.items()
+                if query in name
+                for i in positions
+            )
+            if len(self._lookups) < MAX_MEMOIZED_LOOKUPS:
+                self._lookups[query] = indices
+        return indices
+
+    def __len__(self):
+        return max(len(self.rows) - 1, 0)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+from datetime import datetime, date
+from functools import lru_cache
+
+# Output formats accepted by ?format=
+#   records  - the original list of string-valued dicts, indented (default)
+#   compact  - the same dicts without indentation
+#   columnar - one typed array per field
+RESPONSE_FORMATS = ('records', 'compact', 'columnar')
+
+COLUMNS = ('sno', 'date', 'period', 'market', 'commodity', 'variety', 'min_price', 'max_price', 'modal_price')
+
+_COMPACT = (',', ':')
+
+
+def parse_price(value):
+    """Parse a price cell ("1,500", "1500.5") into a number; unparseable text is kept as-is"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return _parse_price_text(value)
+
+
+@lru_cache(maxsize=4096)
+def _parse_price_text(value):
+    # Like dates, a table repeats a limited set of prices
+    text = value.replace(',', '').strip()
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return value.strip()
+
+
+def parse_date(value):
+    """
+    Parse a record date. Returns (date, period): 'day' for 02-Apr-2025, 'month'
+    for 4/2025 (as the first of the month). Unparseable text is returned as-is
+    with a period of None.
+    """
+    if isinstance(value, date):
+        return value, 'day'
+    return _parse_date_text(value.strip())
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text):
+    # A scraped table repeats a handful of dates, so strptime runs once per date
+    try:
+        if '/' in text:
+            month, year = text.split('/')
+            return date(int(year), int(month), 1), 'month'
+        return datetime.strptime(text, '%d-%b-%Y').date(), 'day'
+    except ValueError:
+        return text, None
+
+
+class PriceRecord:
+    """
+    One price row with numeric prices and a real date.
+
+    to_dict() is the compatibility view: the exact string-keyed, string-valued
+    dict the API has always returned. Records built from scraped cells keep the
+    date and price cells as they were scraped (cells) so that view shows them
+    verbatim ("1,500" stays "1,500"); other records format their typed values.
+    """
+
+    __slots__ = ('sno', 'date', 'period', 'market', 'commodity', 'variety',
+                 'min_price', 'max_price', 'modal_price', 'note', 'cells')
+
+    def __init__(self, sno, date, period, market, commodity, variety,
+                 min_price, max_price, modal_price, note=None, cells=None):
+        self.sno = sno
+        self.date = date
+        self.period = period
+        self.market = market
+        self.commodity = commodity
+        self.variety = variety
+        self.min_price = min_price
+        self.max_price = max_price
+        self.modal_price = modal_price
+        self.note = note
+        self.cells = cells
+
+    @classmethod
+    def from_text(cls, sno, date_text, market, commodity, variety, min_price, max_price, modal_price, note=None):
+        """Build a record from scraped cell texts"""
+        # Cells are always text here, so the memoized parsers are called directly
+        parsed_date, period = _parse_date_text(date_text.strip())
+        return cls(
+            int(sno), parsed_date, period, market, commodity, variety,
+            _parse_price_text(min_price), _parse_price_text(max_price), _parse_price_text(modal_price), note,
+            (date_text, min_price, max_price, modal_price)
+        )
+
+    @property
+    def date_text(self):
+        """The date as the API has always shown it"""
+        if self.period == 'month':
+            return f"{self.date.month}/{self.date.year}"
+        if self.period == 'day':
+            return self.date.strftime('%d-%b-%Y')
+        return self.date
+
+    def to_dict(self):
+        if self.cells is not None:
+            date_text, min_text, max_text, modal_text = self.cells
+        else:
+            date_text = self.date_text
+            min_text = _price_text(self.min_price)
+            max_text = _price_text(self.max_price)
+            modal_text = _price_text(self.modal_price)
+        data = {
+            "S.No": str(self.sno),
+            "Date": date_text,
+            "Market": self.market,
+            "Commodity": self.commodity,
+            "Variety": self.variety,
+            "Min Price": min_text,
+            "Max Price": max_text,
+            "Modal Price": modal_text
+        }
+        if self.note:
+            data["Note"] = self.note
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, PriceRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"PriceRecord({self.sno}, {self.date_text!r}, {self.market!r}, {self.variety!r}, "
+                f"{self.min_price!r}, {self.max_price!r}, {self.modal_price!r})")
+
+
+class SourcedRecords(list):
+    """A result's PriceRecords, remembering the source that produced them for the X-Data-Source header"""
+
+    __slots__ = ('source',)
+
+    def __init__(self, records=(), source=None):
+        super().__init__(records)
+        self.source = source
+
+
+def _price_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def to_columns(records):
+    """Columnar view: one list per field, with numbers and ISO dates"""
+    columns = {name: [] for name in COLUMNS}
+    append = [columns[name].append for name in COLUMNS]
+    for record in records:
+        values = (record.sno, record.date.isoformat() if record.period else record.date, record.period,
+                  record.market, record.commodity, record.variety,
+                  record.min_price, record.max_price, record.modal_price)
+        for add, value in zip(append, values):
+            add(value)
+    notes = [record.note for record in records]
+    if any(notes):
+        columns["note"] = notes
+    return columns
+
+
+def records_payload(records, fmt='records'):
+    """Return the JSON-serializable structure for records in the given format"""
+    if fmt == 'columnar':
+        return to_columns(records)
+    return [record.to_dict() for record in records]
+
+
+def ndjson_lines(records):
+    """Yield one compact JSON object per record, newline-terminated, as records arrive"""
+    for record in records:
+        yield json.dumps(record.to_dict(), separators=_COMPACT) + "\n"
+
+
+def records_fingerprint(records):
+    """
+    Hash of the record values, used for ETags. Identical rows hash the same in
+    every worker process, so tags stay stable behind a load balancer.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for record in records:
+        digest.update(repr(tuple(getattr(record, name) for name in PriceRecord.__slots__)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def dump_records(records, fmt='records'):
+    """Serialize records; only the default format is indented, as it always was"""
+    if fmt == 'records':
+        return json.dumps(records_payload(records, fmt), indent=4)
+    return json.dumps(records_payload(records, fmt), separators=_COMPACT)
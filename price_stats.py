@@ -0,0 +1,336 @@
+import math
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from price_store import normalize
+
+INITIAL_ROWS = 4096
+INITIAL_SERIES = 256
+DEFAULT_WINDOW_DAYS = 7
+MAX_WINDOW_DAYS = 366
+# Distinct windows whose aggregates are kept up to date
+MAX_CACHED_WINDOWS = 8
+
+PERIODS = ('day', 'month')
+
+MIN, MAX, MODAL = 0, 1, 2
+
+
+def _grow(array, size):
+    """Return array with room for at least size entries along the first axis"""
+    if size <= len(array):
+        return array
+    grown = np.empty((max(size, 2 * len(array)),) + array.shape[1:], array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _price(value):
+    # Unparseable price text (kept as str by parse_price) and blanks become NaN
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+
+def _number(value, digits=2):
+    return None if math.isnan(value) else round(float(value), digits)
+
+
+def _column(values, digits=2):
+    """Round a float array into a list with None for NaN, without per-item NumPy scalars"""
+    return [None if value != value else value for value in np.round(values, digits).tolist()]
+
+
+def _dates(days):
+    """ISO dates for an array of day ordinals; a table repeats few distinct days"""
+    iso = {}
+    out = []
+    for day in days.tolist():
+        text = iso.get(day)
+        if text is None:
+            text = iso[day] = date.fromordinal(day).isoformat() if day > 0 else None
+        out.append(text)
+    return out
+
+
+class _WindowAggregates:
+    """Per-series aggregates over the last ``days`` days of each series"""
+
+    __slots__ = ('days', 'low', 'high', 'modal_sum', 'modal_count', 'observations', 'dirty')
+
+    def __init__(self, days):
+        self.days = days
+        self.low = np.empty(0)
+        self.high = np.empty(0)
+        self.modal_sum = np.empty(0)
+        self.modal_count = np.empty(0, np.int64)
+        self.observations = np.empty(0, np.int64)
+        self.dirty = set()
+
+    def resize(self, series):
+        for name in ('low', 'high', 'modal_sum', 'modal_count', 'observations'):
+            setattr(self, name, _grow(getattr(self, name), series))
+
+
+class PriceStats:
+    """
+    Rolling aggregates over every scraped price row, kept up to date as scrapes land.
+
+    A series is one (state, commodity, market, variety, period). Rows live in NumPy
+    columns (series id, day ordinal, min, max, modal) and a re-scraped date
+    overwrites its row. Each series tracks its latest and previous observation as
+    rows arrive, so day-over-day change needs no sort. Window aggregates (min of
+    min, max of max, mean modal) are grouped NumPy reductions cached per window;
+    only the series touched since the last query are recomputed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._series_ids = np.empty(INITIAL_ROWS, np.int64)
+        self._days = np.empty(INITIAL_ROWS, np.int64)
+        self._prices = np.empty((INITIAL_ROWS, 3))
+        self._rows = {}
+        self._keys = {}
+        self._info = []
+        self._latest = np.empty(INITIAL_SERIES, np.int64)
+        self._previous = np.empty(INITIAL_SERIES, np.int64)
+        self._windows = OrderedDict()
+        self.version = 0
+
+    def __len__(self):
+        return self._size
+
+    def _series_id(self, state, commodity, market, variety, period, rename=True):
+        key = (normalize(state), normalize(commodity), normalize(market), variety, period)
+        series_id = self._keys.get(key)
+        if series_id is None:
+            series_id = self._keys[key] = len(self._info)
+            self._info.append([state, commodity, market, variety, period, key])
+            self._latest = _grow(self._latest, series_id + 1)
+            self._previous = _grow(self._previous, series_id + 1)
+            self._latest[series_id] = self._previous[series_id] = -1
+        elif rename:
+            # Keep the names as most recently scraped
+            self._info[series_id][:3] = state, commodity, market
+        return series_id
+
+    def _insert(self, series_id, day, prices):
+        row = self._rows.get((series_id, day))
+        if row is None:
+            row = self._rows[(series_id, day)] = self._size
+            self._size += 1
+            if self._size > len(self._days):
+                self._series_ids = _grow(self._series_ids, self._size)
+                self._days = _grow(self._days, self._size)
+                self._prices = _grow(self._prices, self._size)
+            self._series_ids[row] = series_id
+            self._days[row] = day
+        self._prices[row] = prices
+
+        latest = self._latest[series_id]
+        if latest < 0 or day > self._days[latest]:
+            self._previous[series_id] = latest
+            self._latest[series_id] = row
+        elif day < self._days[latest]:
+            previous = self._previous[series_id]
+            if previous < 0 or day > self._days[previous]:
+                self._previous[series_id] = row
+
+    def add_records(self, state, commodity, records):
+        """Add scraped PriceRecords; returns the number of rows added or updated"""
+        added = 0
+        with self._lock:
+            for record in records:
+                # Rows whose date could not be parsed cannot be placed in a series
+                if record.period is None:
+                    continue
+                series_id = self._series_id(state, commodity, record.market, record.variety, record.period)
+                self._insert(series_id, record.date.toordinal(),
+                             (_price(record.min_price), _price(record.max_price), _price(record.modal_price)))
+                for window in self._windows.values():
+                    window.dirty.add(series_id)
+                added += 1
+            if added:
+                self.version += 1
+        return added
+
+    def add_rows(self, rows):
+        """
+        Add stored rows of (state, commodity, market, variety, date, period, min, max, modal),
+        as read back from the price store. The store keeps state and commodity
+        normalized, so they are title-cased unless a scrape already named the series.
+        Returns the number of rows added or updated.
+        """
+        added = 0
+        with self._lock:
+            for state, commodity, market, variety, day, period, low, high, modal in rows:
+                series_id = self._series_id(state.title(), commodity.title(), market, variety, period, rename=False)
+                self._insert(series_id, date.fromisoformat(day).toordinal(),
+                             (_price(low), _price(high), _price(modal)))
+                for window in self._windows.values():
+                    window.dirty.add(series_id)
+                added += 1
+            if added:
+                self.version += 1
+        return added
+
+    def _aggregates(self, days):
+        # Caller must hold the lock
+        window = self._windows.get(days)
+        if window is None:
+            window = self._windows[days] = _WindowAggregates(days)
+            window.dirty.update(range(len(self._info)))
+            while len(self._windows) > MAX_CACHED_WINDOWS:
+                self._windows.popitem(last=False)
+        self._windows.move_to_end(days)
+        if not window.dirty:
+            return window
+
+        series = len(self._info)
+        window.resize(series)
+        dirty = np.fromiter(window.dirty, np.int64, len(window.dirty))
+        touched = np.zeros(series, bool)
+        touched[dirty] = True
+
+        n = self._size
+        series_ids = self._series_ids[:n]
+        days_col = self._days[:n]
+        latest_day = self._days[self._latest[:series]]
+        mask = touched[series_ids] & (days_col > latest_day[series_ids] - days)
+        ids = series_ids[mask]
+        prices = self._prices[:n][mask]
+
+        window.low[dirty] = np.nan
+        window.high[dirty] = np.nan
+        np.fmin.at(window.low, ids, prices[:, MIN])
+        np.fmax.at(window.high, ids, prices[:, MAX])
+        has_modal = ~np.isnan(prices[:, MODAL])
+        window.modal_sum[dirty] = np.bincount(ids[has_modal], prices[has_modal, MODAL], series)[dirty]
+        window.modal_count[dirty] = np.bincount(ids[has_modal], minlength=series)[dirty]
+        window.observations[dirty] = np.bincount(ids, minlength=series)[dirty]
+        window.dirty.clear()
+        return window
+
+    def _select(self, state, commodity, market, period):
+        # Caller must hold the lock; market matches by substring like the /request lookup
+        state = normalize(state) if state else None
+        commodity = normalize(commodity) if commodity else None
+        market = normalize(market) if market else None
+        return [
+            series_id for series_id, info in enumerate(self._info)
+            if (state is None or info[5][0] == state)
+            and (commodity is None or info[5][1] == commodity)
+            and (market is None or market in info[5][2])
+            and (period is None or info[4] == period)
+        ]
+
+    def summary(self, days=DEFAULT_WINDOW_DAYS, state=None, commodity=None, market=None, period=None):
+        """
+        Return the window aggregates, latest change and cross-market spreads of the
+        series matching the filters. The window covers the last ``days`` days of
+        each series, ending at its latest observation.
+        """
+        with self._lock:
+            window = self._aggregates(days)
+            selected = np.array(self._select(state, commodity, market, period), np.int64)
+            info = [self._info[series_id] for series_id in selected]
+            latest = self._latest[selected]
+            previous = self._previous[selected]
+            latest_day = self._days[latest]
+            latest_modal = self._prices[latest, MODAL]
+            has_previous = previous >= 0
+            previous_day = np.where(has_previous, self._days[previous], 0)
+            previous_modal = np.where(has_previous, self._prices[previous, MODAL], np.nan)
+            low = window.low[selected]
+            high = window.high[selected]
+            modal_count = window.modal_count[selected]
+            observations = window.observations[selected]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                average = np.where(modal_count > 0, window.modal_sum[selected] / modal_count, np.nan)
+            rows, version = self._size, self.version
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = latest_modal - previous_modal
+            change_pct = np.where(previous_modal != 0, change / previous_modal * 100, np.nan)
+
+        columns = zip(
+            info, _dates(latest_day), observations.tolist(), _column(low), _column(high), _column(average),
+            _column(latest_modal), _dates(previous_day), _column(previous_modal), _column(change),
+            _column(change_pct)
+        )
+        series = [
+            {
+                "state": entry[0],
+                "commodity": entry[1],
+                "market": entry[2],
+                "variety": entry[3],
+                "period": entry[4],
+                "date": day,
+                "observations": count,
+                "min_price": min_price,
+                "max_price": max_price,
+                "avg_modal_price": avg_modal,
+                "modal_price": modal,
+                "previous_date": previous_date,
+                "previous_modal_price": previous,
+                "change": delta,
+                "change_pct": delta_pct,
+            }
+            for (entry, day, count, min_price, max_price, avg_modal, modal,
+                 previous_date, previous, delta, delta_pct) in columns
+        ]
+
+        return {
+            "window_days": days,
+            "version": version,
+            "rows": rows,
+            "series_count": len(series),
+            "series": series,
+            "spreads": self._spreads(info, latest_day, latest_modal),
+        }
+
+    @staticmethod
+    def _spreads(info, latest_day, latest_modal):
+        """
+        Cheapest vs dearest market per (commodity, variety, period), comparing only
+        the markets reporting on the most recent date of the group
+        """
+        groups = {}
+        for i, entry in enumerate(info):
+            if not math.isnan(latest_modal[i]):
+                groups.setdefault((entry[5][1], entry[3], entry[4]), []).append(i)
+
+        spreads = []
+        for members in groups.values():
+            members = np.array(members)
+            newest = latest_day[members].max()
+            members = members[latest_day[members] == newest]
+            if len(members) < 2:
+                continue
+            modal = latest_modal[members]
+            low, high = members[modal.argmin()], members[modal.argmax()]
+            spread = latest_modal[high] - latest_modal[low]
+            spreads.append({
+                "commodity": info[low][1],
+                "variety": info[low][3],
+                "period": info[low][4],
+                "date": date.fromordinal(int(newest)).isoformat(),
+                "markets": len(members),
+                "low": {"state": info[low][0], "market": info[low][2], "modal_price": _number(latest_modal[low])},
+                "high": {"state": info[high][0], "market": info[high][2], "modal_price": _number(latest_modal[high])},
+                "spread": _number(spread),
+                "spread_pct": _number(spread / latest_modal[low] * 100) if latest_modal[low] else None,
+            })
+        spreads.sort(key=lambda s: -(s["spread_pct"] or 0))
+        return spreads
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": self._size,
+                "series": len(self._info),
+                "version": self.version,
+                "cached_windows": list(self._windows),
+            }
@@ -0,0 +1,247 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, date, timedelta
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    state TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    market TEXT NOT NULL,
+    variety TEXT NOT NULL,
+    date TEXT NOT NULL,
+    period TEXT NOT NULL,
+    min_price NUMERIC,
+    max_price NUMERIC,
+    modal_price NUMERIC,
+    source TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (state, commodity, market_key, variety, date, period)
+);
+CREATE INDEX IF NOT EXISTS idx_prices_state_lookup ON prices (state, commodity, market_key, date);
+CREATE INDEX IF NOT EXISTS idx_prices_lookup ON prices (commodity, market_key, date);
+CREATE INDEX IF NOT EXISTS idx_prices_scraped_at ON prices (scraped_at);
+CREATE TABLE IF NOT EXISTS coverage (
+    state TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    date_from TEXT NOT NULL,
+    date_to TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_coverage_lookup ON coverage (state, commodity, market_key, date_from);
+"""
+
+UPSERT = """
+INSERT INTO prices (state, commodity, market_key, market, variety, date, period,
+                    min_price, max_price, modal_price, source, scraped_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (state, commodity, market_key, variety, date, period) DO UPDATE SET
+    market = excluded.market,
+    min_price = excluded.min_price,
+    max_price = excluded.max_price,
+    modal_price = excluded.modal_price,
+    source = excluded.source,
+    scraped_at = excluded.scraped_at
+"""
+
+
+def normalize(name):
+    """Normalize a state/commodity/market name for storage keys"""
+    return " ".join(name.lower().split())
+
+
+def parse_query_date(value):
+    """Parse a YYYY-MM-DD or DD-Mon-YYYY query parameter"""
+    for fmt in ('%Y-%m-%d', '%d-%b-%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def subtract_ranges(start, end, covered):
+    """Return the parts of [start, end] not covered by any of the (from, to) date ranges"""
+    missing = []
+    cursor = start
+    for covered_from, covered_to in sorted(covered):
+        if covered_to < cursor:
+            continue
+        if covered_from > end:
+            break
+        if covered_from > cursor:
+            missing.append((cursor, covered_from - timedelta(days=1)))
+        cursor = max(cursor, covered_to + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+class PriceStore:
+    """
+    SQLite (WAL mode) store of every scraped price row.
+
+    Rows are upserted in bulk per scraped table. A coverage table remembers which
+    daily date ranges have been fetched from the archive (even when they were
+    empty), so history queries only go upstream for the gaps.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections must not be shared, and a
+        # worker forked from a preloading master must not reuse the master's
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _connect(self):
+        return _Transaction(self._conn())
+
+    def upsert_records(self, state, commodity, records, source):
+        """Bulk upsert PriceRecords and return the number of rows written"""
+        now = time.time()
+        state_key = normalize(state)
+        commodity_key = normalize(commodity)
+        params = [
+            (state_key, commodity_key, normalize(record.market), record.market,
+             record.variety, record.date.isoformat(), record.period,
+             record.min_price, record.max_price, record.modal_price, source, now)
+            for record in records
+            # Rows whose date could not be parsed cannot be placed in history
+            if record.period is not None
+        ]
+        if not params:
+            return 0
+
+        with self._connect() as conn:
+            conn.executemany(UPSERT, params)
+        with self._lock:
+            self.rows_written += len(params)
+        return len(params)
+
+    def mark_covered(self, state, commodity, market, date_from, date_to):
+        """Record that the daily rows for [date_from, date_to] have been fetched"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize(state), normalize(commodity), normalize(market),
+                 date_from.isoformat(), date_to.isoformat(), time.time())
+            )
+
+    def missing_ranges(self, state, commodity, market, date_from, date_to):
+        """Return the daily (from, to) ranges within [date_from, date_to] never fetched"""
+        with self._connect() as conn:
+            covered = conn.execute(
+                "SELECT date_from, date_to FROM coverage "
+                "WHERE state = ? AND commodity = ? AND market_key = ? AND date_from <= ? AND date_to >= ?",
+                (normalize(state), normalize(commodity), normalize(market),
+                 date_to.isoformat(), date_from.isoformat())
+            ).fetchall()
+        covered = [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in covered]
+        return subtract_ranges(date_from, date_to, covered)
+
+    def _select(self, commodity, market, date_from, date_to, state=None, period=None):
+        sql = ("SELECT date, period, market, variety, min_price, max_price, modal_price, source "
+               "FROM prices WHERE commodity = ? AND market_key = ? AND date BETWEEN ? AND ?")
+        params = [normalize(commodity), normalize(market), date_from.isoformat(), date_to.isoformat()]
+        if state is not None:
+            sql = sql.replace("WHERE commodity", "WHERE state = ? AND commodity")
+            params.insert(0, normalize(state))
+        if period is not None:
+            sql += " AND period = ?"
+            params.append(period)
+        sql += " ORDER BY date, period, variety"
+        return sql, params
+
+    def query(self, commodity, market, date_from, date_to, state=None, period=None):
+        """Return stored rows for a commodity and market between two dates, oldest first"""
+        sql, params = self._select(commodity, market, date_from, date_to, state, period)
+        with self._connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def iter_query(self, commodity, market, date_from, date_to, state=None, period=None, chunk_size=500):
+        """Like query(), but yield rows a chunk at a time so memory stays bounded"""
+        sql, params = self._select(commodity, market, date_from, date_to, state, period)
+        # Runs on a private connection: the caller may write through this thread's
+        # connection (or stop early) while the cursor is still open
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_rows(self, since=None, chunk_size=5000):
+        """
+        Yield every stored row (or, with since, the rows scraped after that time) as
+        (state, commodity, market, variety, date, period, min_price, max_price,
+        modal_price), a chunk at a time
+        """
+        sql = ("SELECT state, commodity, market, variety, date, period, min_price, max_price, modal_price "
+               "FROM prices")
+        params = []
+        if since is not None:
+            sql += " WHERE scraped_at > ?"
+            params.append(since)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+            ranges = conn.execute("SELECT COUNT(*) FROM coverage").fetchone()[0]
+        with self._lock:
+            written = self.rows_written
+        return {
+            "path": self.path,
+            "rows": rows,
+            "covered_ranges": ranges,
+            "rows_written": written,
+            "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+class _Transaction:
+    """Context manager wrapping the statements of a with block in one transaction"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
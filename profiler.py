@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every ``interval`` seconds from a helper
+    thread. The result is in collapsed-stack format (one "a;b;c count" line per
+    distinct stack), which flamegraph tools read directly. Overhead is one stack
+    walk per sample, so it is cheap enough to switch on for single requests.
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.started_at = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return the samples as collapsed stacks, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """Keeps the last ``max_profiles`` request profiles in memory by id"""
+
+    def __init__(self, max_profiles=50):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex[:12]
+
+    def add(self, label, profiler, profile_id=None):
+        profile_id = profile_id or self.new_id()
+        with self._lock:
+            self._profiles[profile_id] = (label, profiler)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self):
+        with self._lock:
+            profiles = list(self._profiles.items())
+        return [
+            {"id": profile_id, "request": label, "duration": round(profiler.duration, 4),
+             "samples": sum(profiler.samples.values())}
+            for profile_id, (label, profiler) in reversed(profiles)
+        ]
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import threading
+import time
+import logging
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from metrics import SOURCE_ATTEMPTS
+from upstream import cancel_scope
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('hedge', 'race', 'serial')
+
+
+class SourcesUnavailable(Exception):
+    """Raised when no real source returned data for a query"""
+
+
+def _run_cancellable(cancel, fetch):
+    with cancel_scope(cancel):
+        return fetch()
+
+
+def _discard(task):
+    # Cancel a losing task, or collect its outcome so asyncio does not log it as unretrieved
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+class SourceStrategy:
+    """
+    Runs the real data sources of a query and returns the first valid result.
+
+    Sources are given in preference order. 'race' starts them all at once, 'hedge'
+    starts the next one when the running ones have not answered within
+    hedge_delay seconds, and 'serial' only moves on once the running one failed
+    or came back empty (every mode moves on immediately in that case). When a
+    source wins, the rest are cancelled: queued ones never start, running threads
+    stop at their next upstream request (see upstream.cancel_scope) and async
+    tasks are cancelled outright. timeout bounds the whole attempt.
+    """
+
+    def __init__(self, executor, mode='hedge', hedge_delay=2.0, timeout=20):
+        if mode not in STRATEGIES:
+            raise ValueError(f"Unknown source strategy {mode!r}, expected one of {', '.join(STRATEGIES)}")
+        self.executor = executor
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._attempts = Counter()
+
+    def _start_delay(self):
+        """Seconds before the next source starts alongside the running ones; None waits for an outcome"""
+        if self.mode == 'race':
+            return 0
+        if self.mode == 'serial':
+            return None
+        return self.hedge_delay
+
+    def _record(self, source, outcome):
+        SOURCE_ATTEMPTS.inc(source=source, outcome=outcome)
+        with self._lock:
+            self._attempts[(source, outcome)] += 1
+
+    def _failed(self, name, error):
+        logger.warning(f"Source {name} failed: {error}")
+        self._record(name, 'failed')
+
+    def run(self, sources, valid=bool):
+        """
+        Run [(name, fetch), ...] on the executor and return (name, result) for the
+        first valid result, or (None, None) when every source failed, came back
+        empty or the timeout passed
+        """
+        delay = self._start_delay()
+        cancel = threading.Event()
+        deadline = time.monotonic() + self.timeout
+        waiting = list(sources)
+        running = {}
+        next_start = 0
+        winner = None
+        try:
+            while waiting or running:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if waiting and (not running or (delay is not None and now >= next_start)):
+                    name, fetch = waiting.pop(0)
+                    if running:
+                        logger.info(f"Starting source {name} after {delay}s without an answer")
+                    context = contextvars.copy_context()
+                    running[self.executor.submit(context.run, _run_cancellable, cancel, fetch)] = name
+                    next_start = now + (delay or 0)
+                    continue
+
+                timeout = deadline - now
+                if waiting and delay is not None:
+                    timeout = min(timeout, next_start - now)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._failed(name, e)
+                        continue
+                    if not valid(result):
+                        self._record(name, 'empty')
+                        continue
+                    self._record(name, 'won')
+                    winner = name
+                    return name, result
+            return None, None
+        finally:
+            cancel.set()
+            for future, name in running.items():
+                future.cancel()
+                self._record(name, 'cancelled' if winner else 'timeout')
+            for name, _ in waiting:
+                self._record(name, 'skipped')
+
+    async def run_async(self, sources, valid=bool):
+        """Async version of run(); each fetch returns a coroutine and runs as a task"""
+        loop = asyncio.get_running_loop()
+        delay = self._start_delay()
+        deadline = loop.time() + self.timeout
+        waiting = list(sources)
+        running = {}
+        next_start = 0
+        winner = None
+        try:
+            while waiting or running:
+                now = loop.time()
+                if now >= deadline:
+                    break
+                if waiting and (not running or (delay is not None and now >= next_start)):
+                    name, fetch = waiting.pop(0)
+                    if running:
+                        logger.info(f"Starting source {name} after {delay}s without an answer")
+                    running[asyncio.ensure_future(fetch())] = name
+                    next_start = now + (delay or 0)
+                    continue
+
+                timeout = deadline - now
+                if waiting and delay is not None:
+                    timeout = min(timeout, next_start - now)
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    if task.exception() is not None:
+                        self._failed(name, task.exception())
+                        continue
+                    result = task.result()
+                    if not valid(result):
+                        self._record(name, 'empty')
+                        continue
+                    self._record(name, 'won')
+                    winner = name
+                    return name, result
+            return None, None
+        finally:
+            for task, name in running.items():
+                _discard(task)
+                self._record(name, 'cancelled' if winner else 'timeout')
+            for name, _ in waiting:
+                self._record(name, 'skipped')
+
+    def stats(self):
+        with self._lock:
+            attempts = {}
+            for (source, outcome), count in self._attempts.items():
+                attempts.setdefault(source, {})[outcome] = count
+        return {
+            "strategy": self.mode,
+            "hedge_delay": self.hedge_delay,
+            "timeout": self.timeout,
+            "attempts": attempts,
+        }
@@ -0,0 +1,56 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# APIwebScrapingPopUp configures itself from the environment when it is imported:
+# keep its SQLite store, catalog and rate limiter files out of the working tree and
+# point it at an address where nothing answers, so no test can reach agmarknet
+_state_dir = tempfile.mkdtemp(prefix='agmarket-tests-')
+os.environ.setdefault('PRICE_STORE_PATH', os.path.join(_state_dir, 'prices.db'))
+os.environ.setdefault('CATALOG_PATH', os.path.join(_state_dir, 'catalog.json'))
+os.environ.setdefault('UPSTREAM_RATE_STATE_DIR', _state_dir)
+os.environ.setdefault('UPSTREAM_RATE_LIMIT', '0')
+os.environ.setdefault('AGMARKNET_BASE_URL', 'http://127.0.0.1:9')
+
+
+class FakeUpstream:
+    """
+    Stands in for form_tokens.post: every postback to a page URL is answered by
+    the handler registered for it, handler(form_data) -> html, which may raise
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.posts = []
+
+    def post(self, session, url, form_data, source=''):
+        self.posts.append((url, dict(form_data)))
+        return SimpleNamespace(text=self.handlers[url](form_data), status_code=200)
+
+    def count(self, url):
+        return sum(1 for posted, _ in self.posts if posted == url)
+
+
+@pytest.fixture
+def scraper(monkeypatch, tmp_path):
+    """The scraper module with empty caches and its own price store"""
+    import APIwebScrapingPopUp as scraper
+    from price_store import PriceStore
+    monkeypatch.setattr(scraper, 'price_store', PriceStore(str(tmp_path / 'prices.db')))
+    monkeypatch.setattr(scraper, 'price_stats', None)
+    monkeypatch.setattr(scraper, '_price_stats_loaded_at', None)
+    scraper.price_cache.invalidate()
+    scraper.dataset_cache.invalidate()
+    yield scraper
+    scraper.price_cache.invalidate()
+    scraper.dataset_cache.invalidate()
+
+
+@pytest.fixture
+def upstream(scraper, monkeypatch):
+    """A FakeUpstream installed in place of the scraper's form postbacks"""
+    fake = FakeUpstream()
+    monkeypatch.setattr(scraper.form_tokens, 'post', fake.post)
+    return fake
@@ -0,0 +1,74 @@
+from benchmarks.fixtures import MARKETS, form_page, market_page
+from catalog import Catalog, CodeIndex, harvest_catalog, normalize_name
+
+STATES = {"Tamil Nadu": "24", "Jammu & Kashmir": "10", "Karnataka": "12", "Orissa": "20"}
+
+
+def test_normalize_name():
+    assert normalize_name('  Jammu & Kashmir ') == 'jammu and kashmir'
+    assert normalize_name('Pune(Pimpri)') == 'pune pimpri'
+
+
+def test_match_exact_ignoring_case_and_punctuation():
+    index = CodeIndex(STATES)
+    assert index.match('tamil nadu') == ('Tamil Nadu', '24')
+    assert index.match('Jammu and Kashmir') == ('Jammu & Kashmir', '10')
+    assert index.code('KARNATAKA') == '12'
+
+
+def test_match_alias_compact_and_fuzzy():
+    index = CodeIndex({"Bangalore": "1", "Mysore": "2", "Tamil Nadu": "24", "Odisha": "20"})
+    assert index.match('Bengaluru') == ('Bangalore', '1')
+    assert index.match('orissa') == ('Odisha', '20')
+    assert index.match('TamilNadu') == ('Tamil Nadu', '24')
+    assert index.match('Banglore') == ('Bangalore', '1')
+
+
+def test_no_match():
+    index = CodeIndex(STATES)
+    assert index.match('Atlantis') is None
+    assert index.match('') is None
+    assert index.match(None) is None
+    # Memoized misses stay misses
+    assert index.code('Atlantis') is None
+
+
+def test_market_name_uses_catalog_then_aliases():
+    catalog = Catalog.builtin()
+    assert catalog.market_name('12', 'Bengaluru') == 'Bangalore'
+    assert catalog.market_name('12', 'mysore') == 'Mysore'
+    # Tumkur is not in the built-in Karnataka markets, but its alias is known
+    assert catalog.market_name('12', 'Tumakuru') == 'tumkur'
+    assert catalog.market_name('99', 'Poona') == 'pune'
+    assert catalog.market_name('12', 'Atlantis') is None
+
+
+def test_harvest_reads_the_dropdowns():
+    posted = []
+
+    def post_state(state_code):
+        posted.append(state_code)
+        if state_code == '12':
+            return market_page(viewstate_kb=1)
+        raise RuntimeError("upstream down")
+
+    catalog = harvest_catalog(lambda: form_page(viewstate_kb=1), post_state)
+    assert catalog.state_code('Karnataka') == '12'
+    assert catalog.commodity_code('Potato') == '24'
+    assert catalog.market_code('12', 'Hubli') == str(MARKETS.index('Hubli') + 1)
+    # States whose market page failed are skipped
+    assert list(catalog.markets) == ['12']
+    assert len(posted) == len(catalog.states)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'catalog.json')
+    Catalog(STATES, {"Potato": "24"}, {"12": {"Bangalore": "1"}}, harvested_at=1.5).save(path)
+    loaded = Catalog.load_or_builtin(path)
+    assert loaded.source == path
+    assert loaded.market_code('12', 'bangalore') == '1'
+    assert loaded.summary()["markets"] == 1
+
+    with open(path, 'w') as f:
+        f.write('{')
+    assert Catalog.load_or_builtin(path).source == 'builtin'
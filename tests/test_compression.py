@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+from flask import Response
+
+import compression
+from compression import compress, compress_response, negotiate_encoding
+
+needs_brotli = pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+
+
+def test_missing_or_identity_header_is_uncompressed():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('') is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('deflate, compress') is None
+
+
+def test_gzip_only():
+    assert negotiate_encoding('gzip') == 'gzip'
+    assert negotiate_encoding('GZIP;q=0.5') == 'gzip'
+
+
+def test_zero_q_refuses_coding():
+    assert negotiate_encoding('gzip;q=0') is None
+    assert negotiate_encoding('*, gzip;q=0, br;q=0') is None
+    assert negotiate_encoding('gzip;q=nonsense') is None
+
+
+@needs_brotli
+def test_highest_q_wins_and_ties_prefer_br():
+    assert negotiate_encoding('gzip, deflate, br') == 'br'
+    assert negotiate_encoding('gzip;q=1.0, br;q=0.8') == 'gzip'
+    assert negotiate_encoding('gzip;q=0.5, br;q=0.5') == 'br'
+
+
+@needs_brotli
+def test_wildcard_covers_unlisted_codings():
+    assert negotiate_encoding('*') == 'br'
+    assert negotiate_encoding('gzip;q=0.9, *;q=0.1') == 'gzip'
+    assert negotiate_encoding('br;q=0, *') == 'gzip'
+
+
+def test_compress_gzip_round_trip():
+    body = b'{"price": 1}' * 100
+    assert gzip.decompress(compress(body, 'gzip')) == body
+
+
+def test_large_buffered_response_is_compressed():
+    body = b'{"price": 1}' * 200
+    response = compress_response(Response(body), 'gzip', min_size=1024)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == body
+
+
+def test_small_and_streamed_responses_are_left_alone():
+    small = compress_response(Response(b'{}'), 'gzip', min_size=1024)
+    assert 'Content-Encoding' not in small.headers
+    streamed = compress_response(Response(iter([b'{}\n'] * 2000)), 'gzip', min_size=1024)
+    assert 'Content-Encoding' not in streamed.headers
+    assert b''.join(streamed.response) == b'{}\n' * 2000
@@ -0,0 +1,50 @@
+from conditional import caching_headers, entity_tag, not_modified
+
+ETAG = entity_tag('abc', 'json')
+MODIFIED = 1700000000  # Tue, 14 Nov 2023 22:13:20 GMT
+
+
+def test_entity_tag_is_weak_per_variant():
+    assert ETAG == 'W/"abc-json"'
+    assert entity_tag('abc', 'csv') != ETAG
+
+
+def test_if_none_match_compares_weakly():
+    assert not_modified(ETAG, None, 'W/"abc-json"', None)
+    assert not_modified(ETAG, None, '"abc-json"', None)
+    assert not not_modified(ETAG, None, 'W/"abc-csv"', None)
+
+
+def test_if_none_match_list_and_wildcard():
+    assert not_modified(ETAG, None, 'W/"old-json", W/"abc-json"', None)
+    assert not_modified(ETAG, None, ' * ', None)
+
+
+def test_if_modified_since():
+    assert not_modified(ETAG, MODIFIED, None, 'Tue, 14 Nov 2023 22:13:20 GMT')
+    assert not_modified(ETAG, MODIFIED + 0.7, None, 'Tue, 14 Nov 2023 22:13:20 GMT')
+    assert not not_modified(ETAG, MODIFIED, None, 'Tue, 14 Nov 2023 22:13:19 GMT')
+    assert not not_modified(ETAG, None, None, 'Tue, 14 Nov 2023 22:13:20 GMT')
+
+
+def test_if_none_match_takes_precedence():
+    assert not not_modified(ETAG, MODIFIED, 'W/"old-json"', 'Tue, 14 Nov 2023 22:13:20 GMT')
+
+
+def test_invalid_date_is_ignored():
+    assert not not_modified(ETAG, MODIFIED, None, 'yesterday')
+    assert not not_modified(ETAG, MODIFIED, None, None)
+
+
+def test_caching_headers_with_max_age():
+    headers = dict(caching_headers(ETAG, MODIFIED, max_age=120.5, stale=60))
+    assert headers['ETag'] == ETAG
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['Last-Modified'] == 'Tue, 14 Nov 2023 22:13:20 GMT'
+    assert headers['Cache-Control'] == 'public, max-age=120, stale-while-revalidate=60'
+
+
+def test_caching_headers_without_max_age_revalidate():
+    headers = dict(caching_headers(ETAG, stale=60))
+    assert 'Last-Modified' not in headers
+    assert headers['Cache-Control'] == 'no-cache'
@@ -0,0 +1,108 @@
+import pytest
+from requests.cookies import RequestsCookieJar
+
+from form_tokens import FormTokenStore, TokenRejected, extract_form_tokens, is_rejected
+
+URL = 'https://agmarknet.example/PriceTrends/SA_Month_PriMV.aspx'
+
+
+def form_page(version):
+    return (
+        f'<input type="hidden" name="__VIEWSTATE" value="state-{version}" />'
+        f'<input type="hidden" name="__VIEWSTATEGENERATOR" value="gen-{version}" />'
+        f'<input type="hidden" name="__EVENTVALIDATION" value="valid-{version}" />'
+    )
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Response:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class Session:
+    """Serves a new token version on every GET and the queued responses on POST"""
+
+    def __init__(self, *posts):
+        self.cookies = RequestsCookieJar()
+        self.gets = 0
+        self.posted = []
+        self.posts = list(posts)
+
+    def get(self, url):
+        self.gets += 1
+        self.cookies.set('ASP.NET_SessionId', f'session-{self.gets}')
+        return Response(form_page(self.gets))
+
+    def post(self, url, data):
+        self.posted.append(data)
+        return self.posts.pop(0) if self.posts else Response('<table id="cphBody_gridRecords"></table>')
+
+
+def test_extract_form_tokens():
+    assert extract_form_tokens(form_page(1)) == {
+        '__VIEWSTATE': 'state-1',
+        '__VIEWSTATEGENERATOR': 'gen-1',
+        '__EVENTVALIDATION': 'valid-1',
+    }
+    with pytest.raises(ValueError):
+        extract_form_tokens('<input type="hidden" name="__VIEWSTATE" value="x" />')
+
+
+def test_rejection_markers():
+    assert is_rejected(500, '')
+    assert is_rejected(200, 'Server Error: Invalid postback or callback argument.')
+    assert not is_rejected(200, '<table></table>')
+
+
+def test_tokens_are_fetched_once_and_reused():
+    store = FormTokenStore(clock=Clock())
+    session = Session()
+    store.post(session, URL, {'ctl00$cphBody$cboState': 'KK'})
+    store.post(session, URL, {'ctl00$cphBody$cboState': 'MH'})
+    assert session.gets == 1
+    assert [data['__VIEWSTATE'] for data in session.posted] == ['state-1', 'state-1']
+    assert session.posted[1]['ctl00$cphBody$cboState'] == 'MH'
+    assert session.cookies.get('ASP.NET_SessionId') == 'session-1'
+    assert store.stats()["fetches"] == 1
+    assert store.stats()["reuses"] == 1
+
+
+def test_expired_tokens_are_refetched():
+    clock = Clock()
+    store = FormTokenStore(max_age=60, clock=clock)
+    session = Session()
+    store.post(session, URL, {})
+    clock.now = 60
+    store.post(session, URL, {})
+    assert session.gets == 2
+    assert session.posted[1]['__VIEWSTATE'] == 'state-2'
+
+
+def test_rejected_tokens_are_refreshed_once():
+    store = FormTokenStore(clock=Clock())
+    session = Session(Response('Validation of viewstate MAC failed'))
+    response = store.post(session, URL, {})
+    assert response.status_code == 200
+    assert [data['__VIEWSTATE'] for data in session.posted] == ['state-1', 'state-2']
+    assert store.stats()["rejections"] == 1
+
+
+def test_tokens_rejected_twice_raise():
+    store = FormTokenStore(clock=Clock())
+    session = Session(Response('', 500), Response('', 500))
+    with pytest.raises(TokenRejected):
+        store.post(session, URL, {})
+    assert store.stats()["pages"] == 0
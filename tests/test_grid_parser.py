@@ -0,0 +1,60 @@
+from bs4 import BeautifulSoup
+
+from benchmarks.fixtures import archive_page, price_trends_page
+from grid_parser import extract_grid_rows, extract_hidden_fields
+
+NAVIGATION = '<table><tr><td><a href="/">Home</a></td></tr></table>'
+
+
+def soup_rows(page):
+    # What the scraper did before grid_parser: a full html.parser soup
+    table = BeautifulSoup(page, 'html.parser').find('table', {'id': 'cphBody_gridRecords'})
+    return [[td.text.strip() for td in tr.find_all('td')] for tr in table.find_all('tr')]
+
+
+def test_rows_match_the_full_soup_on_fixture_pages():
+    for page in (price_trends_page(rows=50, viewstate_kb=4), archive_page(rows=50, viewstate_kb=4)):
+        rows = extract_grid_rows(page)
+        assert len(rows) == 51
+        assert rows == soup_rows(page)
+
+
+def test_grid_is_found_by_id_and_cells_are_stripped():
+    page = (NAVIGATION +
+            '<TABLE class="x" id="gvReportData"><tr><th>Market</th></tr>'
+            '<tr><td> <span>Bangalore</span> </td><td>A &amp; B</td></tr></TABLE>')
+    assert extract_grid_rows(page) == [[], ['Bangalore', 'A & B']]
+
+
+def test_nested_tables_stay_inside_the_grid():
+    page = ('<table id="cphBody_gridRecords"><tr><td><table><tr><td>inner</td></tr></table></td></tr>'
+            '<tr><td>last</td></tr></table><table><tr><td>after</td></tr></table>')
+    rows = extract_grid_rows(page)
+    assert ['last'] in rows
+    assert ['after'] not in rows
+
+
+def test_fallback_by_class_and_position():
+    grid = '<table class="tableagmark_new"><tr><td>row</td></tr></table>'
+    assert extract_grid_rows(NAVIGATION + grid, table_class='tableagmark_new') == [['row']]
+    assert extract_grid_rows(NAVIGATION + grid, table_index=1) == [['row']]
+
+
+def test_missing_grid_is_none():
+    assert extract_grid_rows('<p>Server busy</p>') is None
+    assert extract_grid_rows(NAVIGATION, table_index=1) is None
+    assert extract_grid_rows(NAVIGATION, table_class='tableagmark_new') is None
+
+
+def test_hidden_fields():
+    page = ('<input type="hidden" name="__VIEWSTATE" value="a&amp;b" />'
+            "<INPUT TYPE='HIDDEN' NAME='__EVENTVALIDATION' VALUE='x'>"
+            '<input type=hidden name=__VIEWSTATEGENERATOR value=C0FFEE>'
+            '<input type="hidden" name="empty">'
+            '<input type="text" name="cphBody_txtDate" value="01-Apr-2025">')
+    assert extract_hidden_fields(page) == {
+        '__VIEWSTATE': 'a&b',
+        '__EVENTVALIDATION': 'x',
+        '__VIEWSTATEGENERATOR': 'C0FFEE',
+        'empty': '',
+    }
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+
+from price_cache import PriceCache
+from upstream import USER, current_traffic, traffic
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_hit_after_miss():
+    cache = PriceCache(ttl=10, stale_ttl=10, clock=Clock())
+    assert cache.get_or_load('k', lambda: 1) == 1
+    assert cache.get_or_load('k', lambda: 2) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = PriceCache(ttl=10, stale_ttl=10, clock=Clock())
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats()["coalesced"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ['value'] * 3
+
+
+def test_failed_load_is_raised_to_every_waiter_and_not_cached():
+    cache = PriceCache(ttl=10, stale_ttl=10, clock=Clock())
+
+    def loader():
+        raise ValueError("upstream down")
+
+    for _ in range(2):
+        try:
+            cache.get_or_load('k', loader)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+    assert cache.stats()["size"] == 0
+    assert cache.get_or_load('k', lambda: 1) == 1
+
+
+def test_stale_entry_is_served_while_refreshing():
+    clock = Clock()
+    cache = PriceCache(ttl=10, stale_ttl=100, clock=clock)
+    cache.get_or_load('k', lambda: 'old')
+    clock.now = 50
+    assert cache.get_or_load('k', lambda: 'new') == 'old'
+    wait_for(lambda: cache.stats()["refreshes"] == 1)
+    assert cache.get_or_load('k', lambda: 'newer') == 'new'
+
+
+def test_failed_refresh_keeps_stale_entry_and_allows_retry():
+    clock = Clock()
+    cache = PriceCache(ttl=10, stale_ttl=100, clock=clock)
+    cache.get_or_load('k', lambda: 'old')
+    clock.now = 50
+
+    def failing():
+        raise ValueError("upstream down")
+
+    assert cache.get_or_load('k', failing) == 'old'
+    wait_for(lambda: cache.stats()["refresh_errors"] == 1)
+    assert cache.get_or_load('k', lambda: 'new') == 'old'
+    wait_for(lambda: cache.stats()["refreshes"] == 1)
+    assert cache.peek('k') == 'new'
+
+
+def test_entry_past_stale_window_is_loaded_synchronously():
+    clock = Clock()
+    cache = PriceCache(ttl=10, stale_ttl=10, clock=clock)
+    cache.get_or_load('k', lambda: 'old')
+    clock.now = 25
+    assert cache.peek('k') is None
+    assert cache.get_or_load('k', lambda: 'new') == 'new'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PriceCache(ttl=10, stale_ttl=10, max_entries=2, clock=Clock())
+    cache.get_or_load('a', lambda: 1)
+    cache.get_or_load('b', lambda: 2)
+    cache.get_or_load('a', lambda: 1)
+    cache.get_or_load('c', lambda: 3)
+    assert cache.peek('b') is None
+    assert cache.peek('a') == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_validators_keep_modified_time_for_unchanged_content():
+    clock = Clock()
+    cache = PriceCache(ttl=10, stale_ttl=10, clock=clock, fingerprint=lambda value: str(value[0]))
+    first = cache.get_or_load('k', lambda: [1])
+    etag, modified, max_age = cache.validators('k', first)
+    assert (etag, max_age) == ('1', 10)
+
+    clock.now = 4
+    same = cache.refresh('k', lambda: [1])
+    assert cache.validators('k', same)[:2] == (etag, modified)
+    assert cache.validators('k', same)[2] == 10
+    # The old value is no longer what the entry holds
+    assert cache.validators('k', first) is None
+
+    changed = cache.refresh('k', lambda: [2])
+    assert cache.validators('k', changed)[0] == '2'
+
+
+def test_async_stale_refresh_runs_as_refresh_traffic():
+    clock = Clock()
+    cache = PriceCache(ttl=10, stale_ttl=100, clock=clock)
+    seen = []
+
+    async def load(value):
+        seen.append(current_traffic())
+        await asyncio.sleep(0.01)
+        return value
+
+    async def scenario():
+        assert await cache.aget_or_load('k', lambda: load('old')) == 'old'
+        clock.now = 50
+        with traffic(USER, 'client'):
+            assert await cache.aget_or_load('k', lambda: load('new')) == 'old'
+        assert len(cache._refresh_tasks) == 1
+        while cache._refresh_tasks:
+            await asyncio.sleep(0.01)
+        assert await cache.aget_or_load('k', lambda: load('newer')) == 'new'
+
+    asyncio.run(scenario())
+    assert seen[1][0] == 'refresh'
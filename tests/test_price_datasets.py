@@ -0,0 +1,38 @@
+from price_datasets import PriceTrendsDataset
+
+HEADER = ['Market', 'Variety', 'Min Price', 'Max Price', 'Modal Price', 'Arrivals']
+ROWS = [
+    HEADER,
+    ['Pune', 'Local', '1000', '1200', '1100', '10'],
+    ['Pune(Pimpri)', 'Local', '1050', '1250', '1150', '5'],
+    ['Mumbai', 'Local', '1500', '1700', '1600', '20'],
+    ['Pune', 'Hybrid', '900', '1100', '1000', '8'],
+    ['Total'],
+]
+
+
+def test_lookup_matches_markets_by_substring_in_grid_order():
+    dataset = PriceTrendsDataset(ROWS, 4, 2025)
+    assert dataset.lookup('pune') == [1, 2, 4]
+    assert dataset.lookup('PUNE(pimpri)') == [2]
+    assert dataset.lookup('Mumbai') == [3]
+    assert dataset.lookup('Nashik') == []
+
+
+def test_lookups_are_memoized():
+    dataset = PriceTrendsDataset(ROWS, 4, 2025)
+    first = dataset.lookup('pune')
+    assert dataset.lookup('Pune') is first
+
+
+def test_short_rows_are_not_markets():
+    dataset = PriceTrendsDataset(ROWS, 4, 2025)
+    assert dataset.markets == ['Pune', 'Pune(Pimpri)', 'Mumbai']
+    assert len(dataset) == 5
+    assert not dataset.empty
+
+
+def test_header_only_table_is_empty():
+    assert PriceTrendsDataset([HEADER], 4, 2025).empty
+    assert PriceTrendsDataset([], 4, 2025).empty
+    assert len(PriceTrendsDataset([], 4, 2025)) == 0
@@ -0,0 +1,80 @@
+import json
+from datetime import date
+
+from price_records import (PriceRecord, dump_records, ndjson_lines, parse_date, parse_price, records_fingerprint,
+                           to_columns)
+
+
+def scraped():
+    return [
+        PriceRecord.from_text('1', '02-Apr-2025', 'Bangalore', 'Potato', 'Local', '1,500', '2000.00', '1750.50'),
+        PriceRecord.from_text('2', '2-apr-2025', 'Mysore', 'Potato', 'Hybrid', '1200', '1400', 'NR'),
+    ]
+
+
+def test_parse_price():
+    assert parse_price('1,500') == 1500
+    assert parse_price(' 1750.50 ') == 1750.5
+    assert parse_price('') is None
+    assert parse_price(' NR ') == 'NR'
+    assert parse_price(1200) == 1200
+    assert parse_price(None) is None
+
+
+def test_parse_date():
+    assert parse_date('02-Apr-2025') == (date(2025, 4, 2), 'day')
+    assert parse_date(' 4/2025 ') == (date(2025, 4, 1), 'month')
+    assert parse_date('Total') == ('Total', None)
+    assert parse_date(date(2025, 4, 2)) == (date(2025, 4, 2), 'day')
+
+
+def test_scraped_records_are_typed():
+    record = scraped()[0]
+    assert (record.date, record.period) == (date(2025, 4, 2), 'day')
+    assert (record.min_price, record.max_price, record.modal_price) == (1500, 2000, 1750.5)
+
+
+def test_compatibility_view_keeps_scraped_cells_verbatim():
+    assert [record.to_dict() for record in scraped()] == [
+        {"S.No": "1", "Date": "02-Apr-2025", "Market": "Bangalore", "Commodity": "Potato", "Variety": "Local",
+         "Min Price": "1,500", "Max Price": "2000.00", "Modal Price": "1750.50"},
+        {"S.No": "2", "Date": "2-apr-2025", "Market": "Mysore", "Commodity": "Potato", "Variety": "Hybrid",
+         "Min Price": "1200", "Max Price": "1400", "Modal Price": "NR"},
+    ]
+
+
+def test_compatibility_view_of_typed_records():
+    record = PriceRecord(3, date(2025, 4, 1), 'month', 'Pune', 'Onion', 'Red', 800, 1200.0, None,
+                         note="Sample data")
+    assert record.to_dict() == {
+        "S.No": "3", "Date": "4/2025", "Market": "Pune", "Commodity": "Onion", "Variety": "Red",
+        "Min Price": "800", "Max Price": "1200", "Modal Price": "", "Note": "Sample data",
+    }
+
+
+def test_default_format_is_the_original_indented_payload():
+    records = scraped()
+    assert dump_records(records) == json.dumps([record.to_dict() for record in records], indent=4)
+    assert json.loads(dump_records(records, 'compact')) == json.loads(dump_records(records))
+
+
+def test_columnar_format_is_typed():
+    columns = to_columns(scraped())
+    assert columns["date"] == ['2025-04-02', '2025-04-02']
+    assert columns["min_price"] == [1500, 1200]
+    assert columns["modal_price"] == [1750.5, 'NR']
+    assert "note" not in columns
+
+
+def test_ndjson_lines():
+    lines = list(ndjson_lines(scraped()))
+    assert len(lines) == 2
+    assert all(line.endswith('\n') and '\n' not in line[:-1] for line in lines)
+    assert json.loads(lines[0])["Min Price"] == "1,500"
+
+
+def test_fingerprint_follows_the_values():
+    assert records_fingerprint(scraped()) == records_fingerprint(scraped())
+    changed = scraped()
+    changed[1].modal_price = 1300
+    assert records_fingerprint(changed) != records_fingerprint(scraped())
@@ -0,0 +1,80 @@
+from datetime import date
+
+from price_records import PriceRecord
+from price_stats import PriceStats
+
+
+def record(day, modal, market='Bangalore', low=None, high=None):
+    low = modal - 100 if low is None else low
+    high = modal + 100 if high is None else high
+    return PriceRecord(1, day, 'day', market, 'Potato', 'Local', low, high, modal)
+
+
+def series(stats, **filters):
+    return stats.summary(**filters)["series"]
+
+
+def test_latest_and_previous_follow_dates_not_arrival_order():
+    stats = PriceStats()
+    stats.add_records('Karnataka', 'Potato', [record(date(2025, 3, 5), 1500), record(date(2025, 3, 3), 1000)])
+    stats.add_records('Karnataka', 'Potato', [record(date(2025, 3, 4), 1200)])
+    [entry] = series(stats)
+    assert (entry["date"], entry["modal_price"]) == ('2025-03-05', 1500)
+    assert (entry["previous_date"], entry["previous_modal_price"]) == ('2025-03-04', 1200)
+    assert (entry["change"], entry["change_pct"]) == (300, 25)
+
+
+def test_rescraped_date_overwrites_its_row():
+    stats = PriceStats()
+    stats.add_records('Karnataka', 'Potato', [record(date(2025, 3, 5), 1500)])
+    stats.add_records('Karnataka', 'Potato', [record(date(2025, 3, 5), 1600)])
+    [entry] = series(stats)
+    assert len(stats) == 1
+    assert (entry["observations"], entry["modal_price"], entry["previous_date"]) == (1, 1600, None)
+
+
+def test_window_aggregates_are_recomputed_after_new_rows():
+    stats = PriceStats()
+    stats.add_records('Karnataka', 'Potato', [
+        record(date(2025, 3, day), modal) for day, modal in ((1, 900), (6, 1000), (7, 1200))
+    ])
+    [entry] = series(stats, days=2)
+    assert (entry["observations"], entry["min_price"], entry["max_price"], entry["avg_modal_price"]) == \
+        (2, 900, 1300, 1100)
+
+    stats.add_records('Karnataka', 'Potato', [record(date(2025, 3, 8), 2000)])
+    [entry] = series(stats, days=2)
+    assert (entry["observations"], entry["avg_modal_price"]) == (2, 1600)
+
+
+def test_unparseable_prices_are_left_out_of_the_aggregates():
+    stats = PriceStats()
+    stats.add_records('Karnataka', 'Potato', [record(date(2025, 3, 6), 'NR', low=800, high=1200),
+                                              record(date(2025, 3, 7), 1000)])
+    [entry] = series(stats)
+    assert (entry["observations"], entry["min_price"], entry["avg_modal_price"]) == (2, 800, 1000)
+
+
+def test_filters_and_spreads():
+    stats = PriceStats()
+    day = date(2025, 3, 7)
+    stats.add_records('Karnataka', 'Potato', [record(day, 1000), record(day, 1250, market='Mysore')])
+    stats.add_records('Maharashtra', 'Potato', [record(date(2025, 3, 6), 500, market='Pune')])
+    assert [entry["market"] for entry in series(stats, state='karnataka', market='mys')] == ['Mysore']
+
+    # Pune last reported a day earlier, so it is not compared
+    [spread] = stats.summary()["spreads"]
+    assert (spread["low"]["market"], spread["high"]["market"], spread["markets"]) == ('Bangalore', 'Mysore', 2)
+    assert (spread["spread"], spread["spread_pct"]) == (250, 25)
+
+
+def test_stored_rows_keep_scraped_names_and_report_what_they_added():
+    stats = PriceStats()
+    stats.add_records('Tamil Nadu', 'Potato', [record(date(2025, 3, 7), 1000, market='Chennai')])
+    version = stats.version
+    row = ('tamil nadu', 'potato', 'Chennai', 'Local', '2025-03-08', 'day', 900, 1100, 1050)
+    assert stats.add_rows([row]) == 1
+    assert stats.add_rows([]) == 0
+    assert stats.version == version + 1
+    [entry] = series(stats)
+    assert (entry["state"], entry["modal_price"], entry["previous_modal_price"]) == ('Tamil Nadu', 1050, 1000)
@@ -0,0 +1,81 @@
+from datetime import date
+from types import SimpleNamespace
+
+import price_store
+from price_records import PriceRecord
+from price_store import PriceStore, subtract_ranges
+
+START = date(2024, 1, 1)
+END = date(2024, 1, 31)
+
+
+def test_nothing_covered():
+    assert subtract_ranges(START, END, []) == [(START, END)]
+
+
+def test_fully_covered():
+    assert subtract_ranges(START, END, [(date(2023, 12, 1), date(2024, 2, 1))]) == []
+
+
+def test_gap_in_the_middle():
+    covered = [(START, date(2024, 1, 10)), (date(2024, 1, 21), END)]
+    assert subtract_ranges(START, END, covered) == [(date(2024, 1, 11), date(2024, 1, 20))]
+
+
+def test_gaps_at_both_ends():
+    covered = [(date(2024, 1, 10), date(2024, 1, 20))]
+    assert subtract_ranges(START, END, covered) == [
+        (START, date(2024, 1, 9)),
+        (date(2024, 1, 21), END),
+    ]
+
+
+def test_unsorted_and_overlapping_ranges():
+    covered = [
+        (date(2024, 1, 15), END),
+        (START, date(2024, 1, 5)),
+        (date(2024, 1, 3), date(2024, 1, 8)),
+    ]
+    assert subtract_ranges(START, END, covered) == [(date(2024, 1, 9), date(2024, 1, 14))]
+
+
+def test_adjacent_ranges_leave_no_gap():
+    covered = [(START, date(2024, 1, 15)), (date(2024, 1, 16), END)]
+    assert subtract_ranges(START, END, covered) == []
+
+
+def test_ranges_outside_the_window_are_ignored():
+    covered = [(date(2023, 1, 1), date(2023, 12, 31)), (date(2024, 2, 1), date(2024, 3, 1))]
+    assert subtract_ranges(START, END, covered) == [(START, END)]
+
+
+def test_missing_ranges_subtract_recorded_coverage(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices.db'))
+    store.mark_covered('Karnataka', 'Potato', 'Bangalore', START, date(2024, 1, 10))
+    assert store.missing_ranges('karnataka', 'POTATO', ' bangalore ', START, END) == [(date(2024, 1, 11), END)]
+    assert store.missing_ranges('Karnataka', 'Potato', 'Mysore', START, END) == [(START, END)]
+
+
+def test_upserted_rows_are_queried_in_date_order(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices.db'))
+    records = [
+        PriceRecord(1, date(2024, 1, 2), 'day', 'Bangalore', 'Potato', 'Local', 1100, 1300, 1200),
+        PriceRecord(2, date(2024, 1, 1), 'day', 'Bangalore', 'Potato', 'Local', 1000, 1200, 1100),
+        PriceRecord(3, None, None, 'Bangalore', 'Potato', 'Local', 1000, 1200, 1100),
+    ]
+    assert store.upsert_records('Karnataka', 'Potato', records, 'archive') == 2
+    # Upserting the same day again replaces the row
+    store.upsert_records('Karnataka', 'Potato', records[:1], 'archive')
+    rows = store.query('Potato', 'Bangalore', START, END, state='Karnataka')
+    assert [(row[0], row[6]) for row in rows] == [('2024-01-01', 1100), ('2024-01-02', 1200)]
+
+
+def test_rows_scraped_after_a_time(tmp_path, monkeypatch):
+    store = PriceStore(str(tmp_path / 'prices.db'))
+    for scraped_at, day in ((100.0, 1), (200.0, 2)):
+        monkeypatch.setattr(price_store, 'time', SimpleNamespace(time=lambda: scraped_at))
+        store.upsert_records('Karnataka', 'Potato', [
+            PriceRecord(1, date(2024, 1, day), 'day', 'Bangalore', 'Potato', 'Local', 1000, 1200, 1100)
+        ], 'archive')
+    assert len(list(store.iter_rows())) == 2
+    assert [row[4] for row in store.iter_rows(since=150.0)] == ['2024-01-02']
@@ -0,0 +1,281 @@
+import json
+from datetime import date
+
+import pytest
+
+from benchmarks.fixtures import archive_page, price_trends_page
+from grid_parser import MissingPriceTable
+from price_records import PriceRecord
+from price_datasets import EmptyDatasetError
+
+NO_GRID = '<html><body><p>No data found</p></body></html>'
+EMPTY_ARCHIVE = ('<table id="cphBody_gridRecords" class="tableagmark_new"><tr><th>Date</th><th>Market</th>'
+                 '<th>Commodity</th><th>Variety</th><th>Min Price</th><th>Max Price</th><th>Modal Price</th></tr></table>')
+MARCH = (date(2025, 3, 1), date(2025, 3, 7))
+
+
+def test_one_price_trends_scrape_serves_every_market(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    bangalore = scraper.get_data_from_price_trends('Karnataka', 'Potato', 'Bangalore')
+    mysore = scraper.get_data_from_price_trends('Karnataka', 'Potato', 'Mysore')
+    assert bangalore and mysore
+    assert {record.market for record in bangalore} == {'Bangalore'}
+    assert upstream.count(scraper.PRICE_TRENDS_URL) == 1
+
+
+def test_price_trends_page_without_rows_is_not_cached(scraper, upstream):
+    pages = [NO_GRID, price_trends_page(rows=40, viewstate_kb=1)]
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: pages.pop(0)
+    with pytest.raises(EmptyDatasetError):
+        scraper.get_price_trends_dataset('Karnataka', 'Potato')
+    assert scraper.dataset_cache.stats()["size"] == 0
+
+    assert scraper.get_data_from_price_trends('Karnataka', 'Potato', 'Bangalore')
+    assert upstream.count(scraper.PRICE_TRENDS_URL) == 2
+
+
+def test_archive_page_without_price_table_is_not_recorded_as_fetched(scraper, upstream):
+    upstream.handlers[scraper.ARCHIVE_URL] = lambda form: NO_GRID
+    with pytest.raises(MissingPriceTable):
+        scraper.get_data_from_archive('Karnataka', 'Potato', 'Bangalore', *MARCH)
+    assert scraper.price_store.missing_ranges('Karnataka', 'Potato', 'Bangalore', *MARCH) == [MARCH]
+
+    # /history tries the range again on the next request
+    upstream.handlers[scraper.ARCHIVE_URL] = lambda form: archive_page(rows=20, viewstate_kb=1)
+    scraper.fill_history_gaps('Potato', 'Bangalore', *MARCH, state='Karnataka')
+    assert scraper.price_store.missing_ranges('Karnataka', 'Potato', 'Bangalore', *MARCH) == []
+    assert upstream.count(scraper.ARCHIVE_URL) == 2
+
+
+def test_empty_archive_table_is_recorded_as_fetched(scraper, upstream):
+    upstream.handlers[scraper.ARCHIVE_URL] = lambda form: EMPTY_ARCHIVE
+    assert scraper.get_data_from_archive('Karnataka', 'Potato', 'Bangalore', *MARCH) == []
+    assert scraper.price_store.missing_ranges('Karnataka', 'Potato', 'Bangalore', *MARCH) == []
+    scraper.fill_history_gaps('Potato', 'Bangalore', *MARCH, state='Karnataka')
+    assert upstream.count(scraper.ARCHIVE_URL) == 1
+
+
+def test_price_trends_records_keep_the_scraped_cells(scraper):
+    cells = ['Pune', 'Local', '1,500', '2000.00', '1750.50', '10']
+    record = scraper.price_trends_record(1, cells, 'Onion', 4, 2025)
+    assert (record.min_price, record.max_price, record.modal_price) == (1500, 2000, 1750.5)
+    assert record.to_dict() == {
+        "S.No": "1", "Date": "4/2025", "Market": "Pune", "Commodity": "Onion", "Variety": "Local",
+        "Min Price": "1,500", "Max Price": "2000.00", "Modal Price": "1750.50",
+    }
+
+
+def test_price_trends_resolves_market_spellings_through_the_catalog(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    records = scraper.get_data_from_price_trends('Karnataka', 'Potato', 'Bengaluru')
+    assert records
+    assert {record.market for record in records} == {'Bangalore'}
+    assert scraper.get_data_from_price_trends('Karnataka', 'Potato', 'Atlantis') == []
+
+
+def test_month_starts(scraper):
+    assert scraper.month_starts(date(2025, 1, 31), date(2025, 3, 1)) == [
+        date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]
+    assert scraper.month_starts(date(2024, 12, 15), date(2024, 12, 20)) == [date(2024, 12, 1)]
+
+
+def test_archive_windows(scraper):
+    windows = scraper.archive_windows(date(2025, 1, 1), date(2025, 3, 5), days=31)
+    assert windows == [
+        (date(2025, 1, 1), date(2025, 1, 31)),
+        (date(2025, 2, 1), date(2025, 3, 3)),
+        (date(2025, 3, 4), date(2025, 3, 5)),
+    ]
+    assert scraper.archive_windows(date(2025, 1, 1), date(2025, 1, 1)) == [(date(2025, 1, 1),) * 2]
+
+
+def test_parse_range_params(scraper, monkeypatch):
+    parse = scraper.parse_range_params
+    assert parse({}) is None
+    assert parse({'from': '2025-01-01', 'to': '2025-03-31'}) == (date(2025, 1, 1), date(2025, 3, 31), 'month')
+    assert parse({'to': '2025-03-31', 'period': 'day'}) == (date(2025, 3, 1), date(2025, 3, 31), 'day')
+    for args in ({'from': '2025-03-01', 'to': '2025-01-01'},
+                 {'from': '2025-01-01', 'to': '2025-01-02', 'period': 'week'},
+                 {'from': 'yesterday'}):
+        with pytest.raises(ValueError):
+            parse(args)
+    monkeypatch.setattr(scraper, 'RANGE_MAX_MONTHS', 2)
+    with pytest.raises(ValueError):
+        parse({'from': '2025-01-01', 'to': '2025-03-01'})
+
+
+def test_range_with_a_failed_month_is_served_but_not_cached(scraper, upstream):
+    september_up = [False]
+
+    def price_trends(form):
+        if form['ctl00$cphBody$cboMonth'] == '9' and not september_up[0]:
+            raise ConnectionError("upstream timed out")
+        return price_trends_page(rows=40, viewstate_kb=1)
+
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = price_trends
+    query = ('Karnataka', 'Potato', 'Bangalore', date(2025, 8, 1), date(2025, 10, 10))
+    partial = scraper.get_cached_range_data(*query)
+    assert {record.date.month for record in partial} == {8, 10}
+    assert partial.source == 'price_trends'
+    assert scraper.price_cache.stats()["size"] == 0
+
+    september_up[0] = True
+    complete = scraper.get_cached_range_data(*query)
+    assert {record.date.month for record in complete} == {8, 9, 10}
+    assert [record.sno for record in complete] == list(range(1, len(complete) + 1))
+    assert scraper.get_cached_range_data(*query) is complete
+    # August and October came from the dataset cache the second time
+    assert upstream.count(scraper.PRICE_TRENDS_URL) == 4
+
+
+def test_range_with_a_failed_archive_window_is_not_cached(scraper, upstream):
+    upstream.handlers[scraper.ARCHIVE_URL] = lambda form: NO_GRID
+    records = scraper.get_cached_range_data('Karnataka', 'Potato', 'Bangalore', *MARCH, period='day')
+    assert records == []
+    assert scraper.price_cache.stats()["size"] == 0
+
+
+def test_forwarded_client_trusts_only_the_proxy_entries(scraper):
+    header = '203.0.113.9, 198.51.100.4, 10.0.0.2'
+    assert scraper.forwarded_client(header, '10.0.0.1', hops=0) == '10.0.0.1'
+    assert scraper.forwarded_client(header, '10.0.0.1', hops=1) == '10.0.0.2'
+    assert scraper.forwarded_client(header, '10.0.0.1', hops=2) == '198.51.100.4'
+    assert scraper.forwarded_client('198.51.100.4', '10.0.0.1', hops=2) == '10.0.0.1'
+    assert scraper.forwarded_client('', '10.0.0.1', hops=1) == '10.0.0.1'
+
+
+def test_client_id_ignores_a_forged_first_entry(scraper, monkeypatch):
+    monkeypatch.setattr(scraper, 'TRUSTED_PROXY_HOPS', 1)
+    headers = [('X-Forwarded-For', 'forged'), ('X-Forwarded-For', '203.0.113.9')]
+    with scraper.app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert scraper.client_id() == '203.0.113.9'
+
+
+def test_streamed_request_runs_the_source_strategy(scraper, upstream):
+    # Mysore is not on the price trends page, so the archive wins
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=1, viewstate_kb=1)
+    upstream.handlers[scraper.ARCHIVE_URL] = lambda form: archive_page(rows=40, viewstate_kb=1)
+    client = scraper.app.test_client()
+    query = '/request?commodity=Potato&state=Karnataka&market=Mysore'
+    streamed = client.get(query + '&stream=ndjson')
+    assert streamed.mimetype == 'application/x-ndjson'
+    assert streamed.headers['X-Data-Source'] == 'archive'
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert len(lines) == 40 and 'Note' not in lines[0]
+
+    # The streamed response filled the cache the buffered one is served from
+    assert client.get(query).headers['X-Data-Source'] == 'archive'
+    assert upstream.count(scraper.ARCHIVE_URL) == 1
+
+
+def test_streamed_range_names_its_source(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    response = scraper.app.test_client().get('/request?commodity=Potato&state=Karnataka&market=Bangalore'
+                                             '&from=2025-08-01&to=2025-09-30&stream=ndjson')
+    assert response.headers['X-Data-Source'] == 'price_trends'
+    assert len(response.get_data(as_text=True).splitlines()) == 4
+
+
+def responses_from(scraper, source):
+    return scraper.RESPONSES_BY_SOURCE._values.get((source,), 0)
+
+
+def request_seconds_count(scraper, endpoint):
+    counts = scraper.REQUEST_SECONDS._values.get((endpoint,))
+    return sum(counts[0]) if counts else 0
+
+
+def test_cache_hits_are_counted_by_source(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    client = scraper.app.test_client()
+    before = responses_from(scraper, 'price_trends')
+    for _ in range(2):
+        client.get('/request?commodity=Potato&state=Karnataka&market=Bangalore')
+    client.get('/request?commodity=Potato&state=Karnataka&market=Bangalore&stream=ndjson')
+    assert responses_from(scraper, 'price_trends') == before + 3
+    assert upstream.count(scraper.PRICE_TRENDS_URL) == 1
+
+
+def test_streamed_response_is_timed_when_its_body_is_done(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    before = request_seconds_count(scraper, 'requestPage')
+    response = scraper.app.test_client().get('/request?commodity=Potato&state=Karnataka&market=Bangalore'
+                                             '&from=2025-08-01&to=2025-09-30&stream=ndjson')
+    assert request_seconds_count(scraper, 'requestPage') == before
+    response.get_data()
+    response.close()
+    assert request_seconds_count(scraper, 'requestPage') == before + 1
+
+
+def test_stats_catch_up_with_rows_stored_by_other_workers(scraper):
+    stats = scraper.get_price_stats()
+    assert len(stats) == 0
+    # Another worker process scrapes and stores a table
+    rows = [PriceRecord(1, date(2025, 3, day), 'day', 'Bangalore', 'Potato', 'Local', 1000, 1200, modal)
+            for day, modal in ((6, 1100), (7, 1150))]
+    scraper.price_store.upsert_records('Karnataka', 'Potato', rows, 'archive')
+    [entry] = scraper.app.test_client().get('/stats?commodity=Potato').get_json()["series"]
+    assert (entry["modal_price"], entry["previous_modal_price"]) == (1150, 1100)
+    assert len(stats) == 2
+
+
+def test_matching_etag_is_answered_not_modified(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    client = scraper.app.test_client()
+    query = '/request?commodity=Potato&state=Karnataka&market=Bangalore&format=compact'
+    first = client.get(query)
+    assert first.status_code == 200 and first.headers['ETag'].startswith('W/')
+    again = client.get(query, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.get_data() == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    # Another format of the same records is another variant
+    assert client.get(query.replace('compact', 'columnar'),
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_batch_queries_are_validated_and_deduplicated(scraper):
+    payload = [
+        {"state": "Karnataka", "commodity": "Potato", "market": "Bangalore"},
+        ["karnataka", " potato", "BANGALORE "],
+        ["Karnataka", "Potato", "Mysore"],
+    ]
+    expected = [("Karnataka", "Potato", "Bangalore"), ("Karnataka", "Potato", "Mysore")]
+    assert scraper.parse_batch_queries(payload) == expected
+    assert scraper.parse_batch_queries({"queries": payload}) == expected
+
+
+@pytest.mark.parametrize('payload', [
+    None, [], {"queries": []}, {"state": "Karnataka"}, ["Karnataka"], [["Karnataka", "Potato"]],
+    [{"state": "Karnataka", "commodity": "Potato"}], [{"state": "Karnataka", "commodity": "Potato", "market": " "}],
+    [["Karnataka", "Potato", 1]],
+])
+def test_invalid_batch_payloads_are_rejected(scraper, payload):
+    with pytest.raises(ValueError):
+        scraper.parse_batch_queries(payload)
+
+
+def test_batch_size_counts_distinct_queries(scraper, monkeypatch):
+    monkeypatch.setattr(scraper, 'BATCH_MAX_QUERIES', 2)
+    assert len(scraper.parse_batch_queries([["Karnataka", "Potato", "Bangalore"]] * 5)) == 1
+    with pytest.raises(ValueError):
+        scraper.parse_batch_queries([["Karnataka", "Potato", market] for market in ("Bangalore", "Mysore", "Hubli")])
+
+
+def test_batch_queries_are_grouped_by_state_and_commodity(scraper):
+    queries = [("Karnataka", "Potato", "Bangalore"), ("Karnataka", "Onion", "Bangalore"),
+               ("karnataka", "potato", "Mysore")]
+    assert scraper.group_batch_queries(queries) == [
+        [("Karnataka", "Potato", "Bangalore"), ("karnataka", "potato", "Mysore")],
+        [("Karnataka", "Onion", "Bangalore")],
+    ]
+
+
+def test_batch_group_shares_one_price_trends_scrape(scraper, upstream):
+    upstream.handlers[scraper.PRICE_TRENDS_URL] = lambda form: price_trends_page(rows=40, viewstate_kb=1)
+    response = scraper.app.test_client().post('/batch?format=compact', json=[
+        {"state": "Karnataka", "commodity": "Potato", "market": market} for market in ("Bangalore", "Mysore")
+    ])
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line["market"] for line in lines) == ["Bangalore", "Mysore"]
+    assert all(line["source"] == 'price_trends' and line["data"] for line in lines)
+    assert upstream.count(scraper.PRICE_TRENDS_URL) == 1
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from source_strategy import SourceStrategy
+from upstream import UpstreamCancelled, check_cancelled
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def attempts(strategy):
+    return strategy.stats()["attempts"]
+
+
+def test_unknown_mode_is_rejected(executor):
+    with pytest.raises(ValueError):
+        SourceStrategy(executor, mode='fastest')
+
+
+def test_hedge_starts_second_source_and_cancels_the_slow_one(executor):
+    strategy = SourceStrategy(executor, mode='hedge', hedge_delay=0.05, timeout=5)
+    release = threading.Event()
+    stopped = []
+
+    def slow():
+        release.wait(2)
+        try:
+            check_cancelled()
+        except UpstreamCancelled:
+            stopped.append('slow')
+            raise
+        return ['slow']
+
+    try:
+        assert strategy.run([('slow', slow), ('fast', lambda: ['fast'])]) == ('fast', ['fast'])
+    finally:
+        release.set()
+    executor.shutdown(wait=True)
+    assert stopped == ['slow']
+    assert attempts(strategy) == {'slow': {'cancelled': 1}, 'fast': {'won': 1}}
+
+
+def test_hedge_does_not_start_second_source_when_first_answers(executor):
+    strategy = SourceStrategy(executor, mode='hedge', hedge_delay=5, timeout=5)
+    assert strategy.run([('a', lambda: [1]), ('b', lambda: [2])]) == ('a', [1])
+    assert attempts(strategy) == {'a': {'won': 1}, 'b': {'skipped': 1}}
+
+
+def test_serial_moves_on_after_failure_or_empty_result(executor):
+    strategy = SourceStrategy(executor, mode='serial', timeout=5)
+
+    def broken():
+        raise ValueError("upstream down")
+
+    sources = [('broken', broken), ('empty', lambda: []), ('good', lambda: [1])]
+    assert strategy.run(sources) == ('good', [1])
+    assert attempts(strategy) == {'broken': {'failed': 1}, 'empty': {'empty': 1}, 'good': {'won': 1}}
+
+
+def test_serial_waits_for_a_slow_source(executor):
+    strategy = SourceStrategy(executor, mode='serial', timeout=5)
+
+    def slow():
+        time.sleep(0.1)
+        return [1]
+
+    assert strategy.run([('slow', slow), ('b', lambda: [2])]) == ('slow', [1])
+    assert attempts(strategy)['b'] == {'skipped': 1}
+
+
+def test_race_starts_every_source_at_once(executor):
+    strategy = SourceStrategy(executor, mode='race', timeout=5)
+    started = []
+    both = threading.Barrier(2, timeout=2)
+
+    def source(name):
+        def fetch():
+            started.append(name)
+            both.wait()
+            return [name] if name == 'b' else []
+        return fetch
+
+    assert strategy.run([('a', source('a')), ('b', source('b'))]) == ('b', ['b'])
+    assert sorted(started) == ['a', 'b']
+
+
+def test_every_source_failing_returns_nothing(executor):
+    strategy = SourceStrategy(executor, mode='hedge', hedge_delay=0.01, timeout=5)
+    assert strategy.run([('a', lambda: []), ('b', lambda: None)]) == (None, None)
+
+
+def test_timeout_abandons_running_sources(executor):
+    strategy = SourceStrategy(executor, mode='serial', timeout=0.05)
+    release = threading.Event()
+    try:
+        assert strategy.run([('slow', lambda: release.wait(2)), ('b', lambda: [1])]) == (None, None)
+    finally:
+        release.set()
+    assert attempts(strategy) == {'slow': {'timeout': 1}, 'b': {'skipped': 1}}
+
+
+def test_custom_validity_check(executor):
+    strategy = SourceStrategy(executor, mode='serial', timeout=5)
+    assert strategy.run([('a', lambda: 0), ('b', lambda: 1)], valid=lambda value: value is not None) == ('a', 0)
+
+
+def test_async_hedge_cancels_losing_task(executor):
+    strategy = SourceStrategy(executor, mode='hedge', hedge_delay=0.05, timeout=5)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(2)
+        except asyncio.CancelledError:
+            cancelled.append('slow')
+            raise
+        return ['slow']
+
+    async def fast():
+        return ['fast']
+
+    async def scenario():
+        result = await strategy.run_async([('slow', slow), ('fast', fast)])
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == ('fast', ['fast'])
+    assert cancelled == ['slow']
+    assert attempts(strategy) == {'slow': {'cancelled': 1}, 'fast': {'won': 1}}
+
+
+def test_async_failure_moves_to_next_source(executor):
+    strategy = SourceStrategy(executor, mode='serial', timeout=5)
+
+    async def broken():
+        raise ValueError("upstream down")
+
+    async def good():
+        return [1]
+
+    assert asyncio.run(strategy.run_async([('broken', broken), ('good', good)])) == ('good', [1])
+    assert attempts(strategy)['broken'] == {'failed': 1}
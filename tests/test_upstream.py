@@ -0,0 +1,199 @@
+import threading
+import time
+
+import pytest
+
+from upstream import (REFRESH, USER, CircuitBreaker, CircuitOpenError, FairScheduler, HostRateLimiter,
+                      UpstreamCancelled, cancel_scope, traffic)
+
+URL = 'https://agmarknet.example/page'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_breaker_opens_after_threshold_and_short_circuits():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.short_circuits == 1
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, clock=Clock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    assert breaker.state == "half-open"
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.allow()
+
+
+def test_failed_probe_reopens_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 59
+    assert breaker.state == "open"
+    clock.now = 60
+    assert breaker.state == "half-open"
+
+
+def test_released_probe_can_be_retried():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    breaker.allow()
+    breaker.release()
+    breaker.allow()
+
+
+def test_rate_limiter_allows_burst_then_refills():
+    clock = Clock()
+    limiter = HostRateLimiter(rate=2, burst=2, clock=clock)
+    assert limiter.try_acquire('a') == 0
+    assert limiter.try_acquire('a') == 0
+    assert limiter.try_acquire('a') == pytest.approx(0.5)
+    # Buckets are per host
+    assert limiter.try_acquire('b') == 0
+    clock.now = 0.5
+    assert limiter.try_acquire('a') == 0
+    assert limiter.stats()["requests"] == 4
+
+
+def test_rate_limiter_disabled_at_zero_rate():
+    limiter = HostRateLimiter(rate=0, clock=Clock())
+    assert all(limiter.try_acquire('a') == 0 for _ in range(100))
+
+
+class GateLimiter:
+    """Hands out a token only when the test opens the gate"""
+
+    rate = 1
+
+    def __init__(self):
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def open(self):
+        with self.lock:
+            self.tokens += 1
+
+    def try_acquire(self, host):
+        with self.lock:
+            if self.tokens:
+                self.tokens -= 1
+                return 0
+        return 0.01
+
+    def stats(self):
+        return {}
+
+
+def queue(scheduler, priority, client, name, order):
+    def run():
+        with traffic(priority, client):
+            scheduler.wait(URL)
+        order.append(name)
+
+    depth = scheduler.stats()["queue"]["depth"]
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_for(lambda: scheduler.stats()["queue"]["depth"] == depth + 1)
+    return thread
+
+
+def drain(limiter, order, count):
+    for served in range(1, count + 1):
+        limiter.open()
+        wait_for(lambda: len(order) == served)
+
+
+def test_scheduler_serves_users_round_robin_before_refreshes():
+    limiter = GateLimiter()
+    scheduler = FairScheduler(limiter, max_defer=30, poll_interval=0.005)
+    order = []
+    threads = [
+        queue(scheduler, REFRESH, None, 'refresh', order),
+        queue(scheduler, USER, 'a', 'a1', order),
+        queue(scheduler, USER, 'a', 'a2', order),
+        queue(scheduler, USER, 'b', 'b1', order),
+    ]
+    drain(limiter, order, 4)
+    for thread in threads:
+        thread.join(1)
+    assert order == ['a1', 'b1', 'a2', 'refresh']
+    assert scheduler.stats()["served"] == {USER: 3, REFRESH: 1}
+
+
+def test_scheduler_serves_refresh_deferred_past_max_defer():
+    clock = Clock()
+    limiter = GateLimiter()
+    scheduler = FairScheduler(limiter, max_defer=30, poll_interval=0.005, clock=clock)
+    order = []
+    queue(scheduler, REFRESH, None, 'refresh', order)
+    queue(scheduler, USER, 'a', 'a1', order)
+    clock.now = 30
+    drain(limiter, order, 2)
+    assert order == ['refresh', 'a1']
+
+
+def test_scheduler_without_rate_does_not_queue():
+    scheduler = FairScheduler(HostRateLimiter(rate=0), poll_interval=0.005)
+    scheduler.wait(URL)
+    assert scheduler.stats()["queue"]["peak_depth"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = FairScheduler(GateLimiter(), poll_interval=0.005)
+    cancel = threading.Event()
+    errors = []
+
+    def run():
+        with cancel_scope(cancel):
+            try:
+                scheduler.wait(URL)
+            except UpstreamCancelled as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_for(lambda: scheduler.stats()["queue"]["depth"] == 1)
+    cancel.set()
+    thread.join(1)
+    assert len(errors) == 1
+    assert scheduler.stats()["queue"]["depth"] == 0
@@ -0,0 +1,557 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+import queue
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows, the limiter is then per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling the upstream while the circuit breaker is open"""
+
+
+class PoolExhaustedError(requests.RequestException):
+    """Raised when no pooled session became free within the pool timeout"""
+
+
+class UpstreamCancelled(requests.RequestException):
+    """Raised instead of calling the upstream once the caller no longer needs the answer"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and every call
+    fails fast for ``reset_timeout`` seconds. The first call after that is let
+    through as a probe; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.short_circuits = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Raise CircuitOpenError if the upstream should not be called right now"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return
+            self.short_circuits += 1
+        raise CircuitOpenError("Upstream circuit breaker is open")
+
+    def release(self):
+        """Give back a call let through by allow() that was abandoned before it was made"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning(f"Opening upstream circuit breaker after {self._failures} failures")
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+class LatencyRecorder:
+    """Keeps a count/total/max and a sliding window of samples for percentiles"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, maximum = self.count, self.total, self.max
+
+        def percentile(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 4)
+
+        return {
+            "count": count,
+            "avg": round(total / count, 4) if count else None,
+            "max": round(maximum, 4),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+        }
+
+
+# Priority classes of outbound requests. Requests made outside of a traffic()
+# block (prefetch, stale-while-revalidate refreshes) count as refreshes.
+USER = 'user'
+REFRESH = 'refresh'
+_traffic = contextvars.ContextVar('upstream_traffic', default=(REFRESH, None))
+
+
+@contextmanager
+def traffic(priority, client=None):
+    """Tag the upstream requests made inside the with block with a priority and client"""
+    token = _traffic.set((priority, client))
+    try:
+        yield
+    finally:
+        _traffic.reset(token)
+
+
+def current_traffic():
+    return _traffic.get()
+
+
+# Set by the source strategy around each source it runs. Threads cannot be
+# interrupted, so a losing source stops at its next upstream request instead.
+_cancel = contextvars.ContextVar('upstream_cancel', default=None)
+
+
+@contextmanager
+def cancel_scope(event):
+    """
+    Abandon the upstream requests made inside the with block once event is set.
+    cancel_scope(None) shields work that others wait on from an enclosing scope.
+    """
+    token = _cancel.set(event)
+    try:
+        yield
+    finally:
+        _cancel.reset(token)
+
+
+def check_cancelled():
+    """Raise UpstreamCancelled if the current cancel scope has been cancelled"""
+    event = _cancel.get()
+    if event is not None and event.is_set():
+        raise UpstreamCancelled("Upstream request abandoned: another source answered first")
+
+
+def _take_token(tokens, updated, now, rate, burst):
+    """
+    Token bucket step. Returns (tokens, wait, granted): a token is taken if one
+    is available now, and wait is otherwise the time until one will be.
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0, True
+    return tokens, (1 - tokens) / rate, False
+
+
+class HostRateLimiter:
+    """
+    Token bucket per upstream host: ``rate`` requests per second on average with
+    bursts of up to ``burst``. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate=10, burst=20, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.requests = 0
+
+    def _update(self, host):
+        with self._lock:
+            now = self._clock()
+            tokens, updated = self._buckets.get(host, (self.burst, now))
+            tokens, wait, granted = _take_token(tokens, updated, now, self.rate, self.burst)
+            self._buckets[host] = (tokens, now)
+            if granted:
+                self.requests += 1
+        return wait, granted
+
+    def try_acquire(self, host):
+        """Take a token for host if one is available: return 0, else the seconds until one is"""
+        if not self.rate:
+            return 0.0
+        wait, granted = self._update(host)
+        return 0.0 if granted else wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "shared": False,
+                "requests": self.requests,
+            }
+
+
+class SharedRateLimiter(HostRateLimiter):
+    """
+    HostRateLimiter whose buckets live in small files under ``state_dir``, updated
+    under an exclusive flock, so every worker process on the machine shares one
+    budget per host. Falls back to a per-process bucket where fcntl is unavailable.
+    """
+
+    _STATE = struct.Struct('<dd')
+
+    def __init__(self, rate=10, burst=20, state_dir=None):
+        super().__init__(rate, burst, clock=time.time)
+        self.state_dir = state_dir or tempfile.gettempdir()
+        self._fds = {}
+
+    def _path(self, host):
+        digest = hashlib.sha1(host.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.state_dir, f"agmarket-ratelimit-{digest}.bucket")
+
+    def _update(self, host):
+        if fcntl is None:
+            return super()._update(host)
+        with self._lock:
+            fd = self._fds.get(host)
+            if fd is None:
+                fd = self._fds[host] = os.open(self._path(host), os.O_RDWR | os.O_CREAT, 0o600)
+            # The thread lock orders threads of this process, flock orders processes
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                now = self._clock()
+                data = os.pread(fd, self._STATE.size, 0)
+                if len(data) == self._STATE.size:
+                    tokens, updated = self._STATE.unpack(data)
+                else:
+                    tokens, updated = self.burst, now
+                tokens, wait, granted = _take_token(tokens, updated, now, self.rate, self.burst)
+                os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            if granted:
+                self.requests += 1
+        return wait, granted
+
+    def stats(self):
+        stats = super().stats()
+        stats["shared"] = fcntl is not None
+        stats["state_dir"] = self.state_dir
+        return stats
+
+
+class _Ticket:
+    __slots__ = ("priority", "client", "enqueued")
+
+    def __init__(self, priority, client, enqueued):
+        self.priority = priority
+        self.client = client
+        self.enqueued = enqueued
+
+
+class FairScheduler:
+    """
+    Decides which waiting upstream request gets the next rate limiter token.
+
+    User requests go before refreshes, and users are served round-robin by client
+    so one busy caller cannot starve the others. A refresh deferred for
+    ``max_defer`` seconds is served next regardless. One queue is shared by all
+    hosts (the scraper only talks to agmarknet).
+    """
+
+    def __init__(self, limiter, max_defer=30, poll_interval=0.05, clock=time.monotonic):
+        self.limiter = limiter
+        self.max_defer = max_defer
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._users = OrderedDict()
+        self._refreshes = deque()
+        self._depth = 0
+        self._peak_depth = 0
+        self._served = {USER: 0, REFRESH: 0}
+        self.wait_latency = {USER: LatencyRecorder(), REFRESH: LatencyRecorder()}
+
+    def _enqueue(self, ticket):
+        if ticket.priority == REFRESH:
+            self._refreshes.append(ticket)
+        else:
+            self._users.setdefault(ticket.client, deque()).append(ticket)
+        self._depth += 1
+        self._peak_depth = max(self._peak_depth, self._depth)
+
+    def _remove(self, ticket):
+        if ticket.priority == REFRESH:
+            self._refreshes.remove(ticket)
+        else:
+            tickets = self._users[ticket.client]
+            first = tickets[0] is ticket
+            tickets.remove(ticket)
+            if not tickets:
+                del self._users[ticket.client]
+            elif first:
+                # Served: this client goes to the back of the round
+                self._users.move_to_end(ticket.client)
+        self._depth -= 1
+        self._cond.notify_all()
+
+    def _head(self):
+        if self._refreshes and self._clock() - self._refreshes[0].enqueued >= self.max_defer:
+            return self._refreshes[0]
+        if self._users:
+            return next(iter(self._users.values()))[0]
+        return self._refreshes[0] if self._refreshes else None
+
+    def _try_dispatch(self, ticket, host):
+        # Caller must hold the condition; returns 0 when the ticket may go
+        if self._head() is not ticket:
+            return self.poll_interval
+        delay = self.limiter.try_acquire(host)
+        if not delay:
+            self._remove(ticket)
+        return delay
+
+    def _done(self, ticket):
+        waited = self._clock() - ticket.enqueued
+        self.wait_latency[ticket.priority].record(waited)
+        with self._cond:
+            self._served[ticket.priority] += 1
+
+    def _ticket(self):
+        priority, client = current_traffic()
+        return _Ticket(priority if priority == USER else REFRESH, client, self._clock())
+
+    def wait(self, url):
+        """Block until a request to url may be sent"""
+        if not self.limiter.rate:
+            return
+        host = urlsplit(url).netloc
+        ticket = self._ticket()
+        with self._cond:
+            self._enqueue(ticket)
+            try:
+                while True:
+                    check_cancelled()
+                    delay = self._try_dispatch(ticket, host)
+                    if not delay:
+                        break
+                    self._cond.wait(delay)
+            except BaseException:
+                self._remove(ticket)
+                raise
+        self._done(ticket)
+
+    async def wait_async(self, url):
+        """Async version of wait(); polls instead of blocking the event loop"""
+        if not self.limiter.rate:
+            return
+        host = urlsplit(url).netloc
+        ticket = self._ticket()
+        with self._cond:
+            self._enqueue(ticket)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_dispatch(ticket, host)
+                if not delay:
+                    break
+                await asyncio.sleep(min(delay, self.poll_interval))
+        except BaseException:
+            with self._cond:
+                self._remove(ticket)
+            raise
+        self._done(ticket)
+
+    def stats(self):
+        with self._cond:
+            queue = {
+                "depth": self._depth,
+                "peak_depth": self._peak_depth,
+                "users_waiting": sum(len(tickets) for tickets in self._users.values()),
+                "clients_waiting": len(self._users),
+                "refreshes_waiting": len(self._refreshes),
+            }
+            served = dict(self._served)
+        return {
+            "limiter": self.limiter.stats(),
+            "queue": queue,
+            "served": served,
+            "wait": {priority: recorder.snapshot() for priority, recorder in self.wait_latency.items()},
+            "max_defer": self.max_defer,
+        }
+
+
+class UpstreamSession(requests.Session):
+    """requests.Session with a default timeout, circuit breaker, rate limit and latency tracking"""
+
+    def __init__(self, timeout, breaker, latency, scheduler=None):
+        super().__init__()
+        self.default_timeout = timeout
+        self.breaker = breaker
+        self.latency = latency
+        self.scheduler = scheduler
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        check_cancelled()
+        self.breaker.allow()
+        if self.scheduler is not None:
+            try:
+                self.scheduler.wait(url)
+                check_cancelled()
+            except UpstreamCancelled:
+                self.breaker.release()
+                raise
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.record(time.perf_counter() - started)
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+
+class SessionPool:
+    """
+    Fixed-size pool of keep-alive sessions shared by all request threads.
+
+    Each session has its own connection pool, retry policy and default
+    (connect, read) timeout, and all of them share one circuit breaker and
+    rate limited FairScheduler. A POST is only retried when the connection could
+    not be made, so one call stays within a single read timeout.
+    """
+
+    def __init__(self, size=4, connect_timeout=5, read_timeout=10, retries=2,
+                 backoff_factor=0.5, pool_timeout=30, breaker=None, scheduler=None):
+        self.size = size
+        self.pool_timeout = pool_timeout
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler or FairScheduler(HostRateLimiter(rate=0))
+        self.latency = LatencyRecorder()
+        self.wait_latency = LatencyRecorder()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._exhausted = 0
+        # LIFO so the most recently used (warmest) connection is reused first
+        self._sessions = queue.LifoQueue()
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            # Read errors and 5xx statuses are only retried for GET
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        for _ in range(size):
+            session = UpstreamSession(self.timeout, self.breaker, self.latency, self.scheduler)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sessions.put(session)
+
+    @contextmanager
+    def session(self):
+        """Borrow a session from the pool for the duration of a with block"""
+        started = time.perf_counter()
+        try:
+            session = self._sessions.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._exhausted += 1
+            raise PoolExhaustedError(f"No upstream session free after {self.pool_timeout}s")
+        self.wait_latency.record(time.perf_counter() - started)
+
+        with self._lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._sessions.put(session)
+
+    def close(self):
+        """Close every idle session in the pool"""
+        while True:
+            try:
+                self._sessions.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        """Return pool utilization, breaker state and upstream latency"""
+        with self._lock:
+            pool = {
+                "size": self.size,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "utilization": round(self._in_use / self.size, 2),
+                "exhausted": self._exhausted,
+            }
+        return {
+            "pool": pool,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "circuit_breaker": {
+                "state": self.breaker.state,
+                "short_circuits": self.breaker.short_circuits,
+            },
+            "rate_limit": self.scheduler.stats(),
+            "upstream_latency": self.latency.snapshot(),
+            "pool_wait": self.wait_latency.snapshot(),
+        }